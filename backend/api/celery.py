@@ -22,7 +22,7 @@ app.autodiscover_tasks()
 app.conf.beat_schedule = {
     'daily-woocommerce-sync': {
         'task': 'woocommerce.tasks.sync_all_woocommerce_configs',
-        'schedule': 86400.0,  # 24 hours
+        'schedule': 900.0,  # 15 minutes (incremental once a high-water mark exists)
     },
     'daily-ga4-sync': {
         'task': 'google_pipelines.tasks.sync_all_ga4_configs',
@@ -32,6 +32,14 @@ app.conf.beat_schedule = {
         'task': 'google_pipelines.tasks.sync_all_gsc_configs',
         'schedule': 86400.0,  # 24 hours
     },
+    'daily-google-partition-maintenance': {
+        'task': 'google_pipelines.tasks.maintain_google_partitions',
+        'schedule': crontab(hour=3, minute=0),  # 3 AM UTC
+    },
+    'daily-log-retention': {
+        'task': 'core.tasks.apply_log_retention',
+        'schedule': crontab(hour=3, minute=30),  # 3:30 AM UTC
+    },
     'daily-login-summary': {
         'task': 'authentication.tasks.daily_login_summary',
         'schedule': crontab(hour=8, minute=0),  # 8 AM UTC
@@ -1,6 +1,7 @@
 from pathlib import Path
 from decouple import config
 from datetime import timedelta
+from urllib.parse import urlsplit, urlunsplit
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
@@ -243,6 +244,47 @@ CELERY_TASK_EAGER_PROPAGATES = True
 CELERY_TASK_IGNORE_RESULT = False
 CELERY_TASK_STORE_EAGER_RESULT = True
 
+# Cache (analytics responses, throttling); Redis db 1 keeps it apart from the Celery broker.
+# Without REDIS_CACHE_URL, use db 1 on the broker's Redis host.
+REDIS_CACHE_URL = config(
+    'REDIS_CACHE_URL',
+    default=urlunsplit(urlsplit(config('REDIS_URL', default='redis://localhost:6379/0'))._replace(path='/1')),
+)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_CACHE_URL,
+        'KEY_PREFIX': 'vvv',
+    }
+}
+WOOCOMMERCE_ANALYTICS_CACHE_TTL = config('WOOCOMMERCE_ANALYTICS_CACHE_TTL', default=300, cast=int)  # seconds
+WOOCOMMERCE_EXPORT_CHUNK_SIZE = config('WOOCOMMERCE_EXPORT_CHUNK_SIZE', default=2000, cast=int)  # orders fetched per cursor round trip
+WOOCOMMERCE_CURRENCY_CACHE_TTL = config('WOOCOMMERCE_CURRENCY_CACHE_TTL', default=86400, cast=int)  # seconds, shared cache
+WOOCOMMERCE_CURRENCY_LOCAL_TTL = config('WOOCOMMERCE_CURRENCY_LOCAL_TTL', default=60, cast=int)  # seconds, per-process LRU
+WOOCOMMERCE_CURRENCY_LOCAL_SIZE = config('WOOCOMMERCE_CURRENCY_LOCAL_SIZE', default=256, cast=int)  # client names per process
+TENANT_SCOPE_CACHE_TTL = config('TENANT_SCOPE_CACHE_TTL', default=3600, cast=int)  # seconds, per user
+
+# WooCommerce API client
+WOOCOMMERCE_MAX_CONCURRENT_PAGES = config('WOOCOMMERCE_MAX_CONCURRENT_PAGES', default=4, cast=int)  # per store
+WOOCOMMERCE_REQUEST_TIMEOUT = config('WOOCOMMERCE_REQUEST_TIMEOUT', default=60, cast=int)  # read timeout, seconds
+WOOCOMMERCE_SYNC_LOG_BUFFER_SIZE = config('WOOCOMMERCE_SYNC_LOG_BUFFER_SIZE', default=100, cast=int)  # log rows per bulk INSERT
+WOOCOMMERCE_SYNC_LOG_FLUSH_SECONDS = config('WOOCOMMERCE_SYNC_LOG_FLUSH_SECONDS', default=5, cast=int)  # max time a log row waits
+
+# GA4 / Search Console sync
+GOOGLE_PIPELINES_UPSERT_BATCH_SIZE = config('GOOGLE_PIPELINES_UPSERT_BATCH_SIZE', default=2000, cast=int)  # rows per INSERT ... ON CONFLICT
+GOOGLE_BACKFILL_SHARD_DAYS = config('GOOGLE_BACKFILL_SHARD_DAYS', default=7, cast=int)  # days per backfill shard
+GOOGLE_BACKFILL_MAX_CONCURRENCY = config('GOOGLE_BACKFILL_MAX_CONCURRENCY', default=4, cast=int)  # shards in flight per property
+GOOGLE_PARTITION_MONTHS_AHEAD = config('GOOGLE_PARTITION_MONTHS_AHEAD', default=3, cast=int)  # monthly partitions created ahead
+GOOGLE_RAW_RETENTION_MONTHS = config('GOOGLE_RAW_RETENTION_MONTHS', default=0, cast=int)  # raw GA4/GSC months kept; 0 keeps all
+
+# Log retention (days; 0 keeps everything). Expired rows are summarised into LogDailySummary
+WOOCOMMERCE_SYNC_LOG_RETENTION_DAYS = config('WOOCOMMERCE_SYNC_LOG_RETENTION_DAYS', default=30, cast=int)
+WOOCOMMERCE_SYNC_LOG_DETAILS_RETENTION_DAYS = config('WOOCOMMERCE_SYNC_LOG_DETAILS_RETENTION_DAYS', default=7, cast=int)  # details cleared after
+PIPELINE_LOG_RETENTION_DAYS = config('PIPELINE_LOG_RETENTION_DAYS', default=90, cast=int)
+LOGIN_EVENT_RETENTION_DAYS = config('LOGIN_EVENT_RETENTION_DAYS', default=180, cast=int)
+LOG_RETENTION_CHUNK_SIZE = config('LOG_RETENTION_CHUNK_SIZE', default=5000, cast=int)  # rows per delete transaction
+LOG_RETENTION_CHUNK_PAUSE = config('LOG_RETENTION_CHUNK_PAUSE', default=0.1, cast=float)  # seconds between chunks
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
@@ -1,3 +1,11 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import LogDailySummary
+
+
+@admin.register(LogDailySummary)
+class LogDailySummaryAdmin(admin.ModelAdmin):
+    list_display = ['date', 'source', 'scope', 'level', 'count']
+    list_filter = ['source', 'level', 'date']
+    search_fields = ['scope']
+    date_hierarchy = 'date'
@@ -0,0 +1,30 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LogDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('woocommerce_sync_log', 'WooCommerce sync log'), ('pipeline_log', 'Pipeline log'), ('login_event', 'Login event')], max_length=50)),
+                ('date', models.DateField()),
+                ('scope', models.CharField(blank=True, default='', max_length=255)),
+                ('level', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'log_daily_summaries',
+                'ordering': ['-date'],
+                'constraints': [
+                    models.UniqueConstraint(fields=('source', 'date', 'scope', 'level'), name='log_daily_summary_unique_dims'),
+                ],
+            },
+        ),
+    ]
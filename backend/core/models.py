@@ -16,3 +16,35 @@ class Setting(models.Model):
 
     def __str__(self):
         return self.key
+
+
+class LogDailySummary(models.Model):
+    """
+    Daily counts of log rows removed by core.retention, so activity stays
+    reportable after the detailed rows expire.
+    """
+    SOURCE_CHOICES = [
+        ('woocommerce_sync_log', 'WooCommerce sync log'),
+        ('pipeline_log', 'Pipeline log'),
+        ('login_event', 'Login event'),
+    ]
+
+    source = models.CharField(max_length=50, choices=SOURCE_CHOICES)
+    date = models.DateField()
+    scope = models.CharField(max_length=255, blank=True, default='')  # client name, pipeline id or user id
+    level = models.CharField(max_length=20)  # log level, or 'success'/'failed' for login events
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'log_daily_summaries'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source', 'date', 'scope', 'level'],
+                name='log_daily_summary_unique_dims',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.date} | {self.source} | {self.scope or '-'} {self.level}: {self.count}"
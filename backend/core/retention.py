@@ -0,0 +1,166 @@
+"""
+Retention for the high-volume log tables.
+
+Each policy gives a table a TTL in days (0 keeps everything).  Expired rows
+are counted into LogDailySummary per day, scope and level and then deleted,
+one chunk per short transaction, so the job never holds long locks or
+builds one huge DELETE.  Cutoffs fall on midnight, so whole days expire
+together.
+
+WooCommerce sync log rows are also compacted before they expire: their
+``details`` payload is cleared after a shorter TTL.
+"""
+import logging
+import time
+from datetime import datetime, time as dt_time, timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import LogDailySummary
+
+logger = logging.getLogger(__name__)
+
+# Summary source -> model, timestamp field, TTL setting and summary dimensions
+RETENTION_POLICIES = {
+    'woocommerce_sync_log': {
+        'model': 'woocommerce.WooCommerceSyncLog',
+        'timestamp': 'created_at',
+        'ttl_setting': 'WOOCOMMERCE_SYNC_LOG_RETENTION_DAYS',
+        'scope': F('client_name'),
+        'level': F('level'),
+    },
+    'pipeline_log': {
+        'model': 'pipelines.PipelineLog',
+        'timestamp': 'created_at',
+        'ttl_setting': 'PIPELINE_LOG_RETENTION_DAYS',
+        'scope': F('pipeline_id'),
+        'level': F('level'),
+    },
+    'login_event': {
+        'model': 'authentication.LoginEvent',
+        'timestamp': 'timestamp',
+        'ttl_setting': 'LOGIN_EVENT_RETENTION_DAYS',
+        'scope': F('user_id'),
+        'level': Case(
+            When(success=True, then=Value('success')),
+            default=Value('failed'),
+            output_field=CharField(),
+        ),
+    },
+}
+
+
+def retention_cutoff(days, now=None):
+    """Midnight (current timezone) *days* days before *now*."""
+    now = now or timezone.now()
+    day = timezone.localdate(now) - timedelta(days=days)
+    return timezone.make_aware(datetime.combine(day, dt_time.min))
+
+
+def _in_chunks(qs, chunk_size, handle):
+    """
+    Call handle(pks) on up to *chunk_size* primary keys of *qs* at a time,
+    each chunk in its own transaction, until *qs* is empty.  *handle* must
+    remove the rows from *qs*.  Returns the sum of its results.
+    """
+    total = 0
+    while True:
+        with transaction.atomic():
+            pks = list(qs.values_list('pk', flat=True)[:chunk_size])
+            if not pks:
+                return total
+            total += handle(pks)
+        pause = settings.LOG_RETENTION_CHUNK_PAUSE
+        if pause:
+            time.sleep(pause)
+
+
+def _summarise(source, policy, rows):
+    """Add *rows* (a queryset) to LogDailySummary; returns the rows counted."""
+    groups = (
+        rows
+        .annotate(
+            summary_date=TruncDate(policy['timestamp']),
+            summary_scope=policy['scope'],
+            summary_level=policy['level'],
+        )
+        .values('summary_date', 'summary_scope', 'summary_level')
+        .annotate(summary_count=Count('pk'))
+        .order_by()
+    )
+    counted = 0
+    for group in groups:
+        key = {
+            'source': source,
+            'date': group['summary_date'],
+            'scope': '' if group['summary_scope'] is None else str(group['summary_scope']),
+            'level': group['summary_level'],
+        }
+        count = group['summary_count']
+        if not LogDailySummary.objects.filter(**key).update(count=F('count') + count):
+            LogDailySummary.objects.create(**key, count=count)
+        counted += count
+    return counted
+
+
+def purge_expired(source, now=None, chunk_size=None):
+    """
+    Summarise and delete *source*'s rows older than its TTL.
+
+    Each chunk is summarised and deleted in the same transaction, so an
+    interrupted run never counts a row twice.  Returns the rows deleted.
+    """
+    policy = RETENTION_POLICIES[source]
+    days = getattr(settings, policy['ttl_setting'])
+    if days <= 0:
+        return 0
+
+    model = apps.get_model(policy['model'])
+    chunk_size = chunk_size or settings.LOG_RETENTION_CHUNK_SIZE
+    expired = model.objects.filter(**{f"{policy['timestamp']}__lt": retention_cutoff(days, now)})
+
+    def summarise_and_delete(pks):
+        rows = model.objects.filter(pk__in=pks)
+        _summarise(source, policy, rows)
+        return rows.delete()[0]
+
+    deleted = _in_chunks(expired, chunk_size, summarise_and_delete)
+
+    if deleted:
+        logger.info('Purged %d expired %s rows', deleted, source)
+    return deleted
+
+
+def compact_sync_log_details(now=None, chunk_size=None):
+    """
+    Clear ``details`` on WooCommerce sync log rows older than
+    WOOCOMMERCE_SYNC_LOG_DETAILS_RETENTION_DAYS.  Returns the rows compacted.
+    """
+    days = settings.WOOCOMMERCE_SYNC_LOG_DETAILS_RETENTION_DAYS
+    if days <= 0:
+        return 0
+
+    model = apps.get_model('woocommerce.WooCommerceSyncLog')
+    chunk_size = chunk_size or settings.LOG_RETENTION_CHUNK_SIZE
+    stale = model.objects.filter(created_at__lt=retention_cutoff(days, now)).exclude(details={})
+
+    compacted = _in_chunks(
+        stale, chunk_size, lambda pks: model.objects.filter(pk__in=pks).update(details={}),
+    )
+
+    if compacted:
+        logger.info('Compacted details on %d WooCommerce sync log rows', compacted)
+    return compacted
+
+
+def apply_retention(now=None, chunk_size=None):
+    """Run compaction and every retention policy; returns counts per table."""
+    results = {'woocommerce_sync_log_compacted': compact_sync_log_details(now, chunk_size)}
+    for source in RETENTION_POLICIES:
+        results[source] = purge_expired(source, now, chunk_size)
+    return results
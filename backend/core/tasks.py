@@ -0,0 +1,15 @@
+import logging
+
+from celery import shared_task
+
+from .retention import apply_retention
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def apply_log_retention():
+    """Compact and purge expired sync logs, pipeline logs and login events."""
+    results = apply_retention()
+    logger.info('Log retention: %s', results)
+    return results
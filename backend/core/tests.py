@@ -1,3 +1,85 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from authentication.models import LoginEvent
+from users.models import User
+from woocommerce.models import WooCommerceSyncLog
+
+from .models import LogDailySummary
+from .retention import apply_retention, compact_sync_log_details, purge_expired, retention_cutoff
+
+NOW = timezone.make_aware(datetime(2025, 6, 30, 15, 0))
+
+
+def sync_log(client_name, level='INFO', age_days=0, details=None):
+    log = WooCommerceSyncLog.objects.create(
+        client_name=client_name, level=level, message='page', details={'page': 1} if details is None else details,
+    )
+    WooCommerceSyncLog.objects.filter(pk=log.pk).update(created_at=NOW - timedelta(days=age_days))
+    return log
+
+
+@override_settings(
+    LOG_RETENTION_CHUNK_PAUSE=0,
+    WOOCOMMERCE_SYNC_LOG_RETENTION_DAYS=30,
+    WOOCOMMERCE_SYNC_LOG_DETAILS_RETENTION_DAYS=7,
+    LOGIN_EVENT_RETENTION_DAYS=180,
+)
+class RetentionTests(TestCase):
+    def summaries(self, source):
+        return {
+            (summary.scope, summary.level): summary.count
+            for summary in LogDailySummary.objects.filter(source=source)
+        }
+
+    def test_cutoff_is_midnight(self):
+        self.assertEqual(retention_cutoff(30, NOW), timezone.make_aware(datetime(2025, 5, 31)))
+
+    def test_purge_summarises_and_deletes_in_chunks(self):
+        for _ in range(3):
+            sync_log('Porsa', age_days=40)
+        sync_log('Porsa', level='ERROR', age_days=40)
+        sync_log('Other', age_days=31)
+        recent = sync_log('Porsa', age_days=29)
+
+        self.assertEqual(purge_expired('woocommerce_sync_log', now=NOW, chunk_size=2), 5)
+
+        self.assertEqual(list(WooCommerceSyncLog.objects.values_list('pk', flat=True)), [recent.pk])
+        self.assertEqual(
+            self.summaries('woocommerce_sync_log'),
+            {('Porsa', 'INFO'): 3, ('Porsa', 'ERROR'): 1, ('Other', 'INFO'): 1},
+        )
+
+        # A later run adds to the same day's counts
+        sync_log('Porsa', age_days=40)
+        self.assertEqual(purge_expired('woocommerce_sync_log', now=NOW, chunk_size=2), 1)
+        self.assertEqual(self.summaries('woocommerce_sync_log')[('Porsa', 'INFO')], 4)
+
+    @override_settings(WOOCOMMERCE_SYNC_LOG_RETENTION_DAYS=0)
+    def test_zero_ttl_keeps_everything(self):
+        sync_log('Porsa', age_days=4000)
+        self.assertEqual(purge_expired('woocommerce_sync_log', now=NOW), 0)
+        self.assertEqual(WooCommerceSyncLog.objects.count(), 1)
+
+    def test_compaction_clears_old_details(self):
+        old = sync_log('Porsa', age_days=8)
+        sync_log('Porsa', age_days=9, details={})
+        recent = sync_log('Porsa', age_days=6)
+
+        self.assertEqual(compact_sync_log_details(now=NOW, chunk_size=1), 1)
+        old.refresh_from_db()
+        recent.refresh_from_db()
+        self.assertEqual((old.details, recent.details), ({}, {'page': 1}))
+
+    def test_login_events_summarised_by_outcome(self):
+        user = User.objects.create_user(username='anna', email='anna@example.com', password='pass')
+        for success in (True, True, False):
+            event = LoginEvent.objects.create(user=user, success=success)
+            LoginEvent.objects.filter(pk=event.pk).update(timestamp=NOW - timedelta(days=200))
+
+        results = apply_retention(now=NOW, chunk_size=2)
+
+        self.assertEqual(results['login_event'], 3)
+        self.assertEqual(self.summaries('login_event'), {(str(user.pk), 'success'): 2, (str(user.pk), 'failed'): 1})
@@ -82,7 +82,7 @@ def main():
             return
         
         # Get sample orders
-        sample_orders = WooCommerceOrder.objects.all()[:3]
+        sample_orders = WooCommerceOrder.objects.with_payload()[:3]
         print(f"\nExamining {len(sample_orders)} sample orders:")
         
         for i, order in enumerate(sample_orders):
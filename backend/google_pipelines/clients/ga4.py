@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Iterator
 from datetime import date
 
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
@@ -52,6 +53,8 @@ DIMENSION_FIELD_MAP = {
     'country': 'country',
 }
 
+FLOAT_METRICS = ('engagement_rate', 'purchase_revenue')
+
 ROW_LIMIT = 100_000  # GA4 maximum rows per request
 
 
@@ -73,17 +76,43 @@ def _build_client():
     return BetaAnalyticsDataClient(credentials=credentials)
 
 
-def fetch_ga4_report(property_id: str, start_date: date, end_date: date) -> list[dict]:
+def _row_parser(response):
     """
-    Fetch a GA4 report for the given property and date range.
+    Build a parser for the rows of one GA4 response.
 
-    Returns a list of dicts with snake_case keys matching GA4Daily model fields.
-    Handles pagination via offset for results exceeding 100k rows.
+    Header → field lookups are resolved once per response rather than per row.
+    """
+    dimension_fields = [DIMENSION_FIELD_MAP[header.name] for header in response.dimension_headers]
+    metric_fields = [
+        (METRIC_FIELD_MAP[header.name], float if METRIC_FIELD_MAP[header.name] in FLOAT_METRICS else int)
+        for header in response.metric_headers
+    ]
+
+    def parse(row):
+        record = {}
+        for field, value in zip(dimension_fields, row.dimension_values):
+            record[field] = _parse_ga4_date(value.value) if field == 'date' else _clean_value(value.value)
+        for (field, cast), value in zip(metric_fields, row.metric_values):
+            record[field] = cast(value.value)
+        return record
+
+    return parse
+
+
+def iter_ga4_report(property_id: str, start_date: date, end_date: date, stats: dict | None = None) -> Iterator[dict]:
+    """
+    Yield GA4 report rows for the given property and date range.
+
+    Rows are dicts with snake_case keys matching GA4Daily model fields.
+    Pages of up to 100k rows are requested via offset and yielded as they
+    arrive, so only one page is held in memory at a time.  A *stats* dict,
+    if given, accumulates the serialized response size in ``bytes_fetched``
+    and the responses read in ``pages``.
     """
     client = _build_client()
     property_name = f'properties/{property_id}'
 
-    all_rows = []
+    row_count = 0
     offset = 0
 
     while True:
@@ -100,31 +129,14 @@ def fetch_ga4_report(property_id: str, start_date: date, end_date: date) -> list
         )
 
         response = client.run_report(request)
+        if stats is not None:
+            stats['bytes_fetched'] = stats.get('bytes_fetched', 0) + type(response).pb(response).ByteSize()
+            stats['pages'] = stats.get('pages', 0) + 1
+        parse = _row_parser(response)
 
         for row in response.rows:
-            record = {}
-
-            # Dimensions
-            for i, dim_header in enumerate(response.dimension_headers):
-                field = DIMENSION_FIELD_MAP[dim_header.name]
-                raw = row.dimension_values[i].value
-
-                if field == 'date':
-                    record[field] = _parse_ga4_date(raw)
-                else:
-                    record[field] = _clean_value(raw)
-
-            # Metrics
-            for i, met_header in enumerate(response.metric_headers):
-                field = METRIC_FIELD_MAP[met_header.name]
-                raw = row.metric_values[i].value
-
-                if field in ('engagement_rate', 'purchase_revenue'):
-                    record[field] = float(raw)
-                else:
-                    record[field] = int(raw)
-
-            all_rows.append(record)
+            yield parse(row)
+        row_count += len(response.rows)
 
         # Check if there are more pages
         if len(response.rows) < ROW_LIMIT:
@@ -133,9 +145,8 @@ def fetch_ga4_report(property_id: str, start_date: date, end_date: date) -> list
 
     logger.info(
         'Fetched %d rows from GA4 property %s (%s to %s)',
-        len(all_rows), property_id, start_date, end_date,
+        row_count, property_id, start_date, end_date,
     )
-    return all_rows
 
 
 def test_ga4_connection(property_id: str) -> tuple[bool, str]:
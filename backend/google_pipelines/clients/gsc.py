@@ -1,4 +1,6 @@
+import json
 import logging
+from collections.abc import Iterator
 from datetime import date, timedelta
 
 from googleapiclient.discovery import build
@@ -16,15 +18,18 @@ def _build_client():
     return build('searchconsole', 'v1', credentials=credentials)
 
 
-def fetch_gsc_search_data(site_url: str, start_date: date, end_date: date) -> list[dict]:
+def iter_gsc_search_data(site_url: str, start_date: date, end_date: date, stats: dict | None = None) -> Iterator[dict]:
     """
-    Fetch GSC search analytics for the given site and date range.
+    Yield GSC search analytics rows for the given site and date range.
 
-    Paginates via startRow (25k rows per page).
-    Returns a list of dicts with keys: date, query, page, clicks, impressions, ctr, position.
+    Paginates via startRow (25k rows per page), yielding each page's rows
+    before the next is requested.
+    Rows are dicts with keys: date, query, page, clicks, impressions, ctr, position.
+    A *stats* dict, if given, accumulates the JSON response size in ``bytes_fetched``
+    and the responses read in ``pages``.
     """
     service = _build_client()
-    all_rows = []
+    row_count = 0
     start_row = 0
 
     while True:
@@ -39,6 +44,9 @@ def fetch_gsc_search_data(site_url: str, start_date: date, end_date: date) -> li
         response = service.searchanalytics().query(
             siteUrl=site_url, body=body,
         ).execute()
+        if stats is not None:
+            stats['bytes_fetched'] = stats.get('bytes_fetched', 0) + len(json.dumps(response))
+            stats['pages'] = stats.get('pages', 0) + 1
 
         rows = response.get('rows', [])
         if not rows:
@@ -46,7 +54,7 @@ def fetch_gsc_search_data(site_url: str, start_date: date, end_date: date) -> li
 
         for row in rows:
             keys = row['keys']
-            all_rows.append({
+            yield {
                 'query': keys[0],
                 'page': keys[1],
                 'date': date.fromisoformat(keys[2]),
@@ -54,7 +62,8 @@ def fetch_gsc_search_data(site_url: str, start_date: date, end_date: date) -> li
                 'impressions': row['impressions'],
                 'ctr': row['ctr'],
                 'position': row['position'],
-            })
+            }
+        row_count += len(rows)
 
         if len(rows) < ROW_LIMIT:
             break
@@ -62,9 +71,8 @@ def fetch_gsc_search_data(site_url: str, start_date: date, end_date: date) -> li
 
     logger.info(
         'Fetched %d rows from GSC site %s (%s to %s)',
-        len(all_rows), site_url, start_date, end_date,
+        row_count, site_url, start_date, end_date,
     )
-    return all_rows
 
 
 def test_gsc_connection(site_url: str) -> tuple[bool, str]:
@@ -0,0 +1,50 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from google_pipelines.models import GA4Daily, GSCSearchData
+from google_pipelines.rollups import rebuild_rollups
+
+SOURCES = {
+    'ga4': GA4Daily,
+    'gsc': GSCSearchData,
+}
+
+
+class Command(BaseCommand):
+    help = "Rebuild the GA4/GSC daily rollups from ga4_daily and gsc_search_data"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            choices=sorted(SOURCES),
+            help='Only rebuild this source (default: both)'
+        )
+        parser.add_argument(
+            '--config-id',
+            type=int,
+            help='Only rebuild this account configuration'
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only rebuild days on or after this date (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **options):
+        since = options.get('since')
+        if since:
+            try:
+                since = date.fromisoformat(since)
+            except ValueError:
+                raise CommandError(f'Invalid --since date: {since}')
+
+        sources = [options['source']] if options.get('source') else sorted(SOURCES)
+        for source in sources:
+            results = rebuild_rollups(SOURCES[source], config_id=options.get('config_id'), since=since)
+
+            for config_id, rows in results.items():
+                self.stdout.write(f'{source} config {config_id}: {rows} rollup rows')
+            self.stdout.write(
+                self.style.SUCCESS(f'Rebuilt {source} rollups for {len(results)} configurations')
+            )
@@ -0,0 +1,163 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Trigram GIN indexes backing the icontains search on GSC query/page text.
+# PostgreSQL only; other backends (the SQLite test database) skip them.
+TRIGRAM_INDEXES = [
+    ('gsc_search_query_trgm', 'gsc_search_data', 'query'),
+    ('gsc_search_page_trgm', 'gsc_search_data', 'page'),
+    ('gsc_query_daily_query_trgm', 'gsc_query_daily', 'query'),
+    ('gsc_page_daily_page_trgm', 'gsc_page_daily', 'page'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+def rollup_fields(*dimensions, metrics):
+    return [
+        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+        ('date', models.DateField()),
+        *dimensions,
+        *metrics,
+        ('row_count', models.IntegerField(default=0)),
+        ('updated_at', models.DateTimeField(auto_now=True)),
+    ]
+
+
+def ga4_metrics():
+    return [
+        ('sessions', models.BigIntegerField(default=0)),
+        ('total_users', models.BigIntegerField(default=0)),
+        ('new_users', models.BigIntegerField(default=0)),
+        ('engaged_sessions', models.BigIntegerField(default=0)),
+        ('conversions', models.BigIntegerField(default=0)),
+        ('purchase_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+        ('engagement_rate_sum', models.FloatField(default=0)),
+    ]
+
+
+def gsc_metrics():
+    return [
+        ('clicks', models.BigIntegerField(default=0)),
+        ('impressions', models.BigIntegerField(default=0)),
+        ('ctr_sum', models.FloatField(default=0)),
+        ('position_sum', models.FloatField(default=0)),
+    ]
+
+
+def config_fk(related_name):
+    return ('account_configuration', models.ForeignKey(
+        on_delete=django.db.models.deletion.CASCADE,
+        related_name=related_name,
+        to='users.accountconfiguration',
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('google_pipelines', '0002_gscsearchdata'),
+        ('users', '0009_add_company_currency_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GA4DailyTotal',
+            fields=rollup_fields(config_fk('ga4_daily_totals'), metrics=ga4_metrics()),
+            options={
+                'db_table': 'ga4_daily_total',
+                'ordering': ['-date'],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('account_configuration', 'date'),
+                        name='ga4_daily_total_unique_day',
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='GA4SourceMediumDaily',
+            fields=rollup_fields(
+                config_fk('ga4_source_medium_rollups'),
+                ('source', models.CharField(default='', max_length=255)),
+                ('medium', models.CharField(default='', max_length=255)),
+                metrics=ga4_metrics(),
+            ),
+            options={
+                'db_table': 'ga4_source_medium_daily',
+                'ordering': ['-date'],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('account_configuration', 'date', 'source', 'medium'),
+                        name='ga4_source_medium_unique_dims',
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='GSCDailyTotal',
+            fields=rollup_fields(config_fk('gsc_daily_totals'), metrics=gsc_metrics()),
+            options={
+                'db_table': 'gsc_daily_total',
+                'ordering': ['-date'],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('account_configuration', 'date'),
+                        name='gsc_daily_total_unique_day',
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='GSCQueryDaily',
+            fields=rollup_fields(
+                config_fk('gsc_query_rollups'),
+                ('query', models.CharField(default='', max_length=500)),
+                metrics=gsc_metrics(),
+            ),
+            options={
+                'db_table': 'gsc_query_daily',
+                'ordering': ['-date'],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('account_configuration', 'date', 'query'),
+                        name='gsc_query_daily_unique_dims',
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='GSCPageDaily',
+            fields=rollup_fields(
+                config_fk('gsc_page_rollups'),
+                ('page', models.URLField(default='', max_length=2048)),
+                metrics=gsc_metrics(),
+            ),
+            options={
+                'db_table': 'gsc_page_daily',
+                'ordering': ['-date'],
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('account_configuration', 'date', 'page'),
+                        name='gsc_page_daily_unique_dims',
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,145 @@
+"""
+Range-partition gsc_search_data and ga4_daily by month (PostgreSQL only).
+
+Each table is rebuilt as ``PARTITION BY RANGE (date)`` with one partition
+per month from its earliest row through three months ahead, and its rows
+copied across.  A partitioned table's primary key and unique constraints
+must include the partition key, so the primary key becomes (id, date);
+the existing unique constraints already include date.  The reverse
+rebuilds plain tables the same way.
+
+Other backends (the SQLite test database) keep plain tables.
+"""
+from datetime import date
+
+from django.db import migrations
+
+MONTHS_AHEAD = 3
+
+TABLES = {
+    'gsc_search_data': {
+        'unique': ('gsc_search_unique_dims', ['account_configuration_id', 'date', 'query', 'page']),
+        'indexes': [
+            ('gsc_search_config_date', ['account_configuration_id', 'date']),
+            ('gsc_search_date', ['date']),
+        ],
+        'trigram': [
+            ('gsc_search_query_trgm', 'query'),
+            ('gsc_search_page_trgm', 'page'),
+        ],
+    },
+    'ga4_daily': {
+        'unique': ('ga4_daily_unique_dims', [
+            'account_configuration_id', 'date', 'source', 'medium',
+            'campaign', 'device_category', 'country',
+        ]),
+        'indexes': [
+            ('ga4_daily_config_date', ['account_configuration_id', 'date']),
+            ('ga4_daily_date', ['date']),
+        ],
+        'trigram': [],
+    },
+}
+
+
+def _next_month(day):
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def _months(start, end):
+    month = start.replace(day=1)
+    while month <= end:
+        yield month
+        month = _next_month(month)
+
+
+def _rebuild(schema_editor, config_table, table, partitioned):
+    execute = schema_editor.execute
+    old = f'{table}_rebuild_old'
+    spec = TABLES[table]
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT attidentity <> '' FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attname = 'id'
+            """,
+            [table],
+        )
+        identity = cursor.fetchone()[0]
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", [table])
+        sequence = cursor.fetchone()[0]
+        cursor.execute(f'SELECT MIN(date) FROM {table}')
+        first = cursor.fetchone()[0]
+
+    execute(f'ALTER TABLE {table} RENAME TO {old}')
+    execute(
+        f'CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING IDENTITY)'
+        + (' PARTITION BY RANGE (date)' if partitioned else '')
+    )
+    if not identity:
+        # serial column: keep its sequence alive when the old table is dropped
+        execute(f'ALTER SEQUENCE {sequence} OWNED BY {table}.id')
+
+    if partitioned:
+        today = date.today()
+        last = today.replace(day=1)
+        for _ in range(MONTHS_AHEAD):
+            last = _next_month(last)
+        for month in _months(min(first or today, today), last):
+            execute(
+                f'CREATE TABLE {table}_p{month:%Y%m} PARTITION OF {table} '
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+            )
+
+    execute(f'INSERT INTO {table} OVERRIDING SYSTEM VALUE SELECT * FROM {old}')
+    execute(f'DROP TABLE {old}')
+    if identity:
+        execute(
+            f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+            f'COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)'
+        )
+
+    pk = '(id, date)' if partitioned else '(id)'
+    execute(f'ALTER TABLE {table} ADD CONSTRAINT {table}_pkey PRIMARY KEY {pk}')
+    unique_name, unique_columns = spec['unique']
+    execute(f'ALTER TABLE {table} ADD CONSTRAINT {unique_name} UNIQUE ({", ".join(unique_columns)})')
+    for name, columns in spec['indexes']:
+        execute(f'CREATE INDEX {name} ON {table} ({", ".join(columns)})')
+    for name, column in spec['trigram']:
+        execute(f'CREATE INDEX {name} ON {table} USING gin ({column} gin_trgm_ops)')
+    execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {table}_account_configuration_id_fk '
+        f'FOREIGN KEY (account_configuration_id) REFERENCES {config_table} (id) '
+        f'DEFERRABLE INITIALLY DEFERRED'
+    )
+
+
+def _rebuild_all(apps, schema_editor, partitioned):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    config_table = apps.get_model('users', 'AccountConfiguration')._meta.db_table
+    for table in TABLES:
+        _rebuild(schema_editor, config_table, table, partitioned)
+
+
+def partition_tables(apps, schema_editor):
+    _rebuild_all(apps, schema_editor, partitioned=True)
+
+
+def unpartition_tables(apps, schema_editor):
+    _rebuild_all(apps, schema_editor, partitioned=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('google_pipelines', '0003_daily_rollups'),
+        ('users', '0009_add_company_currency_code'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_tables, unpartition_tables),
+    ]
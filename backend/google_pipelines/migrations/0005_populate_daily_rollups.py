@@ -0,0 +1,27 @@
+"""
+Build the GA4 and GSC daily rollups from the report rows already stored, so
+the reports that read them have the full history as soon as this is
+deployed.  Each configuration is rebuilt in month-sized chunks, each chunk
+in its own transaction, so the tables stay writable while it runs.
+"""
+from django.db import migrations
+
+
+def populate_rollups(apps, schema_editor):
+    from google_pipelines.rollups import rebuild_rollups
+
+    for model_name in ('GA4Daily', 'GSCSearchData'):
+        rebuild_rollups(apps.get_model('google_pipelines', model_name), apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('google_pipelines', '0004_partition_report_tables'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
@@ -3,7 +3,11 @@ from users.models import AccountConfiguration
 
 
 class GSCSearchData(models.Model):
-    """Google Search Console search analytics data, one row per query+page+date."""
+    """
+    Google Search Console search analytics data, one row per query+page+date.
+
+    Range-partitioned by month on PostgreSQL; see google_pipelines.partitions.
+    """
 
     account_configuration = models.ForeignKey(
         AccountConfiguration,
@@ -56,7 +60,11 @@ class GSCSearchData(models.Model):
 
 
 class GA4Daily(models.Model):
-    """Daily GA4 analytics data, one row per dimension combination per day."""
+    """
+    Daily GA4 analytics data, one row per dimension combination per day.
+
+    Range-partitioned by month on PostgreSQL; see google_pipelines.partitions.
+    """
 
     account_configuration = models.ForeignKey(
         AccountConfiguration,
@@ -115,3 +123,178 @@ class GA4Daily(models.Model):
             if getattr(self, field) is None:
                 setattr(self, field, '')
         super().save(*args, **kwargs)
+
+
+# --- Daily rollups -------------------------------------------------------
+# Pre-aggregated from ga4_daily / gsc_search_data by google_pipelines.rollups
+# after each sync.  Averages are kept as a sum plus the raw row count so
+# they stay exact across any date range.
+
+class GA4DailyTotal(models.Model):
+    """GA4 totals per configuration per day."""
+
+    account_configuration = models.ForeignKey(
+        AccountConfiguration,
+        on_delete=models.CASCADE,
+        related_name='ga4_daily_totals',
+    )
+    date = models.DateField()
+
+    sessions = models.BigIntegerField(default=0)
+    total_users = models.BigIntegerField(default=0)
+    new_users = models.BigIntegerField(default=0)
+    engaged_sessions = models.BigIntegerField(default=0)
+    conversions = models.BigIntegerField(default=0)
+    purchase_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    engagement_rate_sum = models.FloatField(default=0)
+    row_count = models.IntegerField(default=0)  # ga4_daily rows in the day
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ga4_daily_total'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account_configuration', 'date'],
+                name='ga4_daily_total_unique_day',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date} | {self.account_configuration_id}: {self.sessions} sessions'
+
+
+class GA4SourceMediumDaily(models.Model):
+    """GA4 totals per configuration per day per source/medium."""
+
+    account_configuration = models.ForeignKey(
+        AccountConfiguration,
+        on_delete=models.CASCADE,
+        related_name='ga4_source_medium_rollups',
+    )
+    date = models.DateField()
+    source = models.CharField(max_length=255, default='')
+    medium = models.CharField(max_length=255, default='')
+
+    sessions = models.BigIntegerField(default=0)
+    total_users = models.BigIntegerField(default=0)
+    new_users = models.BigIntegerField(default=0)
+    engaged_sessions = models.BigIntegerField(default=0)
+    conversions = models.BigIntegerField(default=0)
+    purchase_revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    engagement_rate_sum = models.FloatField(default=0)
+    row_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'ga4_source_medium_daily'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account_configuration', 'date', 'source', 'medium'],
+                name='ga4_source_medium_unique_dims',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date} | {self.source}/{self.medium} | {self.account_configuration_id}'
+
+
+class GSCDailyTotal(models.Model):
+    """GSC totals per configuration per day."""
+
+    account_configuration = models.ForeignKey(
+        AccountConfiguration,
+        on_delete=models.CASCADE,
+        related_name='gsc_daily_totals',
+    )
+    date = models.DateField()
+
+    clicks = models.BigIntegerField(default=0)
+    impressions = models.BigIntegerField(default=0)
+    ctr_sum = models.FloatField(default=0)
+    position_sum = models.FloatField(default=0)
+    row_count = models.IntegerField(default=0)  # gsc_search_data rows in the day
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'gsc_daily_total'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account_configuration', 'date'],
+                name='gsc_daily_total_unique_day',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date} | {self.account_configuration_id}: {self.clicks} clicks'
+
+
+class GSCQueryDaily(models.Model):
+    """GSC totals per configuration per day per query, across pages."""
+
+    account_configuration = models.ForeignKey(
+        AccountConfiguration,
+        on_delete=models.CASCADE,
+        related_name='gsc_query_rollups',
+    )
+    date = models.DateField()
+    query = models.CharField(max_length=500, default='')
+
+    clicks = models.BigIntegerField(default=0)
+    impressions = models.BigIntegerField(default=0)
+    ctr_sum = models.FloatField(default=0)
+    position_sum = models.FloatField(default=0)
+    row_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'gsc_query_daily'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account_configuration', 'date', 'query'],
+                name='gsc_query_daily_unique_dims',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date} | {self.query[:50]} | {self.account_configuration_id}'
+
+
+class GSCPageDaily(models.Model):
+    """GSC totals per configuration per day per page, across queries."""
+
+    account_configuration = models.ForeignKey(
+        AccountConfiguration,
+        on_delete=models.CASCADE,
+        related_name='gsc_page_rollups',
+    )
+    date = models.DateField()
+    page = models.URLField(max_length=2048, default='')
+
+    clicks = models.BigIntegerField(default=0)
+    impressions = models.BigIntegerField(default=0)
+    ctr_sum = models.FloatField(default=0)
+    position_sum = models.FloatField(default=0)
+    row_count = models.IntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'gsc_page_daily'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account_configuration', 'date', 'page'],
+                name='gsc_page_daily_unique_dims',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.date} | {self.page[:50]} | {self.account_configuration_id}'
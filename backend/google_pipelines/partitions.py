@@ -0,0 +1,143 @@
+"""
+Monthly range partitions of the GA4 and GSC report tables.
+
+On PostgreSQL, gsc_search_data and ga4_daily are declaratively partitioned
+by RANGE (date), one partition per calendar month named ``<table>_pYYYYMM``
+(see migration 0004).  Date-bounded queries only scan the months they
+touch, and retention drops whole partitions instead of DELETEing rows.
+
+Partitions must exist before rows for their month are written: syncs and
+backfill shards call ensure_partitions() for their date range, and
+maintain_google_partitions creates the coming months ahead of time.
+
+Other database backends keep plain tables and every function here is a
+no-op.
+"""
+import logging
+from datetime import date
+
+from django.db import connection
+
+from .models import GA4Daily, GSCSearchData
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_MODELS = (GSCSearchData, GA4Daily)
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def next_month(day):
+    if day.month == 12:
+        return date(day.year + 1, 1, 1)
+    return date(day.year, day.month + 1, 1)
+
+
+def add_months(day, months):
+    month = day.year * 12 + day.month - 1 + months
+    return date(month // 12, month % 12 + 1, 1)
+
+
+def partition_name(table, month):
+    return f'{table}_p{month:%Y%m}'
+
+
+def iter_months(start, end):
+    """First day of every month from start's month to end's month inclusive."""
+    month = month_start(start)
+    while month <= end:
+        yield month
+        month = next_month(month)
+
+
+def create_partition_sql(table, month):
+    return (
+        f'CREATE TABLE IF NOT EXISTS {partition_name(table, month)} '
+        f'PARTITION OF {table} '
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+    )
+
+
+def is_partitioned(model):
+    """Whether *model*'s table is a partitioned table in this database."""
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)',
+            [model._meta.db_table],
+        )
+        return cursor.fetchone() is not None
+
+
+def existing_partitions(model):
+    """{month: partition name} for *model*'s attached partitions."""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    prefix = f'{table}_p'
+    partitions = {}
+    for name in names:
+        suffix = name[len(prefix):]
+        if name.startswith(prefix) and len(suffix) == 6 and suffix.isdigit():
+            partitions[date(int(suffix[:4]), int(suffix[4:]), 1)] = name
+    return partitions
+
+
+def ensure_partitions(model, start, end):
+    """
+    Create *model*'s monthly partitions covering start..end (inclusive
+    dates) if missing.  Returns the names of the partitions created.
+    """
+    if not is_partitioned(model):
+        return []
+
+    table = model._meta.db_table
+    existing = existing_partitions(model)
+    created = []
+    with connection.cursor() as cursor:
+        for month in iter_months(start, end):
+            if month in existing:
+                continue
+            cursor.execute(create_partition_sql(table, month))
+            created.append(partition_name(table, month))
+    if created:
+        logger.info('Created %s partitions: %s', table, ', '.join(created))
+    return created
+
+
+def drop_partitions_before(model, cutoff):
+    """
+    Drop *model*'s partitions whose whole month lies before *cutoff*.
+
+    Each partition is detached before it is dropped, so the parent table is
+    only locked for the catalog change.  Returns the names dropped.
+    """
+    if not is_partitioned(model):
+        return []
+
+    table = model._meta.db_table
+    dropped = []
+    with connection.cursor() as cursor:
+        for month, name in sorted(existing_partitions(model).items()):
+            if next_month(month) > cutoff:
+                break
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+            cursor.execute(f'DROP TABLE {name}')
+            dropped.append(name)
+    if dropped:
+        logger.info('Dropped %s partitions: %s', table, ', '.join(dropped))
+    return dropped
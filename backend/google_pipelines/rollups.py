@@ -0,0 +1,161 @@
+"""
+Daily rollups of the GA4 and GSC report tables.
+
+Each sync (and backfill shard) upserts its raw rows and then recomputes the
+configuration's rollup rows for the synced date range: per-day totals, GA4
+per source/medium and GSC per query and per page.  A day's rows are replaced
+wholesale, so the rollups always match the raw table for that range.
+
+The functions take the raw model class and an app registry (``apps``), so
+a data migration can run them against historical models.
+"""
+from datetime import timedelta
+from itertools import islice
+
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+ROLLUP_REBUILD_CHUNK_DAYS = 31
+
+# Rollup field -> raw field summed into it
+GA4_ROLLUP_SUMS = {
+    'sessions': 'sessions',
+    'total_users': 'total_users',
+    'new_users': 'new_users',
+    'engaged_sessions': 'engaged_sessions',
+    'conversions': 'conversions',
+    'purchase_revenue': 'purchase_revenue',
+    'engagement_rate_sum': 'engagement_rate',
+}
+GSC_ROLLUP_SUMS = {
+    'clicks': 'clicks',
+    'impressions': 'impressions',
+    'ctr_sum': 'ctr',
+    'position_sum': 'position',
+}
+
+# Raw model name -> (rollup model name, grouping dimensions besides date)
+ROLLUPS = {
+    'GA4Daily': (
+        ('GA4DailyTotal', ()),
+        ('GA4SourceMediumDaily', ('source', 'medium')),
+    ),
+    'GSCSearchData': (
+        ('GSCDailyTotal', ()),
+        ('GSCQueryDaily', ('query',)),
+        ('GSCPageDaily', ('page',)),
+    ),
+}
+
+
+def _rollup_sums(raw_model):
+    return GA4_ROLLUP_SUMS if raw_model.__name__ == 'GA4Daily' else GSC_ROLLUP_SUMS
+
+
+def _rollup_models(raw_model, apps):
+    """(rollup model, dimensions) pairs of *raw_model*, taken from *apps*"""
+    return [
+        (apps.get_model('google_pipelines', model_name), dimensions)
+        for model_name, dimensions in ROLLUPS[raw_model.__name__]
+    ]
+
+
+def _refresh(raw_model, rollup_model, dimensions, config, start, end, batch_size):
+    sums = _rollup_sums(raw_model)
+    aggregates = (
+        raw_model._default_manager
+        .filter(account_configuration=config, date__range=(start, end))
+        .values('date', *dimensions)
+        # Prefixed so the annotations don't clash with the raw model's fields
+        .annotate(
+            **{f'rollup_{field}': Sum(source) for field, source in sums.items()},
+            rollup_row_count=Count('id'),
+        )
+        .order_by()
+        .iterator(chunk_size=batch_size)
+    )
+    objs = (
+        rollup_model(
+            account_configuration=config,
+            date=row['date'],
+            **{dimension: row[dimension] for dimension in dimensions},
+            **{field: row[f'rollup_{field}'] or 0 for field in sums},
+            row_count=row['rollup_row_count'],
+        )
+        for row in aggregates
+    )
+
+    written = 0
+    rollup_model._default_manager.filter(account_configuration=config, date__range=(start, end)).delete()
+    while True:
+        batch = list(islice(objs, batch_size))
+        if not batch:
+            break
+        rollup_model._default_manager.bulk_create(batch)
+        written += len(batch)
+    return written
+
+
+def refresh_rollups(raw_model, config, start, end, batch_size=None, apps=global_apps):
+    """
+    Recompute *config*'s rollups of *raw_model* (GA4Daily or GSCSearchData)
+    for start..end (inclusive dates).
+
+    All of the model's rollup tables are replaced in one transaction.
+    Returns a dict of rows written per rollup table.
+    """
+    batch_size = batch_size or settings.GOOGLE_PIPELINES_UPSERT_BATCH_SIZE
+    written = {}
+    with transaction.atomic():
+        for rollup_model, dimensions in _rollup_models(raw_model, apps):
+            written[rollup_model._meta.db_table] = _refresh(
+                raw_model, rollup_model, dimensions, config, start, end, batch_size,
+            )
+    return written
+
+
+def rebuild_rollups(raw_model, config_id=None, since=None, apps=global_apps):
+    """
+    Rebuild *raw_model*'s rollups from scratch, optionally for one
+    configuration and/or from a date.
+
+    Works through each configuration's history in month-sized chunks.
+    Returns a dict of rows written per configuration id.
+    """
+    rows = raw_model._default_manager.all()
+    if config_id:
+        rows = rows.filter(account_configuration_id=config_id)
+    if since:
+        rows = rows.filter(date__gte=since)
+
+    results = {}
+    config_ranges = list(rows.values('account_configuration').annotate(
+        first=Min('date'),
+        last=Max('date'),
+    ).order_by('account_configuration'))
+    configs = apps.get_model('users', 'AccountConfiguration')._default_manager.in_bulk(
+        [config_range['account_configuration'] for config_range in config_ranges]
+    )
+    for config_range in config_ranges:
+        config = configs[config_range['account_configuration']]
+        first, last = config_range['first'], config_range['last']
+
+        # Drop rollup rows outside the raw range (e.g. rows since deleted)
+        for rollup_model, _ in _rollup_models(raw_model, apps):
+            stale = rollup_model._default_manager.filter(account_configuration=config).exclude(
+                date__range=(first, last),
+            )
+            if since:
+                stale = stale.filter(date__gte=since)
+            stale.delete()
+
+        written = 0
+        day = first
+        while day <= last:
+            chunk_end = min(day + timedelta(days=ROLLUP_REBUILD_CHUNK_DAYS - 1), last)
+            written += sum(refresh_rollups(raw_model, config, day, chunk_end, apps=apps).values())
+            day = chunk_end + timedelta(days=1)
+        results[config.id] = written
+    return results
@@ -70,3 +70,34 @@ class GSCSearchDataSummarySerializer(serializers.Serializer):
     unique_queries = serializers.IntegerField()
     unique_pages = serializers.IntegerField()
     row_count = serializers.IntegerField()
+
+
+class GA4DailyTrendSerializer(GA4DailySummarySerializer):
+    date = serializers.DateField()
+
+
+class GSCSearchDataTrendSerializer(serializers.Serializer):
+    date = serializers.DateField()
+    total_clicks = serializers.IntegerField()
+    total_impressions = serializers.IntegerField()
+    avg_ctr = serializers.FloatField()
+    avg_position = serializers.FloatField()
+    row_count = serializers.IntegerField()
+
+
+class GSCTopQuerySerializer(serializers.Serializer):
+    query = serializers.CharField()
+    total_clicks = serializers.IntegerField()
+    total_impressions = serializers.IntegerField()
+    avg_ctr = serializers.FloatField()
+    avg_position = serializers.FloatField()
+    row_count = serializers.IntegerField()
+
+
+class GSCTopPageSerializer(serializers.Serializer):
+    page = serializers.CharField()
+    total_clicks = serializers.IntegerField()
+    total_impressions = serializers.IntegerField()
+    avg_ctr = serializers.FloatField()
+    avg_position = serializers.FloatField()
+    row_count = serializers.IntegerField()
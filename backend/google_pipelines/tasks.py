@@ -1,28 +1,168 @@
 import logging
 from datetime import date, timedelta
 
-from celery import shared_task
+from celery import chain, chord, group, shared_task
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F
 from django.utils import timezone
 
-from pipelines.models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck, PipelineAnalytics
+from pipelines.metrics import record_job_metrics
+from pipelines.models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck
+from pipelines.progress import JobProgress, finish_job
 from users.models import AccountConfiguration
 
-from .clients.ga4 import fetch_ga4_report
-from .clients.gsc import fetch_gsc_search_data
+from .clients.ga4 import iter_ga4_report
+from .clients.gsc import iter_gsc_search_data
 from .models import GA4Daily, GSCSearchData
+from .partitions import PARTITIONED_MODELS, add_months, drop_partitions_before, ensure_partitions
+from .rollups import refresh_rollups
 
 logger = logging.getLogger(__name__)
 
+GA4_DIMENSIONS = ('date', 'source', 'medium', 'campaign', 'device_category', 'country')
+GA4_METRICS = (
+    'sessions', 'total_users', 'new_users', 'engaged_sessions',
+    'conversions', 'purchase_revenue', 'engagement_rate',
+)
+GSC_DIMENSIONS = ('date', 'query', 'page')
+GSC_METRICS = ('clicks', 'impressions', 'ctr', 'position')
+
+
+def upsert_rows(model, config, rows, dimensions, metrics, start, end, batch_size=None, on_batch=None):
+    """
+    Upsert report rows for *config* in batches of *batch_size*.
+
+    Each batch is one INSERT ... ON CONFLICT DO UPDATE on the model's
+    (account_configuration, *dimensions) unique constraint.  A batch that
+    fails is retried row by row so a bad row is logged and skipped, as
+    before.  Created rows are counted per batch, from the batch keys not
+    yet stored just before it is written (so a concurrent sync of the same
+    config can't skew them); everything else processed is an update.
+    *on_batch*, if given, is called with the rows processed so far after
+    each batch.
+
+    Returns a dict of total, processed, created and updated counts.
+    """
+    batch_size = batch_size or settings.GOOGLE_PIPELINES_UPSERT_BATCH_SIZE
+    label = model._meta.db_table
+    ensure_partitions(model, start, end)
+
+    total = 0
+    failed = 0
+    created = 0
+    batch = {}
+
+    def stored_keys():
+        """The batch's keys already stored (narrowed per dimension, matched exactly here)"""
+        candidates = model.objects.filter(
+            account_configuration=config,
+            **{f'{field}__in': {key[i] for key in batch} for i, field in enumerate(dimensions)},
+        )
+        return set(candidates.values_list(*dimensions)) & batch.keys()
+
+    def flush():
+        nonlocal failed, created
+        objs = [
+            model(account_configuration=config, **dict(zip(dimensions, key)), **values)
+            for key, values in batch.items()
+        ]
+        try:
+            with transaction.atomic():
+                stored = stored_keys()
+                model.objects.bulk_create(
+                    objs,
+                    update_conflicts=True,
+                    unique_fields=['account_configuration', *dimensions],
+                    update_fields=[*metrics, 'updated_at'],
+                )
+            created += len(batch) - len(stored)
+        except Exception as e:
+            logger.warning(
+                'Bulk upsert of %d %s rows for config %s failed, retrying row by row: %s',
+                len(objs), label, config.id, e,
+            )
+            for key, values in batch.items():
+                try:
+                    with transaction.atomic():
+                        _, row_created = model.objects.update_or_create(
+                            account_configuration=config,
+                            **dict(zip(dimensions, key)),
+                            defaults=values,
+                        )
+                    created += row_created
+                except Exception as e:
+                    logger.error('Error processing %s row for config %s: %s', label, config.id, e)
+                    failed += 1
+        batch.clear()
+
+    for row in rows:
+        total += 1
+        # Normalize None → '' for dimension fields; a repeated key in a batch keeps the last row
+        key = tuple(row['date'] if field == 'date' else row.get(field) or '' for field in dimensions)
+        batch[key] = {field: row[field] for field in metrics}
+        if len(batch) >= batch_size:
+            flush()
+            if on_batch:
+                on_batch(total - failed)
+    if batch:
+        flush()
+        if on_batch:
+            on_batch(total - failed)
+
+    processed = total - failed
+    return {
+        'total': total,
+        'processed': processed,
+        'created': created,
+        'updated': processed - created,
+    }
+
+
+def _start_sync_job(pipeline, job_id=None):
+    """Start the queued PipelineJob *job_id*, or create a running sync job."""
+    if job_id:
+        job = PipelineJob.objects.get(id=job_id)
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+        return job
+    return PipelineJob.objects.create(
+        pipeline=pipeline,
+        job_type='sync',
+        status='running',
+        started_at=timezone.now(),
+        scheduled_at=timezone.now(),
+    )
+
+
+def refresh_synced_rollups(model, config, start, end, batch_size=None):
+    """
+    Bring *config*'s daily rollups of *model* up to date for start..end.
+
+    A failed refresh is logged rather than raised: the raw rows are already
+    stored, and the next sync or rebuild_google_rollups repairs the range.
+    """
+    try:
+        refresh_rollups(model, config, start, end, batch_size=batch_size)
+    except Exception as e:
+        logger.warning(
+            'Rollup refresh of %s for config %s (%s to %s) failed: %s',
+            model._meta.db_table, config.id, start, end, e,
+        )
+
 
 @shared_task
-def sync_ga4_config(config_id, date_range_days=7):
+def sync_ga4_config(config_id, date_range_days=7, batch_size=None, job_id=None):
     """
     Sync GA4 data for a specific AccountConfiguration.
 
     Fetches the last *date_range_days* of data from the GA4 Data API and
-    upserts rows into GA4Daily.  Mirrors the WooCommerce sync pattern:
+    upserts rows into GA4Daily in batches of *batch_size* (default
+    ``GOOGLE_PIPELINES_UPSERT_BATCH_SIZE``).  Mirrors the WooCommerce sync pattern:
     find an associated DataPipeline, create a PipelineJob, log results.
+    With *job_id* an already queued PipelineJob is run instead of a new one,
+    with its progress updated after each batch.
     """
     try:
         config = AccountConfiguration.objects.get(
@@ -30,11 +170,15 @@ def sync_ga4_config(config_id, date_range_days=7):
         )
     except AccountConfiguration.DoesNotExist:
         logger.error('GA4 configuration %s not found', config_id)
+        if job_id:
+            finish_job(job_id, error='Configuration not found')
         return {'success': False, 'error': 'Configuration not found'}
 
     property_id = config.config_data.get('property_id')
     if not property_id:
         logger.error('No property_id in config %s', config_id)
+        if job_id:
+            finish_job(job_id, error='No property_id configured')
         return {'success': False, 'error': 'No property_id configured'}
 
     # Find associated DataPipeline (optional)
@@ -44,67 +188,31 @@ def sync_ga4_config(config_id, date_range_days=7):
         pipeline_type='google_analytics',
     ).first()
 
-    # Create PipelineJob
-    job = PipelineJob.objects.create(
-        pipeline=pipeline,
-        job_type='sync',
-        status='running',
-        started_at=timezone.now(),
-        scheduled_at=timezone.now(),
-    )
+    job = _start_sync_job(pipeline, job_id)
+    progress = JobProgress(job.id)
 
     end = date.today()
     start = end - timedelta(days=date_range_days)
 
+    fetch_stats = {'bytes_fetched': 0}
     try:
-        rows = fetch_ga4_report(property_id, start, end)
+        rows = iter_ga4_report(property_id, start, end, stats=fetch_stats)
 
-        rows_processed = 0
-        rows_created = 0
-        rows_updated = 0
-
-        for row in rows:
-            try:
-                with transaction.atomic():
-                    # Normalize None → '' for dimension fields
-                    defaults = {
-                        'sessions': row['sessions'],
-                        'total_users': row['total_users'],
-                        'new_users': row['new_users'],
-                        'engaged_sessions': row['engaged_sessions'],
-                        'conversions': row['conversions'],
-                        'purchase_revenue': row['purchase_revenue'],
-                        'engagement_rate': row['engagement_rate'],
-                    }
-
-                    _, created = GA4Daily.objects.update_or_create(
-                        account_configuration=config,
-                        date=row['date'],
-                        source=row.get('source') or '',
-                        medium=row.get('medium') or '',
-                        campaign=row.get('campaign') or '',
-                        device_category=row.get('device_category') or '',
-                        country=row.get('country') or '',
-                        defaults=defaults,
-                    )
-
-                    rows_processed += 1
-                    if created:
-                        rows_created += 1
-                    else:
-                        rows_updated += 1
-
-            except Exception as e:
-                logger.error(
-                    'Error processing GA4 row for config %s: %s',
-                    config_id, e,
-                )
-                continue
+        counts = upsert_rows(
+            GA4Daily, config, rows, GA4_DIMENSIONS, GA4_METRICS, start, end, batch_size=batch_size,
+            on_batch=lambda processed: progress.update(
+                pages_fetched=fetch_stats.get('pages'), rows_written=processed,
+            ),
+        )
+        refresh_synced_rollups(GA4Daily, config, start, end, batch_size=batch_size)
+        rows_processed = counts['processed']
+        rows_created = counts['created']
+        rows_updated = counts['updated']
 
         # Update job
         job.status = 'completed'
         job.completed_at = timezone.now()
-        job.total_items = len(rows)
+        job.total_items = counts['total']
         job.processed_items = rows_processed
         job.created_items = rows_created
         job.updated_items = rows_updated
@@ -137,17 +245,10 @@ def sync_ga4_config(config_id, date_range_days=7):
             except Exception:
                 pass
 
-            try:
-                today = timezone.now().date()
-                analytics, _ = PipelineAnalytics.objects.get_or_create(
-                    pipeline=pipeline, date=today,
-                )
-                analytics.total_jobs += 1
-                analytics.successful_jobs += 1
-                analytics.total_items_processed += rows_processed
-                analytics.save()
-            except Exception:
-                pass
+            record_job_metrics(
+                pipeline, 'ga4_sync', job.started_at, items_processed=rows_processed,
+                bytes_fetched=fetch_stats['bytes_fetched'], job_id=job.id, finished_at=job.completed_at,
+            )
 
         logger.info(
             'GA4 sync for config %s completed: %d processed, %d created, %d updated',
@@ -168,6 +269,10 @@ def sync_ga4_config(config_id, date_range_days=7):
         job.error_message = str(e)
         job.completed_at = timezone.now()
         job.save()
+        record_job_metrics(
+            pipeline, 'ga4_sync', job.started_at, bytes_fetched=fetch_stats['bytes_fetched'],
+            success=False, job_id=job.id, finished_at=job.completed_at,
+        )
 
         if pipeline:
             try:
@@ -209,13 +314,18 @@ def sync_all_ga4_configs():
 
 
 @shared_task
-def sync_gsc_config(config_id, date_range_days=30, is_initial=False):
+def sync_gsc_config(config_id, date_range_days=30, is_initial=False, batch_size=None, job_id=None):
     """
     Sync GSC search data for a specific AccountConfiguration.
 
-    If is_initial=True, pulls 480 days (16 months) of data.
+    If is_initial=True, the 480 days (16 months) of history are handed to
+    backfill_google_config and fetched in date shards across workers; a
+    queued *job_id* is handed over too and finished by the backfill.
     Otherwise pulls last date_range_days (default 30).
     GSC data has ~3 day lag, so end_date = today - 3 days.
+    Rows are upserted in batches of *batch_size* (default
+    ``GOOGLE_PIPELINES_UPSERT_BATCH_SIZE``).  With *job_id* an already
+    queued PipelineJob is run instead of a new one, as in sync_ga4_config.
     """
     try:
         config = AccountConfiguration.objects.get(
@@ -223,13 +333,26 @@ def sync_gsc_config(config_id, date_range_days=30, is_initial=False):
         )
     except AccountConfiguration.DoesNotExist:
         logger.error('GSC configuration %s not found', config_id)
+        if job_id:
+            finish_job(job_id, error='Configuration not found')
         return {'success': False, 'error': 'Configuration not found'}
 
     site_url = config.config_data.get('site_url')
     if not site_url:
         logger.error('No site_url in config %s', config_id)
+        if job_id:
+            finish_job(job_id, error='No site_url configured')
         return {'success': False, 'error': 'No site_url configured'}
 
+    days = 480 if is_initial else date_range_days
+    end = date.today() - timedelta(days=3)  # GSC data lag
+    start = end - timedelta(days=days)
+
+    if is_initial:
+        return backfill_google_config(
+            config_id, 'gsc', start.isoformat(), end.isoformat(), batch_size=batch_size, job_id=job_id,
+        )
+
     # Find associated DataPipeline (optional)
     pipeline = DataPipeline.objects.filter(
         account=config.account,
@@ -237,61 +360,28 @@ def sync_gsc_config(config_id, date_range_days=30, is_initial=False):
         pipeline_type='google_search_console',
     ).first()
 
-    # Create PipelineJob
-    job = PipelineJob.objects.create(
-        pipeline=pipeline,
-        job_type='sync',
-        status='running',
-        started_at=timezone.now(),
-        scheduled_at=timezone.now(),
-    )
-
-    days = 480 if is_initial else date_range_days
-    end = date.today() - timedelta(days=3)  # GSC data lag
-    start = end - timedelta(days=days)
+    job = _start_sync_job(pipeline, job_id)
+    progress = JobProgress(job.id)
 
+    fetch_stats = {'bytes_fetched': 0}
     try:
-        rows = fetch_gsc_search_data(site_url, start, end)
+        rows = iter_gsc_search_data(site_url, start, end, stats=fetch_stats)
 
-        rows_processed = 0
-        rows_created = 0
-        rows_updated = 0
-
-        for row in rows:
-            try:
-                with transaction.atomic():
-                    defaults = {
-                        'clicks': row['clicks'],
-                        'impressions': row['impressions'],
-                        'ctr': row['ctr'],
-                        'position': row['position'],
-                    }
-
-                    _, created = GSCSearchData.objects.update_or_create(
-                        account_configuration=config,
-                        date=row['date'],
-                        query=row.get('query') or '',
-                        page=row.get('page') or '',
-                        defaults=defaults,
-                    )
-
-                    rows_processed += 1
-                    if created:
-                        rows_created += 1
-                    else:
-                        rows_updated += 1
-
-            except Exception as e:
-                logger.error(
-                    'Error processing GSC row for config %s: %s',
-                    config_id, e,
-                )
-                continue
+        counts = upsert_rows(
+            GSCSearchData, config, rows, GSC_DIMENSIONS, GSC_METRICS, start, end, batch_size=batch_size,
+            on_batch=lambda processed: progress.update(
+                pages_fetched=fetch_stats.get('pages'), rows_written=processed,
+            ),
+        )
+        refresh_synced_rollups(GSCSearchData, config, start, end, batch_size=batch_size)
+        rows_processed = counts['processed']
+        rows_created = counts['created']
+        rows_updated = counts['updated']
 
         # Update job
         job.status = 'completed'
         job.completed_at = timezone.now()
-        job.total_items = len(rows)
+        job.total_items = counts['total']
         job.processed_items = rows_processed
         job.created_items = rows_created
         job.updated_items = rows_updated
@@ -324,17 +414,10 @@ def sync_gsc_config(config_id, date_range_days=30, is_initial=False):
             except Exception:
                 pass
 
-            try:
-                today = timezone.now().date()
-                analytics, _ = PipelineAnalytics.objects.get_or_create(
-                    pipeline=pipeline, date=today,
-                )
-                analytics.total_jobs += 1
-                analytics.successful_jobs += 1
-                analytics.total_items_processed += rows_processed
-                analytics.save()
-            except Exception:
-                pass
+            record_job_metrics(
+                pipeline, 'gsc_sync', job.started_at, items_processed=rows_processed,
+                bytes_fetched=fetch_stats['bytes_fetched'], job_id=job.id, finished_at=job.completed_at,
+            )
 
         logger.info(
             'GSC sync for config %s completed: %d processed, %d created, %d updated',
@@ -355,6 +438,10 @@ def sync_gsc_config(config_id, date_range_days=30, is_initial=False):
         job.error_message = str(e)
         job.completed_at = timezone.now()
         job.save()
+        record_job_metrics(
+            pipeline, 'gsc_sync', job.started_at, bytes_fetched=fetch_stats['bytes_fetched'],
+            success=False, job_id=job.id, finished_at=job.completed_at,
+        )
 
         if pipeline:
             try:
@@ -393,3 +480,318 @@ def sync_all_gsc_configs():
 
     logger.info('Started GSC sync for %d configurations', len(configs))
     return results
+
+
+@shared_task
+def maintain_google_partitions():
+    """
+    Create the GA4/GSC monthly partitions GOOGLE_PARTITION_MONTHS_AHEAD
+    months ahead, and drop raw partitions older than
+    GOOGLE_RAW_RETENTION_MONTHS (0 keeps everything).  The daily rollups
+    are not partitioned and keep their history.
+    """
+    this_month = timezone.now().date().replace(day=1)
+    ahead = add_months(this_month, settings.GOOGLE_PARTITION_MONTHS_AHEAD)
+    retention_months = settings.GOOGLE_RAW_RETENTION_MONTHS
+
+    results = {}
+    for model in PARTITIONED_MODELS:
+        table = model._meta.db_table
+        created = ensure_partitions(model, this_month, ahead)
+        dropped = []
+        if retention_months > 0:
+            dropped = drop_partitions_before(model, add_months(this_month, -retention_months))
+        results[table] = {'created': created, 'dropped': dropped}
+
+    logger.info('Maintained GA4/GSC partitions: %s', results)
+    return results
+
+
+# --- Sharded backfills ---------------------------------------------------
+
+BACKFILL_SOURCES = {
+    'ga4': {
+        'config_type': 'google_analytics',
+        'config_key': 'property_id',
+        'reader': iter_ga4_report,
+        'model': GA4Daily,
+        'dimensions': GA4_DIMENSIONS,
+        'metrics': GA4_METRICS,
+    },
+    'gsc': {
+        'config_type': 'google_search_console',
+        'config_key': 'site_url',
+        'reader': iter_gsc_search_data,
+        'model': GSCSearchData,
+        'dimensions': GSC_DIMENSIONS,
+        'metrics': GSC_METRICS,
+    },
+}
+
+
+def backfill_shards(start, end, shard_days):
+    """Split start..end (inclusive dates) into consecutive (start, end) shards."""
+    shards = []
+    shard_start = start
+    while shard_start <= end:
+        shard_end = min(shard_start + timedelta(days=shard_days - 1), end)
+        shards.append((shard_start, shard_end))
+        shard_start = shard_end + timedelta(days=1)
+    return shards
+
+
+def _dispatch_backfill_shards(job, shards):
+    """
+    Run *shards* for *job* as a chord of at most max_concurrency lanes.
+
+    Each lane is a chain, so at most that many shards hit the property's
+    API quota at once; shards are dealt round-robin across lanes.  The
+    chord callback rolls every lane's shard results into the job.
+    """
+    lane_count = max(1, min(job.parameters['max_concurrency'], len(shards)))
+    lanes = [[] for _ in range(lane_count)]
+    for i, (shard_start, shard_end) in enumerate(shards):
+        lanes[i % lane_count].append((shard_start, shard_end))
+
+    chains = []
+    for lane in lanes:
+        # Every shard after the first receives the lane's results so far
+        first_start, first_end = lane[0]
+        signatures = [sync_google_backfill_shard.s([], job.id, first_start, first_end)]
+        signatures += [
+            sync_google_backfill_shard.s(job.id, shard_start, shard_end)
+            for shard_start, shard_end in lane[1:]
+        ]
+        chains.append(chain(*signatures))
+
+    return chord(group(chains))(finalize_google_backfill.s(job.id))
+
+
+@shared_task
+def backfill_google_config(config_id, source, start_date, end_date, shard_days=None,
+                           max_concurrency=None, batch_size=None, job_id=None):
+    """
+    Backfill GA4 ('ga4') or GSC ('gsc') data for start_date..end_date in
+    date shards fetched in parallel across workers.
+
+    Creates one 'backfill' PipelineJob, which finalize_google_backfill
+    completes with the aggregated counts once every shard has run.  Shards
+    that fail are recorded on the job and can be re-run on their own with
+    retry_google_backfill_shards.  With *job_id* an already queued
+    PipelineJob becomes the backfill job instead of a new one.
+    """
+    spec = BACKFILL_SOURCES[source]
+    try:
+        config = AccountConfiguration.objects.get(id=config_id, config_type=spec['config_type'])
+    except AccountConfiguration.DoesNotExist:
+        logger.error('%s configuration %s not found', source.upper(), config_id)
+        if job_id:
+            finish_job(job_id, error='Configuration not found')
+        return {'success': False, 'error': 'Configuration not found'}
+
+    if not config.config_data.get(spec['config_key']):
+        logger.error('No %s in config %s', spec['config_key'], config_id)
+        if job_id:
+            finish_job(job_id, error=f"No {spec['config_key']} configured")
+        return {'success': False, 'error': f"No {spec['config_key']} configured"}
+
+    start = date.fromisoformat(start_date) if isinstance(start_date, str) else start_date
+    end = date.fromisoformat(end_date) if isinstance(end_date, str) else end_date
+    shard_days = shard_days or settings.GOOGLE_BACKFILL_SHARD_DAYS
+    shards = backfill_shards(start, end, shard_days)
+    # Up front, so concurrent shards don't race to create the same month
+    ensure_partitions(spec['model'], start, end)
+
+    pipeline = DataPipeline.objects.filter(
+        account=config.account,
+        account_configuration=config,
+        pipeline_type=spec['config_type'],
+    ).first()
+
+    parameters = {
+        'source': source,
+        'config_id': config.id,
+        'start_date': start.isoformat(),
+        'end_date': end.isoformat(),
+        'shard_days': shard_days,
+        'max_concurrency': max_concurrency or settings.GOOGLE_BACKFILL_MAX_CONCURRENCY,
+        'batch_size': batch_size,
+        'shard_results': {},
+    }
+    if job_id:
+        # Typed 'backfill' so retry_google_backfill_shards can find it
+        job = PipelineJob.objects.get(id=job_id)
+        job.pipeline = job.pipeline or pipeline
+        job.job_type = 'backfill'
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.parameters = {**job.parameters, **parameters}
+        job.save()
+    else:
+        job = PipelineJob.objects.create(
+            pipeline=pipeline,
+            job_type='backfill',
+            status='running',
+            started_at=timezone.now(),
+            scheduled_at=timezone.now(),
+            parameters=parameters,
+        )
+
+    _dispatch_backfill_shards(job, [(s.isoformat(), e.isoformat()) for s, e in shards])
+
+    logger.info(
+        'Started %s backfill for config %s: %d shards (%s to %s), job %s',
+        source.upper(), config_id, len(shards), start, end, job.id,
+    )
+    return {'success': True, 'job_id': job.id, 'shards': len(shards)}
+
+
+@shared_task
+def sync_google_backfill_shard(previous_results, job_id, shard_start, shard_end):
+    """
+    Fetch and upsert one backfill shard.
+
+    Never raises: a failure is returned as a shard result so the rest of
+    the lane still runs.  Returns *previous_results* plus this shard's result.
+    """
+    job = PipelineJob.objects.get(id=job_id)
+    params = job.parameters
+    spec = BACKFILL_SOURCES[params['source']]
+    result = {'start': shard_start, 'end': shard_end}
+
+    try:
+        config = AccountConfiguration.objects.get(id=params['config_id'])
+        start, end = date.fromisoformat(shard_start), date.fromisoformat(shard_end)
+        fetch_stats = {'bytes_fetched': 0}
+        rows = spec['reader'](config.config_data[spec['config_key']], start, end, stats=fetch_stats)
+        counts = upsert_rows(
+            spec['model'], config, rows, spec['dimensions'], spec['metrics'],
+            start, end, batch_size=params.get('batch_size'),
+        )
+        refresh_synced_rollups(spec['model'], config, start, end, batch_size=params.get('batch_size'))
+        result.update(counts, bytes_fetched=fetch_stats['bytes_fetched'], success=True)
+
+        # Progress while the backfill runs; finalize sets the exact totals
+        PipelineJob.objects.filter(id=job_id).update(
+            processed_items=F('processed_items') + counts['processed'],
+        )
+    except Exception as e:
+        logger.error(
+            'Backfill shard %s..%s failed for job %s: %s',
+            shard_start, shard_end, job_id, e,
+        )
+        result.update(success=False, error=str(e))
+
+    return previous_results + [result]
+
+
+@shared_task
+def finalize_google_backfill(lane_results, job_id):
+    """
+    Chord callback: merge shard results into the backfill PipelineJob.
+
+    Results are keyed by shard start, so a retried shard replaces its
+    earlier failure before the totals are recomputed.
+    """
+    job = PipelineJob.objects.get(id=job_id)
+    shard_results = job.parameters.get('shard_results', {})
+    for lane in lane_results:
+        for result in lane:
+            shard_results[result['start']] = result
+    job.parameters['shard_results'] = shard_results
+
+    succeeded = [r for r in shard_results.values() if r['success']]
+    failed = [r for r in shard_results.values() if not r['success']]
+
+    job.total_items = sum(r['total'] for r in succeeded)
+    job.processed_items = sum(r['processed'] for r in succeeded)
+    job.created_items = sum(r['created'] for r in succeeded)
+    job.updated_items = sum(r['updated'] for r in succeeded)
+    job.failed_items = job.total_items - job.processed_items
+    job.completed_at = timezone.now()
+    if failed:
+        job.status = 'failed'
+        job.error_message = (
+            f'{len(failed)} of {len(shard_results)} shards failed: '
+            + ', '.join(f"{r['start']}..{r['end']}" for r in sorted(failed, key=lambda r: r['start']))
+        )
+    else:
+        job.status = 'completed'
+        job.error_message = ''
+    job.save()
+
+    record_job_metrics(
+        job.pipeline, f"{job.parameters['source']}_backfill", job.started_at,
+        items_processed=job.processed_items,
+        bytes_fetched=sum(r.get('bytes_fetched', 0) for r in succeeded),
+        success=not failed, job_id=job.id, finished_at=job.completed_at,
+    )
+
+    source = job.parameters['source'].upper()
+    if job.pipeline:
+        try:
+            PipelineLog.objects.create(
+                pipeline=job.pipeline,
+                level='ERROR' if failed else 'INFO',
+                message=(
+                    f'{source} backfill {job.status} ({job.processed_items} processed, '
+                    f'{job.created_items} created, {job.updated_items} updated, '
+                    f'{len(failed)} failed shards)'
+                ),
+                details={
+                    'job_id': job.id,
+                    'date_range': f"{job.parameters['start_date']} to {job.parameters['end_date']}",
+                },
+            )
+        except Exception:
+            pass
+
+    logger.info(
+        '%s backfill job %s %s: %d processed, %d created, %d updated, %d failed shards',
+        source, job.id, job.status, job.processed_items, job.created_items,
+        job.updated_items, len(failed),
+    )
+    return {
+        'success': not failed,
+        'job_id': job.id,
+        'rows_processed': job.processed_items,
+        'rows_created': job.created_items,
+        'rows_updated': job.updated_items,
+        'failed_shards': len(failed),
+    }
+
+
+@shared_task
+def retry_google_backfill_shards(job_id):
+    """
+    Re-run only the failed shards of a finished backfill PipelineJob.
+
+    A job whose lanes are still running is refused, so a repeated retry
+    can't start a second set of lanes against the same property.
+    """
+    try:
+        job = PipelineJob.objects.get(id=job_id, job_type='backfill')
+    except PipelineJob.DoesNotExist:
+        logger.error('Backfill job %s not found', job_id)
+        return {'success': False, 'error': 'Job not found'}
+
+    failed = sorted(
+        (r['start'], r['end'])
+        for r in job.parameters.get('shard_results', {}).values()
+        if not r['success']
+    )
+    if not failed:
+        return {'success': False, 'error': 'No failed shards to retry'}
+
+    # Claim the job; only one retry wins when several race
+    claimed = PipelineJob.objects.filter(id=job.id, status__in=('failed', 'completed')).update(
+        status='running', completed_at=None, updated_at=timezone.now(),
+    )
+    if not claimed:
+        return {'success': False, 'error': 'Backfill job is still running'}
+    job.status = 'running'
+    job.completed_at = None
+    _dispatch_backfill_shards(job, failed)
+
+    logger.info('Retrying %d failed shards of backfill job %s', len(failed), job.id)
+    return {'success': True, 'job_id': job.id, 'shards': len(failed)}
@@ -0,0 +1,241 @@
+from datetime import date
+from unittest.mock import patch
+
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+from django.utils import timezone
+
+from pipelines.models import PipelineJob
+from users.models import Account, AccountConfiguration, Agency, Company
+
+from .models import GA4Daily, GA4DailyTotal, GA4SourceMediumDaily, GSCDailyTotal, GSCSearchData
+from .partitions import (
+    add_months, create_partition_sql, drop_partitions_before, ensure_partitions, is_partitioned, iter_months,
+    partition_name,
+)
+from .rollups import rebuild_rollups, refresh_rollups
+from .tasks import (
+    GSC_DIMENSIONS,
+    GSC_METRICS,
+    BACKFILL_SOURCES,
+    _dispatch_backfill_shards,
+    backfill_shards,
+    finalize_google_backfill,
+    maintain_google_partitions,
+    retry_google_backfill_shards,
+    sync_google_backfill_shard,
+    sync_gsc_config,
+    upsert_rows,
+)
+
+
+def make_config(config_type='google_analytics', **config_data):
+    agency = Agency.objects.create(name='Agency')
+    company = Company.objects.create(name='Porsa ApS', agency=agency)
+    account = Account.objects.create(name='Porsa', company=company)
+    return AccountConfiguration.objects.create(account=account, config_type=config_type, config_data=config_data)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.config = make_config()
+        for source, sessions in (('google', 10), ('google', 5), ('bing', 2)):
+            GA4Daily.objects.create(
+                account_configuration=self.config, date=date(2025, 1, 1), source=source,
+                medium='organic', campaign=str(sessions), sessions=sessions,
+            )
+
+    def test_refresh_sums_raw_rows_per_rollup(self):
+        written = refresh_rollups(GA4Daily, self.config, date(2025, 1, 1), date(2025, 1, 31))
+
+        self.assertEqual(written, {GA4DailyTotal._meta.db_table: 1, GA4SourceMediumDaily._meta.db_table: 2})
+        self.assertEqual(GA4DailyTotal.objects.get().sessions, 17)
+        self.assertEqual(
+            dict(GA4SourceMediumDaily.objects.values_list('source', 'sessions')),
+            {'google': 15, 'bing': 2},
+        )
+
+    def test_rebuild_with_historical_models(self):
+        """The data migration builds both sources' rollups from the stored rows"""
+        GSCSearchData.objects.create(
+            account_configuration=self.config, date=date(2025, 2, 1), query='sko', page='https://porsa.dk', clicks=3,
+        )
+        apps = MigrationExecutor(connection).loader.project_state(
+            ('google_pipelines', '0005_populate_daily_rollups')
+        ).apps
+
+        self.assertEqual(rebuild_rollups(apps.get_model('google_pipelines', 'GA4Daily'), apps=apps), {self.config.id: 3})
+        self.assertEqual(rebuild_rollups(apps.get_model('google_pipelines', 'GSCSearchData'), apps=apps), {self.config.id: 3})
+        self.assertEqual(GA4DailyTotal.objects.get().sessions, 17)
+        self.assertEqual(GSCDailyTotal.objects.get().clicks, 3)
+
+
+def gsc_row(day, query, clicks=1):
+    return {'date': day, 'query': query, 'page': 'https://porsa.dk', 'clicks': clicks,
+            'impressions': 10, 'ctr': 0.1, 'position': 3.0}
+
+
+class UpsertRowsTests(TestCase):
+    def setUp(self):
+        self.config = make_config('google_search_console')
+
+    def upsert(self, rows, **kwargs):
+        return upsert_rows(
+            GSCSearchData, self.config, rows, GSC_DIMENSIONS, GSC_METRICS, date(2025, 1, 1), date(2025, 1, 31),
+            **kwargs
+        )
+
+    def test_batches_create_and_update(self):
+        counts = self.upsert([gsc_row(date(2025, 1, 1), 'sko'), gsc_row(date(2025, 1, 2), 'sko')], batch_size=1)
+        self.assertEqual(counts, {'total': 2, 'processed': 2, 'created': 2, 'updated': 0})
+
+        counts = self.upsert([
+            gsc_row(date(2025, 1, 1), 'sko', clicks=5),
+            gsc_row(date(2025, 1, 1), 'støvler'),
+            gsc_row(date(2025, 1, 1), 'støvler', clicks=2),  # repeated key: the last row wins
+        ])
+        self.assertEqual(counts, {'total': 3, 'processed': 3, 'created': 1, 'updated': 2})
+        self.assertEqual(
+            dict(GSCSearchData.objects.filter(date=date(2025, 1, 1)).values_list('query', 'clicks')),
+            {'sko': 5, 'støvler': 2},
+        )
+
+    def test_concurrent_rows_are_not_counted(self):
+        """Rows another sync writes into the same range meanwhile don't show up as created"""
+        def other_sync(processed):
+            GSCSearchData.objects.create(account_configuration=self.config, date=date(2025, 1, 20), query=f'other {processed}')
+
+        counts = self.upsert([gsc_row(date(2025, 1, 1), 'sko'), gsc_row(date(2025, 1, 2), 'sko')],
+                             batch_size=1, on_batch=other_sync)
+        self.assertEqual((counts['created'], counts['updated']), (2, 0))
+
+    def test_failed_batch_falls_back_row_by_row(self):
+        self.upsert([gsc_row(date(2025, 1, 1), 'sko')])
+
+        counts = self.upsert([
+            gsc_row(date(2025, 1, 1), 'sko', clicks=7),
+            gsc_row(date(2025, 1, 1), 'støvler'),
+            gsc_row(date(2025, 1, 1), 'sandaler', clicks='many'),
+        ])
+
+        self.assertEqual(counts, {'total': 3, 'processed': 2, 'created': 1, 'updated': 1})
+        self.assertEqual(
+            dict(GSCSearchData.objects.values_list('query', 'clicks')), {'sko': 7, 'støvler': 1},
+        )
+
+
+class BackfillTests(TestCase):
+    def setUp(self):
+        self.config = make_config(property_id='123')
+
+    def make_job(self, **parameters):
+        return PipelineJob.objects.create(
+            job_type='backfill', status='running', scheduled_at=timezone.now(), started_at=timezone.now(),
+            parameters={'source': 'ga4', 'config_id': self.config.id, 'start_date': '2025-01-01',
+                        'end_date': '2025-01-10', 'max_concurrency': 2, 'shard_results': {}, **parameters},
+        )
+
+    def test_backfill_shards_cover_the_range(self):
+        self.assertEqual(backfill_shards(date(2025, 1, 1), date(2025, 1, 10), 4), [
+            (date(2025, 1, 1), date(2025, 1, 4)),
+            (date(2025, 1, 5), date(2025, 1, 8)),
+            (date(2025, 1, 9), date(2025, 1, 10)),
+        ])
+
+    def test_shards_dealt_round_robin_into_lanes(self):
+        job = self.make_job()
+        shards = [('2025-01-01', '2025-01-04'), ('2025-01-05', '2025-01-08'), ('2025-01-09', '2025-01-10')]
+        with patch('google_pipelines.tasks.chord') as chord:
+            _dispatch_backfill_shards(job, shards)
+
+        lanes = chord.call_args.args[0].tasks
+        self.assertEqual(
+            [[task.args[-2:] for task in lane.tasks] for lane in lanes],
+            [[('2025-01-01', '2025-01-04'), ('2025-01-09', '2025-01-10')], [('2025-01-05', '2025-01-08')]],
+        )
+        chord.return_value.assert_called_once_with(finalize_google_backfill.s(job.id))
+
+    def test_shards_then_finalize(self):
+        """A failed shard is recorded, the lane goes on, and finalize totals the rest"""
+        job = self.make_job()
+
+        def reader(property_id, start, end, stats):
+            if start == date(2025, 1, 5):
+                raise RuntimeError('quota exceeded')
+            return [{'date': start, 'source': 'google', 'medium': 'organic', 'sessions': 4,
+                     'total_users': 3, 'new_users': 1, 'engaged_sessions': 2, 'conversions': 0,
+                     'purchase_revenue': 0, 'engagement_rate': 0.5}]
+
+        with patch.dict(BACKFILL_SOURCES['ga4'], reader=reader):
+            lane = sync_google_backfill_shard([], job.id, '2025-01-01', '2025-01-04')
+            lane = sync_google_backfill_shard(lane, job.id, '2025-01-05', '2025-01-08')
+            other_lane = sync_google_backfill_shard([], job.id, '2025-01-09', '2025-01-10')
+
+        result = finalize_google_backfill([lane, other_lane], job.id)
+
+        self.assertEqual(result['failed_shards'], 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(job.error_message, '1 of 3 shards failed: 2025-01-05..2025-01-08')
+        self.assertEqual((job.total_items, job.processed_items, job.created_items), (2, 2, 2))
+        self.assertEqual(GA4DailyTotal.objects.filter(account_configuration=self.config).count(), 2)
+
+    def test_retry_only_from_a_finished_job(self):
+        job = self.make_job(shard_results={
+            '2025-01-01': {'start': '2025-01-01', 'end': '2025-01-04', 'success': True},
+            '2025-01-05': {'start': '2025-01-05', 'end': '2025-01-08', 'success': False, 'error': 'quota'},
+        })
+        with patch('google_pipelines.tasks._dispatch_backfill_shards') as dispatch:
+            self.assertEqual(retry_google_backfill_shards(job.id)['error'], 'Backfill job is still running')
+
+            PipelineJob.objects.filter(id=job.id).update(status='failed')
+            self.assertTrue(retry_google_backfill_shards(job.id)['success'])
+            self.assertFalse(retry_google_backfill_shards(job.id)['success'])  # e.g. a double click
+
+        dispatch.assert_called_once()
+        self.assertEqual(dispatch.call_args.args[1], [('2025-01-05', '2025-01-08')])
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'running')
+
+    def test_initial_gsc_sync_hands_its_job_to_the_backfill(self):
+        config = make_config('google_search_console', site_url='https://porsa.dk')
+        job = PipelineJob.objects.create(job_type='sync', status='pending', scheduled_at=timezone.now())
+
+        with patch('google_pipelines.tasks._dispatch_backfill_shards') as dispatch:
+            result = sync_gsc_config(config.id, is_initial=True, job_id=job.id)
+
+        self.assertEqual(result['job_id'], job.id)
+        job.refresh_from_db()
+        self.assertEqual((job.job_type, job.status), ('backfill', 'running'))
+        self.assertEqual(job.parameters['source'], 'gsc')
+        self.assertEqual(dispatch.call_args.args[0].id, job.id)
+
+
+class PartitionTests(TestCase):
+    def test_month_arithmetic(self):
+        self.assertEqual(add_months(date(2025, 11, 20), 3), date(2026, 2, 1))
+        self.assertEqual(add_months(date(2025, 1, 31), -1), date(2024, 12, 1))
+        self.assertEqual(
+            list(iter_months(date(2024, 11, 15), date(2025, 2, 1))),
+            [date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)],
+        )
+
+    def test_partition_sql(self):
+        self.assertEqual(partition_name('ga4_daily', date(2025, 12, 1)), 'ga4_daily_p202512')
+        self.assertEqual(
+            create_partition_sql('ga4_daily', date(2025, 12, 1)),
+            "CREATE TABLE IF NOT EXISTS ga4_daily_p202512 PARTITION OF ga4_daily "
+            "FOR VALUES FROM ('2025-12-01') TO ('2026-01-01')",
+        )
+
+    def test_plain_tables_off_postgresql(self):
+        """SQLite keeps plain tables: the helpers and the maintenance task do nothing"""
+        self.assertFalse(is_partitioned(GA4Daily))
+        self.assertEqual(ensure_partitions(GA4Daily, date(2025, 1, 1), date(2025, 6, 1)), [])
+        self.assertEqual(drop_partitions_before(GSCSearchData, date(2025, 1, 1)), [])
+        with self.settings(GOOGLE_RAW_RETENTION_MONTHS=12):
+            self.assertEqual(maintain_google_partitions(), {
+                'gsc_search_data': {'created': [], 'dropped': []},
+                'ga4_daily': {'created': [], 'dropped': []},
+            })
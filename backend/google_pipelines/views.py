@@ -2,14 +2,91 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Sum, Avg, Count
+from django.db.models import Sum, Count
+from users.scope import scope_to_accounts
 
-from .models import GA4Daily, GSCSearchData
+from .models import (
+    GA4Daily, GA4DailyTotal, GA4SourceMediumDaily,
+    GSCSearchData, GSCDailyTotal, GSCQueryDaily, GSCPageDaily,
+)
 from .serializers import (
-    GA4DailySerializer, GA4DailySummarySerializer,
-    GSCSearchDataSerializer, GSCSearchDataSummarySerializer,
+    GA4DailySerializer, GA4DailySummarySerializer, GA4DailyTrendSerializer,
+    GSCSearchDataSerializer, GSCSearchDataSummarySerializer, GSCSearchDataTrendSerializer,
+    GSCTopQuerySerializer, GSCTopPageSerializer,
 )
 
+TOP_ROWS_DEFAULT_LIMIT = 50
+TOP_ROWS_MAX_LIMIT = 500
+
+# Summary key -> metric summed into it
+GA4_TOTALS = {
+    'total_sessions': 'sessions',
+    'total_users': 'total_users',
+    'total_new_users': 'new_users',
+    'total_engaged_sessions': 'engaged_sessions',
+    'total_conversions': 'conversions',
+    'total_purchase_revenue': 'purchase_revenue',
+}
+GSC_TOTALS = {
+    'total_clicks': 'clicks',
+    'total_impressions': 'impressions',
+}
+
+
+def _scope_to_user(qs, user):
+    """Restrict *qs* (keyed by account_configuration) to the configs *user* may see."""
+    return scope_to_accounts(qs, user, field='account_configuration__account')
+
+
+def _filter_config_and_dates(qs, params):
+    """Apply the account_configuration/date_from/date_to query params."""
+    config_id = params.get('account_configuration')
+    if config_id:
+        qs = qs.filter(account_configuration_id=config_id)
+
+    date_from = params.get('date_from')
+    if date_from:
+        qs = qs.filter(date__gte=date_from)
+
+    date_to = params.get('date_to')
+    if date_to:
+        qs = qs.filter(date__lte=date_to)
+
+    return qs
+
+
+def _aggregates(totals, averages, rollup):
+    """
+    Aggregate expressions for raw rows or rollup rows, under prefixed names
+    that don't clash with model fields.
+
+    Averages are over raw rows; a rollup row stores the sum of the averaged
+    metric in ``<metric>_sum`` and the raw rows it covers in ``row_count``.
+    """
+    aggregates = {f'agg_{key}': Sum(field) for key, field in totals.items()}
+    for key, field in averages.items():
+        aggregates[f'agg_{key}'] = Sum(f'{field}_sum' if rollup else field)
+    aggregates['agg_row_count'] = Sum('row_count') if rollup else Count('id')
+    return aggregates
+
+
+def _metrics(values, totals, averages):
+    """Turn one row of _aggregates() output into summary metrics (0 when empty)."""
+    metrics = {key: values[f'agg_{key}'] or 0 for key in totals}
+    row_count = values['agg_row_count'] or 0
+    for key in averages:
+        metrics[key] = (values[f'agg_{key}'] or 0) / row_count if row_count else 0
+    metrics['row_count'] = row_count
+    return metrics
+
+
+def _top_limit(params):
+    try:
+        limit = int(params.get('limit', TOP_ROWS_DEFAULT_LIMIT))
+    except (TypeError, ValueError):
+        limit = TOP_ROWS_DEFAULT_LIMIT
+    return max(1, min(limit, TOP_ROWS_MAX_LIMIT))
+
 
 class GA4DailyViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only viewset for GA4 daily analytics data."""
@@ -17,46 +94,18 @@ class GA4DailyViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = GA4DailySerializer
     permission_classes = [IsAuthenticated]
 
+    averages = {'avg_engagement_rate': 'engagement_rate'}
+
     def get_queryset(self):
         """Tenant-filtered queryset mirroring DataPipelineViewSet."""
-        user = self.request.user
         qs = GA4Daily.objects.select_related(
             'account_configuration__account__company__agency',
         )
-
-        # Role-based filtering
-        if user.role == 'super_admin':
-            pass  # see everything
-        elif user.role in ('agency_admin', 'agency_user'):
-            if user.access_all_companies:
-                qs = qs.filter(
-                    account_configuration__account__company__agency=user.agency,
-                )
-            else:
-                qs = qs.filter(
-                    account_configuration__account__company__in=user.accessible_companies.all(),
-                )
-        elif user.role in ('company_admin', 'company_user'):
-            qs = qs.filter(
-                account_configuration__account__company=user.company,
-            )
-        else:
-            return GA4Daily.objects.none()
+        qs = _scope_to_user(qs, self.request.user)
 
         # Query-param filters
         params = self.request.query_params
-
-        config_id = params.get('account_configuration')
-        if config_id:
-            qs = qs.filter(account_configuration_id=config_id)
-
-        date_from = params.get('date_from')
-        if date_from:
-            qs = qs.filter(date__gte=date_from)
-
-        date_to = params.get('date_to')
-        if date_to:
-            qs = qs.filter(date__lte=date_to)
+        qs = _filter_config_and_dates(qs, params)
 
         source = params.get('source')
         if source:
@@ -76,30 +125,59 @@ class GA4DailyViewSet(viewsets.ReadOnlyModelViewSet):
 
         return qs
 
+    def get_rollup_queryset(self):
+        """
+        Daily rollup rows matching the request's filters, or None when it
+        filters on a dimension (country, device_category) only ga4_daily has.
+        """
+        params = self.request.query_params
+        if params.get('country') or params.get('device_category'):
+            return None
+
+        source = params.get('source')
+        medium = params.get('medium')
+        if source or medium:
+            qs = GA4SourceMediumDaily.objects.all()
+            if source:
+                qs = qs.filter(source=source)
+            if medium:
+                qs = qs.filter(medium=medium)
+        else:
+            qs = GA4DailyTotal.objects.all()
+
+        qs = _scope_to_user(qs, self.request.user)
+        return _filter_config_and_dates(qs, params)
+
+    def _metric_rows(self):
+        """(queryset, aggregates) from the rollups when possible, else ga4_daily."""
+        qs = self.get_rollup_queryset()
+        rollup = qs is not None
+        if not rollup:
+            qs = self.get_queryset()
+        return qs, _aggregates(GA4_TOTALS, self.averages, rollup)
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Aggregated metrics for the current filtered queryset."""
-        qs = self.get_queryset()
-
-        agg = qs.aggregate(
-            total_sessions=Sum('sessions'),
-            total_users=Sum('total_users'),
-            total_new_users=Sum('new_users'),
-            total_engaged_sessions=Sum('engaged_sessions'),
-            total_conversions=Sum('conversions'),
-            total_purchase_revenue=Sum('purchase_revenue'),
-            avg_engagement_rate=Avg('engagement_rate'),
-            row_count=Count('id'),
-        )
-
-        # Replace None with 0 for empty querysets
-        for key in agg:
-            if agg[key] is None:
-                agg[key] = 0
+        """Aggregated metrics for the current filters."""
+        qs, aggregates = self._metric_rows()
+        agg = _metrics(qs.aggregate(**aggregates), GA4_TOTALS, self.averages)
 
         serializer = GA4DailySummarySerializer(agg)
         return Response(serializer.data)
 
+    @action(detail=False, methods=['get'])
+    def trend(self, request):
+        """Aggregated metrics per day for the current filters."""
+        qs, aggregates = self._metric_rows()
+        days = qs.values('date').annotate(**aggregates).order_by('date')
+        trend = [
+            {'date': row['date'], **_metrics(row, GA4_TOTALS, self.averages)}
+            for row in days
+        ]
+
+        serializer = GA4DailyTrendSerializer(trend, many=True)
+        return Response(serializer.data)
+
 
 class GSCSearchDataViewSet(viewsets.ReadOnlyModelViewSet):
     """Read-only viewset for GSC search analytics data."""
@@ -107,47 +185,20 @@ class GSCSearchDataViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = GSCSearchDataSerializer
     permission_classes = [IsAuthenticated]
 
+    averages = {'avg_ctr': 'ctr', 'avg_position': 'position'}
+
     def get_queryset(self):
         """Tenant-filtered queryset mirroring GA4DailyViewSet."""
-        user = self.request.user
         qs = GSCSearchData.objects.select_related(
             'account_configuration__account__company__agency',
         )
-
-        # Role-based filtering
-        if user.role == 'super_admin':
-            pass  # see everything
-        elif user.role in ('agency_admin', 'agency_user'):
-            if user.access_all_companies:
-                qs = qs.filter(
-                    account_configuration__account__company__agency=user.agency,
-                )
-            else:
-                qs = qs.filter(
-                    account_configuration__account__company__in=user.accessible_companies.all(),
-                )
-        elif user.role in ('company_admin', 'company_user'):
-            qs = qs.filter(
-                account_configuration__account__company=user.company,
-            )
-        else:
-            return GSCSearchData.objects.none()
+        qs = _scope_to_user(qs, self.request.user)
 
         # Query-param filters
         params = self.request.query_params
+        qs = _filter_config_and_dates(qs, params)
 
-        config_id = params.get('account_configuration')
-        if config_id:
-            qs = qs.filter(account_configuration_id=config_id)
-
-        date_from = params.get('date_from')
-        if date_from:
-            qs = qs.filter(date__gte=date_from)
-
-        date_to = params.get('date_to')
-        if date_to:
-            qs = qs.filter(date__lte=date_to)
-
+        # Substring filters are served by the trigram indexes on query/page
         query = params.get('query')
         if query:
             qs = qs.filter(query__icontains=query)
@@ -158,25 +209,89 @@ class GSCSearchDataViewSet(viewsets.ReadOnlyModelViewSet):
 
         return qs
 
+    def get_rollup_queryset(self, model=GSCDailyTotal):
+        """
+        *model* rollup rows for the tenant, config and date filters, or None
+        when the request searches query/page text (only gsc_search_data has
+        both dimensions).
+        """
+        params = self.request.query_params
+        if model is GSCDailyTotal and (params.get('query') or params.get('page_url')):
+            return None
+
+        qs = _scope_to_user(model.objects.all(), self.request.user)
+        return _filter_config_and_dates(qs, params)
+
+    def _metric_rows(self):
+        """(queryset, aggregates) from the rollups when possible, else gsc_search_data."""
+        qs = self.get_rollup_queryset()
+        rollup = qs is not None
+        if not rollup:
+            qs = self.get_queryset()
+        return qs, _aggregates(GSC_TOTALS, self.averages, rollup)
+
     @action(detail=False, methods=['get'])
     def summary(self, request):
-        """Aggregated metrics for the current filtered queryset."""
-        qs = self.get_queryset()
-
-        agg = qs.aggregate(
-            total_clicks=Sum('clicks'),
-            total_impressions=Sum('impressions'),
-            avg_ctr=Avg('ctr'),
-            avg_position=Avg('position'),
-            unique_queries=Count('query', distinct=True),
-            unique_pages=Count('page', distinct=True),
-            row_count=Count('id'),
-        )
-
-        # Replace None with 0 for empty querysets
-        for key in agg:
-            if agg[key] is None:
-                agg[key] = 0
+        """Aggregated metrics for the current filters."""
+        qs, aggregates = self._metric_rows()
+        if qs.model is GSCDailyTotal:
+            agg = _metrics(qs.aggregate(**aggregates), GSC_TOTALS, self.averages)
+            agg['unique_queries'] = self.get_rollup_queryset(GSCQueryDaily).aggregate(
+                count=Count('query', distinct=True),
+            )['count']
+            agg['unique_pages'] = self.get_rollup_queryset(GSCPageDaily).aggregate(
+                count=Count('page', distinct=True),
+            )['count']
+        else:
+            values = qs.aggregate(
+                **aggregates,
+                unique_queries=Count('query', distinct=True),
+                unique_pages=Count('page', distinct=True),
+            )
+            agg = _metrics(values, GSC_TOTALS, self.averages)
+            agg['unique_queries'] = values['unique_queries']
+            agg['unique_pages'] = values['unique_pages']
 
         serializer = GSCSearchDataSummarySerializer(agg)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def trend(self, request):
+        """Aggregated metrics per day for the current filters."""
+        qs, aggregates = self._metric_rows()
+        days = qs.values('date').annotate(**aggregates).order_by('date')
+        trend = [
+            {'date': row['date'], **_metrics(row, GSC_TOTALS, self.averages)}
+            for row in days
+        ]
+
+        serializer = GSCSearchDataTrendSerializer(trend, many=True)
+        return Response(serializer.data)
+
+    def _top(self, model, dimension, search):
+        """Top *dimension* values by clicks over the filtered date range."""
+        qs = self.get_rollup_queryset(model)
+        if search:
+            qs = qs.filter(**{f'{dimension}__icontains': search})
+
+        rows = qs.values(dimension).annotate(
+            **_aggregates(GSC_TOTALS, self.averages, rollup=True),
+        ).order_by('-agg_total_clicks', '-agg_total_impressions', dimension)
+        return [
+            {dimension: row[dimension], **_metrics(row, GSC_TOTALS, self.averages)}
+            for row in rows[:_top_limit(self.request.query_params)]
+        ]
+
+    @action(detail=False, methods=['get'])
+    def top_queries(self, request):
+        """Queries with the most clicks; ``query`` filters by substring."""
+        rows = self._top(GSCQueryDaily, 'query', request.query_params.get('query'))
+        serializer = GSCTopQuerySerializer(rows, many=True)
+        return Response(serializer.data)
+
+    @action(detail=False, methods=['get'])
+    def top_pages(self, request):
+        """Pages with the most clicks; ``page_url`` filters by substring."""
+        rows = self._top(GSCPageDaily, 'page', request.query_params.get('page_url'))
+        serializer = GSCTopPageSerializer(rows, many=True)
+        return Response(serializer.data)
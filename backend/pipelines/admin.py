@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck, PipelineAnalytics
+from .models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck, PipelineAnalytics, PipelineJobMetric
 
 
 @admin.register(DataPipeline)
@@ -166,7 +166,7 @@ class PipelineAnalyticsAdmin(admin.ModelAdmin):
             )
         }),
         ('Metrics', {
-            'fields': ('avg_job_duration', 'data_quality_score')
+            'fields': ('avg_job_duration', 'total_job_seconds', 'total_bytes_fetched', 'data_quality_score')
         }),
         ('Metadata', {
             'fields': ('created_at',),
@@ -178,3 +178,23 @@ class PipelineAnalyticsAdmin(admin.ModelAdmin):
         return super().get_queryset(request).select_related(
             'pipeline', 'pipeline__account'
         )
+
+
+@admin.register(PipelineJobMetric)
+class PipelineJobMetricAdmin(admin.ModelAdmin):
+    list_display = [
+        'pipeline', 'source', 'started_at', 'duration_seconds',
+        'items_processed', 'rows_per_second', 'bytes_fetched', 'success'
+    ]
+    list_filter = [
+        'source', 'success', 'started_at'
+    ]
+    search_fields = [
+        'pipeline__name', 'pipeline__account__name'
+    ]
+    readonly_fields = ['created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related(
+            'pipeline', 'pipeline__account'
+        )
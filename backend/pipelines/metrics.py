@@ -0,0 +1,88 @@
+"""
+Per-job pipeline metrics.
+
+``record_job_metrics`` is called once at the end of every sync or backfill
+with a pipeline.  It stores a PipelineJobMetric row (duration, rows/sec,
+bytes fetched) and folds the job into the day's PipelineAnalytics row with
+a single INSERT ... ON CONFLICT DO UPDATE, so concurrent workers add to the
+counters instead of overwriting each other.
+"""
+import logging
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import PipelineAnalytics, PipelineJobMetric
+
+logger = logging.getLogger(__name__)
+
+# avg_job_duration from a seconds expression, per backend DurationField storage
+DURATION_FROM_SECONDS = {
+    'postgresql': 'make_interval(secs => {})',
+    'sqlite': 'CAST(({}) * 1000000 AS INTEGER)',  # stored as microseconds
+}
+
+
+def _upsert_daily_analytics(pipeline, day, success, items_processed, seconds, bytes_fetched):
+    table = PipelineAnalytics._meta.db_table
+    duration = DURATION_FROM_SECONDS[connection.vendor]
+    average = f'({table}.total_job_seconds + EXCLUDED.total_job_seconds) / ({table}.total_jobs + 1)'
+    sql = f"""
+        INSERT INTO {table} (
+            pipeline_id, date, total_jobs, successful_jobs, failed_jobs,
+            total_items_processed, total_job_seconds, total_bytes_fetched,
+            avg_job_duration, created_at
+        )
+        VALUES (%s, %s, 1, %s, %s, %s, %s, %s, {duration.format('%s')}, %s)
+        ON CONFLICT (pipeline_id, date) DO UPDATE SET
+            total_jobs = {table}.total_jobs + 1,
+            successful_jobs = {table}.successful_jobs + EXCLUDED.successful_jobs,
+            failed_jobs = {table}.failed_jobs + EXCLUDED.failed_jobs,
+            total_items_processed = {table}.total_items_processed + EXCLUDED.total_items_processed,
+            total_job_seconds = {table}.total_job_seconds + EXCLUDED.total_job_seconds,
+            total_bytes_fetched = {table}.total_bytes_fetched + EXCLUDED.total_bytes_fetched,
+            avg_job_duration = {duration.format(average)}
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [
+            pipeline.id, day, int(success), int(not success),
+            items_processed, seconds, bytes_fetched, seconds, timezone.now(),
+        ])
+
+
+def record_job_metrics(pipeline, source, started_at, items_processed=0, bytes_fetched=0,
+                       success=True, job_id=None, finished_at=None):
+    """
+    Record one finished job run of *pipeline*.
+
+    *source* labels the job kind (``woocommerce_sync``, ``ga4_backfill``...).
+    Failures are logged, never raised: metrics must not fail a sync.
+    Returns the PipelineJobMetric, or None when nothing was recorded.
+    """
+    if pipeline is None:
+        return None
+
+    finished_at = finished_at or timezone.now()
+    seconds = max((finished_at - started_at).total_seconds(), 0.0)
+    items_processed = int(items_processed or 0)
+    bytes_fetched = int(bytes_fetched or 0)
+    try:
+        with transaction.atomic():
+            metric = PipelineJobMetric.objects.create(
+                pipeline=pipeline,
+                source=source,
+                job_id=job_id,
+                started_at=started_at,
+                duration_seconds=seconds,
+                items_processed=items_processed,
+                bytes_fetched=bytes_fetched,
+                rows_per_second=items_processed / seconds if seconds else 0.0,
+                success=success,
+            )
+            _upsert_daily_analytics(
+                pipeline, timezone.localdate(finished_at), success, items_processed, seconds, bytes_fetched,
+            )
+    except Exception as e:
+        logger.warning('Failed to record %s metrics for pipeline %s: %s', source, pipeline.id, e)
+        return None
+    return metric
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pipelines', '0002_remove_dataqualitycheck_data_source_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pipelinelog',
+            index=models.Index(fields=['created_at'], name='pipeline_logs_created_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pipelines', '0003_pipelinelog_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pipelineanalytics',
+            name='total_job_seconds',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pipelineanalytics',
+            name='total_bytes_fetched',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PipelineJobMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=50)),
+                ('job_id', models.IntegerField(blank=True, null=True)),
+                ('started_at', models.DateTimeField()),
+                ('duration_seconds', models.FloatField(default=0)),
+                ('items_processed', models.IntegerField(default=0)),
+                ('bytes_fetched', models.BigIntegerField(default=0)),
+                ('rows_per_second', models.FloatField(default=0)),
+                ('success', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('pipeline', models.ForeignKey(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='job_metrics',
+                    to='pipelines.datapipeline',
+                )),
+            ],
+            options={
+                'db_table': 'pipeline_job_metrics',
+                'ordering': ['-started_at'],
+                'indexes': [
+                    models.Index(fields=['pipeline', 'started_at'], name='pipeline_job_metrics_series'),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pipelines', '0004_pipeline_job_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pipelinejob',
+            name='progress',
+            field=models.JSONField(default=dict),
+        ),
+    ]
@@ -97,6 +97,7 @@ class PipelineJob(models.Model):
     
     # Job parameters
     parameters = models.JSONField(default=dict)  # Store job-specific parameters
+    progress = models.JSONField(default=dict)  # Live progress written by pipelines.progress.JobProgress
     
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -135,6 +136,9 @@ class PipelineLog(models.Model):
     class Meta:
         db_table = 'pipeline_logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='pipeline_logs_created_idx'),
+        ]
 
 
 class DataQualityCheck(models.Model):
@@ -171,6 +175,8 @@ class PipelineAnalytics(models.Model):
     successful_jobs = models.IntegerField(default=0)
     failed_jobs = models.IntegerField(default=0)
     total_items_processed = models.IntegerField(default=0)
+    total_job_seconds = models.FloatField(default=0)  # avg_job_duration = total_job_seconds / total_jobs
+    total_bytes_fetched = models.BigIntegerField(default=0)
     avg_job_duration = models.DurationField(null=True, blank=True)
     data_quality_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -179,3 +185,24 @@ class PipelineAnalytics(models.Model):
         db_table = 'pipeline_analytics'
         unique_together = ['pipeline', 'date']
         ordering = ['-date']
+
+
+class PipelineJobMetric(models.Model):
+    """Duration, throughput and bytes fetched for one pipeline job run"""
+    pipeline = models.ForeignKey(DataPipeline, on_delete=models.CASCADE, related_name='job_metrics')
+    source = models.CharField(max_length=50)  # e.g. woocommerce_sync, ga4_sync, gsc_backfill
+    job_id = models.IntegerField(null=True, blank=True)  # PipelineJob or WooCommerceJob id, per source
+    started_at = models.DateTimeField()
+    duration_seconds = models.FloatField(default=0)
+    items_processed = models.IntegerField(default=0)
+    bytes_fetched = models.BigIntegerField(default=0)
+    rows_per_second = models.FloatField(default=0)
+    success = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'pipeline_job_metrics'
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['pipeline', 'started_at'], name='pipeline_job_metrics_series'),
+        ]
@@ -0,0 +1,73 @@
+"""
+Live progress for PipelineJobs run by Celery workers.
+
+Syncs started from ``DataPipelineViewSet.sync_now`` return the job id
+straight away and run on a worker; the worker reports through
+``JobProgress`` and clients poll ``pipeline-jobs/<id>/progress/``.
+"""
+import logging
+import time
+
+from django.utils import timezone
+
+from .models import PipelineJob
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """
+    Writes pages fetched, rows written and an ETA to ``PipelineJob.progress``.
+
+    The ETA is extrapolated from the pages done so far, so it is only
+    available when the source reports its total page count.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.started = time.monotonic()
+        self.state = {
+            'pages_fetched': 0,
+            'total_pages': None,
+            'rows_written': 0,
+            'eta_seconds': None,
+        }
+
+    def update(self, **values):
+        """Merge *values* into the progress state and save it on the job."""
+        self.state.update({key: value for key, value in values.items() if value is not None})
+
+        pages = self.state['pages_fetched']
+        total_pages = self.state['total_pages']
+        if pages and total_pages:
+            elapsed = time.monotonic() - self.started
+            self.state['eta_seconds'] = round(elapsed / pages * max(total_pages - pages, 0), 1)
+        self.state['updated_at'] = timezone.now().isoformat()
+
+        try:
+            PipelineJob.objects.filter(id=self.job_id).update(
+                progress=self.state,
+                processed_items=self.state['rows_written'],
+                updated_at=timezone.now(),
+            )
+        except Exception as e:
+            # Progress is informational; never fail the sync over it
+            logger.warning('Failed to save progress for pipeline job %s: %s', self.job_id, e)
+
+
+def start_job(job_id):
+    """Mark a queued PipelineJob as running."""
+    now = timezone.now()
+    PipelineJob.objects.filter(id=job_id).update(status='running', started_at=now, updated_at=now)
+
+
+def finish_job(job_id, error=None, **counts):
+    """Mark a PipelineJob completed (or failed with *error*) and store its item *counts*."""
+    now = timezone.now()
+    PipelineJob.objects.filter(id=job_id).update(
+        status='failed' if error else 'completed',
+        error_message=error or '',
+        completed_at=now,
+        updated_at=now,
+        **counts,
+    )
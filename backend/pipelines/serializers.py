@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck, PipelineAnalytics
+from .models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck, PipelineAnalytics, PipelineJobMetric
 from users.serializers import AccountSerializer, AccountConfigurationSerializer
 
 
@@ -66,10 +66,10 @@ class PipelineJobSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'pipeline', 'pipeline_id', 'job_type', 'job_type_display', 'status', 'status_display',
             'scheduled_at', 'started_at', 'completed_at', 'error_message', 'total_items', 'processed_items',
-            'created_items', 'updated_items', 'failed_items', 'parameters', 'progress_percentage',
+            'created_items', 'updated_items', 'failed_items', 'parameters', 'progress', 'progress_percentage',
             'created_by', 'created_at', 'updated_at'
         ]
-        read_only_fields = ['created_by', 'created_at', 'updated_at', 'started_at', 'completed_at']
+        read_only_fields = ['created_by', 'created_at', 'updated_at', 'started_at', 'completed_at', 'progress']
 
 
 class PipelineLogSerializer(serializers.ModelSerializer):
@@ -106,6 +106,17 @@ class PipelineAnalyticsSerializer(serializers.ModelSerializer):
         model = PipelineAnalytics
         fields = [
             'id', 'pipeline', 'date', 'total_jobs', 'successful_jobs', 'failed_jobs',
-            'total_items_processed', 'avg_job_duration', 'data_quality_score', 'created_at'
+            'total_items_processed', 'total_job_seconds', 'total_bytes_fetched',
+            'avg_job_duration', 'data_quality_score', 'created_at'
         ]
-        read_only_fields = ['created_at'] 
\ No newline at end of file
+        read_only_fields = ['created_at']
+
+
+class PipelineJobMetricSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PipelineJobMetric
+        fields = [
+            'id', 'source', 'job_id', 'started_at', 'duration_seconds', 'items_processed',
+            'bytes_fetched', 'rows_per_second', 'success'
+        ]
+        read_only_fields = fields 
\ No newline at end of file
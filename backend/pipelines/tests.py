@@ -1,3 +1,111 @@
+from datetime import timedelta
+from unittest.mock import Mock, patch
+
 from django.test import TestCase
+from django.utils import timezone
+from kombu.exceptions import OperationalError
+from rest_framework.test import APIClient
+
+from users.models import Account, AccountConfiguration, Agency, Company, User
+
+from .metrics import record_job_metrics
+from .models import DataPipeline, PipelineAnalytics, PipelineJob, PipelineJobMetric
+
+
+def make_pipeline():
+    agency = Agency.objects.create(name='Agency')
+    company = Company.objects.create(name='Porsa ApS', agency=agency)
+    account = Account.objects.create(name='Porsa', company=company)
+    config = AccountConfiguration.objects.create(account=account, config_type='woocommerce')
+    return DataPipeline.objects.create(
+        name='Porsa Orders Sync', account=account, account_configuration=config, pipeline_type='woocommerce',
+    )
+
+
+class JobMetricsTests(TestCase):
+    def setUp(self):
+        self.pipeline = make_pipeline()
+
+    def test_jobs_fold_into_one_daily_row(self):
+        finished = timezone.now()
+        record_job_metrics(
+            self.pipeline, 'woocommerce_sync', finished - timedelta(seconds=10),
+            items_processed=100, bytes_fetched=2048, job_id=1, finished_at=finished,
+        )
+        record_job_metrics(
+            self.pipeline, 'woocommerce_sync', finished - timedelta(seconds=30),
+            items_processed=20, success=False, job_id=2, finished_at=finished,
+        )
+
+        analytics = PipelineAnalytics.objects.get(pipeline=self.pipeline)
+        self.assertEqual(
+            (analytics.total_jobs, analytics.successful_jobs, analytics.failed_jobs),
+            (2, 1, 1),
+        )
+        self.assertEqual(analytics.total_items_processed, 120)
+        self.assertEqual(analytics.total_bytes_fetched, 2048)
+        self.assertAlmostEqual(analytics.total_job_seconds, 40.0)
+        self.assertEqual(analytics.avg_job_duration, timedelta(seconds=20))
+
+        metric = PipelineJobMetric.objects.get(job_id=1)
+        self.assertEqual((metric.duration_seconds, metric.rows_per_second), (10.0, 10.0))
+
+    def test_no_pipeline_records_nothing(self):
+        self.assertIsNone(record_job_metrics(None, 'ga4_sync', timezone.now()))
+        self.assertFalse(PipelineJobMetric.objects.exists())
+
+
+class SyncNowTests(TestCase):
+    def setUp(self):
+        self.pipeline = make_pipeline()
+        user = User.objects.create_user(
+            username='anna', email='anna@example.com', password='pass',
+            role='company_user', company=self.pipeline.account.company,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def sync_now(self, **delay):
+        with patch('woocommerce.tasks.sync_woocommerce_config.delay', **delay) as queue:
+            response = self.client.post(f'/api/pipelines/{self.pipeline.id}/sync_now/')
+        return response, queue
+
+    def test_sync_is_queued(self):
+        response, queue = self.sync_now(return_value=Mock(id='task-1'))
+
+        self.assertEqual(response.status_code, 202)
+        job = PipelineJob.objects.get()
+        self.assertEqual(response.data, {
+            'success': True,
+            'message': 'Sync queued for Porsa Orders Sync',
+            'job_id': job.id,
+            'task_id': 'task-1',
+            'progress_url': f'/api/pipeline-jobs/{job.id}/progress/',
+        })
+        queue.assert_called_once_with(self.pipeline.account_configuration_id, 'manual_sync', pipeline_job_id=job.id)
+        self.assertEqual((job.status, job.parameters['task_id']), ('pending', 'task-1'))
+
+    def test_progress(self):
+        response, _ = self.sync_now(return_value=Mock(id='task-1'))
+        job_id = response.data['job_id']
+        PipelineJob.objects.filter(id=job_id).update(
+            status='running', processed_items=200, progress={'pages_fetched': 2, 'total_pages': 4},
+        )
+
+        response = self.client.get(f'/api/pipeline-jobs/{job_id}/progress/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'running')
+        self.assertEqual(response.data['processed_items'], 200)
+        self.assertEqual(response.data['progress'], {'pages_fetched': 2, 'total_pages': 4})
+        self.assertFalse(response.data['finished'])
+
+    def test_broker_error_fails_the_job(self):
+        response, _ = self.sync_now(side_effect=OperationalError('broker unreachable'))
 
-# Create your tests here.
+        job = PipelineJob.objects.get()
+        self.assertFalse(response.data['success'])
+        self.assertEqual(response.data['job_id'], job.id)
+        self.assertEqual((job.status, job.error_message), ('failed', 'broker unreachable'))
+        self.assertIsNotNone(job.completed_at)
+        self.assertTrue(self.client.get(f'/api/pipeline-jobs/{job.id}/progress/').data['finished'])
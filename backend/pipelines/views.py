@@ -9,9 +9,12 @@ from datetime import datetime, timedelta
 from .models import DataPipeline, PipelineJob, PipelineLog, DataQualityCheck, PipelineAnalytics
 from .serializers import (
     DataPipelineSerializer, PipelineJobSerializer, PipelineLogSerializer,
-    DataQualityCheckSerializer, PipelineAnalyticsSerializer
+    DataQualityCheckSerializer, PipelineAnalyticsSerializer, PipelineJobMetricSerializer
 )
 from users.models import User, Account, AccountConfiguration
+from users.scope import scope_to_accounts, tenant_scope
+
+THROUGHPUT_DEFAULT_DAYS = 30
 
 
 class DataPipelineViewSet(viewsets.ModelViewSet):
@@ -21,39 +24,7 @@ class DataPipelineViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """Filter pipelines based on user access"""
-        user = self.request.user
-        
-        # Super admin can see all pipelines
-        if user.role == 'super_admin':
-            return DataPipeline.objects.all()
-        
-        # Agency admin can see pipelines for their agency's companies
-        if user.role == 'agency_admin':
-            if user.access_all_companies:
-                return DataPipeline.objects.filter(account__company__agency=user.agency)
-            else:
-                return DataPipeline.objects.filter(
-                    account__company__in=user.accessible_companies.all()
-                )
-        
-        # Agency user can see pipelines for their accessible companies
-        if user.role == 'agency_user':
-            if user.access_all_companies:
-                return DataPipeline.objects.filter(account__company__agency=user.agency)
-            else:
-                return DataPipeline.objects.filter(
-                    account__company__in=user.accessible_companies.all()
-                )
-        
-        # Company admin can see pipelines for their company
-        if user.role == 'company_admin':
-            return DataPipeline.objects.filter(account__company=user.company)
-        
-        # Company user can see pipelines for their company
-        if user.role == 'company_user':
-            return DataPipeline.objects.filter(account__company=user.company)
-        
-        return DataPipeline.objects.none()
+        return scope_to_accounts(DataPipeline.objects.all(), self.request.user)
     
     def perform_create(self, serializer):
         """Set the created_by user"""
@@ -131,8 +102,15 @@ class DataPipelineViewSet(viewsets.ModelViewSet):
     
     @action(detail=True, methods=['post'])
     def sync_now(self, request, pk=None):
-        """Trigger an immediate sync for the pipeline"""
+        """
+        Queue an immediate sync for the pipeline
+
+        Returns the PipelineJob id straight away; the sync runs on a Celery worker,
+        which writes its progress to the job (see PipelineJobViewSet.progress).
+        """
         pipeline = self.get_object()
+        config = pipeline.account_configuration
+        job = None
         
         try:
             # Create a new job
@@ -144,181 +122,68 @@ class DataPipelineViewSet(viewsets.ModelViewSet):
                 created_by=request.user
             )
             
-            # Trigger the appropriate sync task based on pipeline type
+            # Queue the appropriate sync task based on pipeline type
             if pipeline.pipeline_type == 'woocommerce':
                 from woocommerce.tasks import sync_woocommerce_config
-                # Get the account configuration
-                config = pipeline.account_configuration
-                
-                try:
-                    # Run sync synchronously to get immediate results
-                    result = sync_woocommerce_config(config.id, 'manual_sync')
-                    
-                    if result.get('success'):
-                        # Update job status to completed
-                        job.status = 'completed'
-                        job.completed_at = timezone.now()
-                        job.orders_processed = result.get('orders_processed', 0)
-                        job.orders_created = result.get('orders_created', 0)
-                        job.orders_updated = result.get('orders_updated', 0)
-                        job.save()
-                        
-                        return Response({
-                            'success': True,
-                            'message': f'Sync completed successfully! {result.get("orders_processed", 0)} orders processed',
-                            'job_id': job.id,
-                            'orders_processed': result.get('orders_processed', 0),
-                            'orders_created': result.get('orders_created', 0),
-                            'orders_updated': result.get('orders_updated', 0)
-                        })
-                    else:
-                        # Update job status to failed
-                        job.status = 'failed'
-                        job.error_message = result.get('error', 'Unknown error')
-                        job.completed_at = timezone.now()
-                        job.save()
-                        
-                        return Response({
-                            'success': False,
-                            'message': f'Sync failed: {result.get("error", "Unknown error")}',
-                            'job_id': job.id
-                        })
-                        
-                except Exception as sync_error:
-                    # Update job status to failed
-                    job.status = 'failed'
-                    job.error_message = str(sync_error)
-                    job.completed_at = timezone.now()
-                    job.save()
-                    
-                    return Response({
-                        'success': False,
-                        'message': f'Failed to start sync: {str(sync_error)}',
-                        'job_id': job.id
-                    })
-
+                task = sync_woocommerce_config.delay(config.id, 'manual_sync', pipeline_job_id=job.id)
             elif pipeline.pipeline_type == 'google_analytics':
                 from google_pipelines.tasks import sync_ga4_config
-                config = pipeline.account_configuration
-
-                try:
-                    result = sync_ga4_config(config.id)
-
-                    if result.get('success'):
-                        job.status = 'completed'
-                        job.completed_at = timezone.now()
-                        job.processed_items = result.get('rows_processed', 0)
-                        job.created_items = result.get('rows_created', 0)
-                        job.updated_items = result.get('rows_updated', 0)
-                        job.save()
-
-                        return Response({
-                            'success': True,
-                            'message': f'GA4 sync completed! {result.get("rows_processed", 0)} rows processed',
-                            'job_id': job.id,
-                            'rows_processed': result.get('rows_processed', 0),
-                            'rows_created': result.get('rows_created', 0),
-                            'rows_updated': result.get('rows_updated', 0),
-                        })
-                    else:
-                        job.status = 'failed'
-                        job.error_message = result.get('error', 'Unknown error')
-                        job.completed_at = timezone.now()
-                        job.save()
-
-                        return Response({
-                            'success': False,
-                            'message': f'GA4 sync failed: {result.get("error", "Unknown error")}',
-                            'job_id': job.id,
-                        })
-
-                except Exception as sync_error:
-                    job.status = 'failed'
-                    job.error_message = str(sync_error)
-                    job.completed_at = timezone.now()
-                    job.save()
-
-                    return Response({
-                        'success': False,
-                        'message': f'Failed to start GA4 sync: {str(sync_error)}',
-                        'job_id': job.id,
-                    })
-
+                task = sync_ga4_config.delay(config.id, job_id=job.id)
             elif pipeline.pipeline_type == 'google_search_console':
                 from google_pipelines.tasks import sync_gsc_config
-                config = pipeline.account_configuration
-
-                try:
-                    result = sync_gsc_config(config.id)
-
-                    if result.get('success'):
-                        job.status = 'completed'
-                        job.completed_at = timezone.now()
-                        job.processed_items = result.get('rows_processed', 0)
-                        job.created_items = result.get('rows_created', 0)
-                        job.updated_items = result.get('rows_updated', 0)
-                        job.save()
-
-                        return Response({
-                            'success': True,
-                            'message': f'GSC sync completed! {result.get("rows_processed", 0)} rows processed',
-                            'job_id': job.id,
-                            'rows_processed': result.get('rows_processed', 0),
-                            'rows_created': result.get('rows_created', 0),
-                            'rows_updated': result.get('rows_updated', 0),
-                        })
-                    else:
-                        job.status = 'failed'
-                        job.error_message = result.get('error', 'Unknown error')
-                        job.completed_at = timezone.now()
-                        job.save()
-
-                        return Response({
-                            'success': False,
-                            'message': f'GSC sync failed: {result.get("error", "Unknown error")}',
-                            'job_id': job.id,
-                        })
-
-                except Exception as sync_error:
-                    job.status = 'failed'
-                    job.error_message = str(sync_error)
-                    job.completed_at = timezone.now()
-                    job.save()
-
-                    return Response({
-                        'success': False,
-                        'message': f'Failed to start GSC sync: {str(sync_error)}',
-                        'job_id': job.id,
-                    })
-
-            return Response({
-                'success': True,
-                'message': 'Sync job created successfully',
-                'job_id': job.id
-            })
+                task = sync_gsc_config.delay(config.id, job_id=job.id)
+            else:
+                return Response({
+                    'success': True,
+                    'message': 'Sync job created successfully',
+                    'job_id': job.id
+                })
             
         except Exception as e:
+            if job:
+                job.status = 'failed'
+                job.error_message = str(e)
+                job.completed_at = timezone.now()
+                job.save()
             return Response({
                 'success': False,
-                'message': f'Failed to start sync: {str(e)}'
+                'message': f'Failed to start sync: {str(e)}',
+                'job_id': job.id if job else None
             })
+        
+        job.parameters = {**job.parameters, 'task_id': task.id}
+        job.save(update_fields=['parameters', 'updated_at'])
+        
+        return Response({
+            'success': True,
+            'message': f'Sync queued for {pipeline.name}',
+            'job_id': job.id,
+            'task_id': task.id,
+            'progress_url': f'/api/pipeline-jobs/{job.id}/progress/'
+        }, status=status.HTTP_202_ACCEPTED)
     
+    @action(detail=True, methods=['get'])
+    def throughput(self, request, pk=None):
+        """Per-job duration, rows/sec and bytes fetched over the last ``days`` days (default 30)"""
+        pipeline = self.get_object()
+        try:
+            days = max(1, int(request.query_params.get('days', THROUGHPUT_DEFAULT_DAYS)))
+        except (TypeError, ValueError):
+            days = THROUGHPUT_DEFAULT_DAYS
+
+        metrics = pipeline.job_metrics.filter(
+            started_at__gte=timezone.now() - timedelta(days=days),
+        ).order_by('started_at')
+        source = request.query_params.get('source')
+        if source:
+            metrics = metrics.filter(source=source)
+
+        return Response(PipelineJobMetricSerializer(metrics, many=True).data)
+
     @action(detail=False, methods=['get'])
     def available_accounts(self, request):
         """Get accounts available to the current user"""
-        user = request.user
-        
-        if user.role == 'super_admin':
-            accounts = Account.objects.all()
-        elif user.role in ['agency_admin', 'agency_user']:
-            if user.access_all_companies:
-                accounts = Account.objects.filter(company__agency=user.agency)
-            else:
-                accounts = Account.objects.filter(company__in=user.accessible_companies.all())
-        elif user.role in ['company_admin', 'company_user']:
-            accounts = Account.objects.filter(company=user.company)
-        else:
-            accounts = Account.objects.none()
+        accounts = Account.objects.filter(id__in=tenant_scope(request.user)['account_ids'])
         
         from users.serializers import AccountSerializer
         return Response(AccountSerializer(accounts, many=True).data)
@@ -355,14 +220,26 @@ class PipelineJobViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Filter jobs based on user access to pipelines"""
-        user = self.request.user
-        
-        # Get accessible pipelines first
-        pipeline_viewset = DataPipelineViewSet()
-        pipeline_viewset.request = self.request
-        accessible_pipelines = pipeline_viewset.get_queryset()
+        return scope_to_accounts(PipelineJob.objects.all(), self.request.user, field='pipeline__account')
+    
+    @action(detail=True, methods=['get'])
+    def progress(self, request, pk=None):
+        """Status and live progress of a job, for polling while it runs"""
+        job = self.get_object()
         
-        return PipelineJob.objects.filter(pipeline__in=accessible_pipelines)
+        return Response({
+            'job_id': job.id,
+            'status': job.status,
+            'started_at': job.started_at,
+            'completed_at': job.completed_at,
+            'error_message': job.error_message,
+            'total_items': job.total_items,
+            'processed_items': job.processed_items,
+            'created_items': job.created_items,
+            'updated_items': job.updated_items,
+            'progress': job.progress,
+            'finished': job.status in ('completed', 'failed', 'cancelled')
+        })
     
     @action(detail=True, methods=['post'])
     def cancel(self, request, pk=None):
@@ -387,14 +264,7 @@ class PipelineLogViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Filter logs based on user access to pipelines"""
-        user = self.request.user
-        
-        # Get accessible pipelines first
-        pipeline_viewset = DataPipelineViewSet()
-        pipeline_viewset.request = self.request
-        accessible_pipelines = pipeline_viewset.get_queryset()
-        
-        return PipelineLog.objects.filter(pipeline__in=accessible_pipelines)
+        return scope_to_accounts(PipelineLog.objects.all(), self.request.user, field='pipeline__account')
 
 
 class DataQualityCheckViewSet(viewsets.ReadOnlyModelViewSet):
@@ -404,14 +274,7 @@ class DataQualityCheckViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Filter quality checks based on user access to pipelines"""
-        user = self.request.user
-        
-        # Get accessible pipelines first
-        pipeline_viewset = DataPipelineViewSet()
-        pipeline_viewset.request = self.request
-        accessible_pipelines = pipeline_viewset.get_queryset()
-        
-        return DataQualityCheck.objects.filter(pipeline__in=accessible_pipelines)
+        return scope_to_accounts(DataQualityCheck.objects.all(), self.request.user, field='pipeline__account')
 
 
 class PipelineAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
@@ -421,11 +284,4 @@ class PipelineAnalyticsViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Filter analytics based on user access to pipelines"""
-        user = self.request.user
-        
-        # Get accessible pipelines first
-        pipeline_viewset = DataPipelineViewSet()
-        pipeline_viewset.request = self.request
-        accessible_pipelines = pipeline_viewset.get_queryset()
-        
-        return PipelineAnalytics.objects.filter(pipeline__in=accessible_pipelines)
+        return scope_to_accounts(PipelineAnalytics.objects.all(), self.request.user, field='pipeline__account')
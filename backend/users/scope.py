@@ -0,0 +1,136 @@
+"""
+Cached tenant scope: the accounts a user may see.
+
+``tenant_scope(user)`` resolves the ids and names of the user's accounts
+from their role, agency/company and ``accessible_companies`` once, and
+caches them per user for TENANT_SCOPE_CACHE_TTL seconds.  Viewsets then
+scope with ``scope_to_accounts`` (integer IN on an account foreign key),
+``scope_to_accounts_or_names`` (the same, plus rows not linked to an account
+yet matched by name) or ``scope_to_client_names`` instead of joining through
+``account__company__agency`` on every request.
+
+A user's entry is dropped when the user or their accessible companies
+change; any Account or Company change bumps a global version instead, as
+it can move accounts in or out of many users' scopes (see users.signals).
+
+Cache errors never fail a request: the scope is then resolved from the
+database.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+from .models import Account
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'users:tenant_scope'
+VERSION_KEY = f'{KEY_PREFIX}:version'
+
+
+def _user_key(user_id, version):
+    return f'{KEY_PREFIX}:{version}:user:{user_id}'
+
+
+def scope_accounts(user):
+    """Account queryset for *user*'s role and company access (uncached)."""
+    if user.role == 'super_admin':
+        return Account.objects.all()
+    if user.role in ('agency_admin', 'agency_user'):
+        if user.access_all_companies:
+            return Account.objects.filter(company__agency=user.agency)
+        return Account.objects.filter(company__in=user.accessible_companies.all())
+    if user.role in ('company_admin', 'company_user'):
+        return Account.objects.filter(company=user.company)
+    return Account.objects.none()
+
+
+def _resolve(user):
+    rows = list(scope_accounts(user).order_by('id').values_list('id', 'name'))
+    return {
+        'account_ids': [account_id for account_id, _ in rows],
+        'account_names': [name for _, name in rows],
+    }
+
+
+def tenant_scope(user):
+    """
+    ``{'account_ids': [...], 'account_names': [...]}`` for *user*, from the
+    cache when possible.
+    """
+    try:
+        version = cache.get(VERSION_KEY, 0)
+        key = _user_key(user.pk, version)
+        scope = cache.get(key)
+    except Exception as e:
+        logger.warning(f"Tenant scope cache unavailable: {str(e)}")
+        return _resolve(user)
+
+    if scope is None:
+        scope = _resolve(user)
+        try:
+            cache.set(key, scope, settings.TENANT_SCOPE_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not cache tenant scope for user {user.pk}: {str(e)}")
+    return scope
+
+
+def scope_to_accounts(queryset, user, field='account'):
+    """Restrict *queryset* to rows whose *field* foreign key is one of *user*'s accounts."""
+    if user.role == 'super_admin':
+        return queryset
+    return queryset.filter(**{f'{field}__in': tenant_scope(user)['account_ids']})
+
+
+def scope_to_accounts_or_names(queryset, user, field='account', name_field='client_name'):
+    """
+    ``scope_to_accounts``, plus rows not linked to an account yet (*field*
+    NULL) whose *name_field* names one of *user*'s accounts.
+    """
+    if user.role == 'super_admin':
+        return queryset
+    scope = tenant_scope(user)
+    return queryset.filter(
+        Q(**{f'{field}__in': scope['account_ids']}) |
+        Q(**{f'{field}__isnull': True, f'{name_field}__in': scope['account_names']})
+    )
+
+
+def scope_to_client_names(queryset, user, field='client_name'):
+    """Restrict *queryset* to rows whose *field* names one of *user*'s accounts."""
+    if user.role == 'super_admin':
+        return queryset
+    return queryset.filter(**{f'{field}__in': tenant_scope(user)['account_names']})
+
+
+def matching_account_ids(user, name):
+    """
+    Ids of *user*'s accounts whose name contains *name* (case-insensitive),
+    for turning a client name parameter into an integer account filter.
+    """
+    name = (name or '').strip().lower()
+    scope = tenant_scope(user)
+    return [
+        account_id
+        for account_id, account_name in zip(scope['account_ids'], scope['account_names'])
+        if name in account_name.lower()
+    ]
+
+
+def invalidate_user_scope(user_id):
+    """Drop the cached scope of one user."""
+    try:
+        cache.delete(_user_key(user_id, cache.get(VERSION_KEY, 0)))
+    except Exception as e:
+        logger.warning(f"Could not invalidate tenant scope for user {user_id}: {str(e)}")
+
+
+def invalidate_all_scopes():
+    """Make every cached scope unreachable; entries then expire on their TTL."""
+    try:
+        cache.add(VERSION_KEY, 0, timeout=None)
+        cache.incr(VERSION_KEY)
+    except Exception as e:
+        logger.warning(f"Could not bump tenant scope version: {str(e)}")
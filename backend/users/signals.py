@@ -0,0 +1,37 @@
+"""
+Cache invalidation for the tenant scope (see users.scope).
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Account, Company, User
+from .scope import invalidate_all_scopes, invalidate_user_scope
+
+
+@receiver([post_save, post_delete], sender=Account)
+@receiver([post_save, post_delete], sender=Company)
+def account_changed(sender, **kwargs):
+    """An account was added, removed, renamed or moved to another company/agency."""
+    invalidate_all_scopes()
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    """Role, agency, company or access_all_companies may have changed."""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # login bookkeeping, not an access change
+    invalidate_user_scope(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.accessible_companies.through)
+def accessible_companies_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user_scope(instance.pk)
+    elif pk_set is not None:
+        for user_id in pk_set:
+            invalidate_user_scope(user_id)
+    else:
+        # company.accessible_users.clear(): the users are no longer known
+        invalidate_all_scopes()
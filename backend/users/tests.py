@@ -1,3 +1,80 @@
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Account, Agency, Company, User
+from .scope import invalidate_all_scopes, matching_account_ids, scope_to_accounts, tenant_scope
+
+
+class TenantScopeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.agency = Agency.objects.create(name='Agency')
+        self.porsa = Company.objects.create(name='Porsa ApS', agency=self.agency)
+        self.other = Company.objects.create(name='Other ApS', agency=self.agency)
+        self.porsa_dk = Account.objects.create(name='PorsaDK', company=self.porsa)
+        self.porsa_se = Account.objects.create(name='PorsaSE', company=self.porsa)
+        self.other_dk = Account.objects.create(name='OtherDK', company=self.other)
+        self.user = User.objects.create_user(
+            username='anna', email='anna@example.com', password='pass',
+            role='agency_user', agency=self.agency, access_all_companies=False,
+        )
+        self.user.accessible_companies.add(self.porsa)
+
+    def test_scope_is_cached(self):
+        self.assertEqual(tenant_scope(self.user), {
+            'account_ids': [self.porsa_dk.id, self.porsa_se.id],
+            'account_names': ['PorsaDK', 'PorsaSE'],
+        })
+        with self.assertNumQueries(0):
+            tenant_scope(self.user)
+
+    def test_scope_helpers(self):
+        self.assertEqual(matching_account_ids(self.user, ' porsas'), [self.porsa_se.id])
+        self.assertEqual(
+            list(scope_to_accounts(Account.objects.order_by('id'), self.user, field='id')),
+            [self.porsa_dk, self.porsa_se],
+        )
+
+    def test_account_change_bumps_every_scope(self):
+        tenant_scope(self.user)
+        self.porsa_se.name = 'PorsaSverige'
+        self.porsa_se.save()
+        self.assertEqual(tenant_scope(self.user)['account_names'], ['PorsaDK', 'PorsaSverige'])
+
+        self.other_dk.company = self.porsa
+        self.other_dk.save()
+        self.assertIn(self.other_dk.id, tenant_scope(self.user)['account_ids'])
+
+        self.porsa_dk.delete()
+        self.assertNotIn(self.porsa_dk.id, tenant_scope(self.user)['account_ids'])
+
+    def test_version_bump_without_existing_key(self):
+        tenant_scope(self.user)
+        cache.clear()
+        invalidate_all_scopes()
+        invalidate_all_scopes()
+        with self.assertNumQueries(1):
+            tenant_scope(self.user)
+
+    def test_user_save_invalidates_unless_only_last_login(self):
+        tenant_scope(self.user)
+        User.objects.filter(pk=self.user.pk).update(access_all_companies=True)  # no signal
+        self.user.access_all_companies = True
+
+        self.user.save(update_fields=['last_login'])
+        self.assertEqual(len(tenant_scope(self.user)['account_ids']), 2)
+
+        self.user.save()
+        self.assertEqual(len(tenant_scope(self.user)['account_ids']), 3)
+
+    def test_accessible_companies_changes_invalidate(self):
+        tenant_scope(self.user)
+        self.user.accessible_companies.add(self.other)
+        self.assertEqual(len(tenant_scope(self.user)['account_ids']), 3)
+
+        # From the company side
+        self.other.accessible_users.remove(self.user)
+        self.assertEqual(len(tenant_scope(self.user)['account_ids']), 2)
+
+        self.porsa.accessible_users.clear()
+        self.assertEqual(tenant_scope(self.user)['account_ids'], [])
@@ -0,0 +1,117 @@
+"""
+Backfill ``account`` on WooCommerce orders and jobs stored before the
+foreign key existed.
+
+Jobs take the account of their configuration.  Orders only carry
+``client_name``, which is resolved to an account through the jobs synced
+for that name, then by exact account name; names that stay ambiguous are
+reported and left alone (account-scoped views match unlinked rows by name
+meanwhile).  A client's daily rollup is rebuilt once its orders are linked,
+so its rows carry the account too.  Migration 0016 runs the backfill on
+deploy; the ``backfill_woocommerce_accounts`` command repeats it, e.g. once
+ambiguous names have been sorted out.  Rows are updated in short chunks,
+each its own statement, so the tables stay writable while the backfill runs.
+"""
+import logging
+import time
+
+from django.apps import apps as global_apps
+from django.db.models import Count, Max, OuterRef, Subquery
+
+from .rollups import rebuild_daily_rollup
+
+logger = logging.getLogger(__name__)
+
+ACCOUNT_BACKFILL_BATCH_SIZE = 5000
+
+
+def _update_in_chunks(queryset, batch_size, pause, **values):
+    """Update *queryset* with *values* up to *batch_size* rows at a time; returns rows updated."""
+    updated = 0
+    while True:
+        pks = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return updated
+        updated += queryset.model._default_manager.filter(pk__in=pks).update(**values)
+        if pause:
+            time.sleep(pause)
+
+
+def _managers(apps):
+    """Default managers of Account, AccountConfiguration, WooCommerceJob and WooCommerceOrder in *apps*."""
+    return [
+        apps.get_model(app_label, model_name)._default_manager
+        for app_label, model_name in (
+            ('users', 'Account'),
+            ('users', 'AccountConfiguration'),
+            ('woocommerce', 'WooCommerceJob'),
+            ('woocommerce', 'WooCommerceOrder'),
+        )
+    ]
+
+
+def resolve_client_accounts(client_names, apps=global_apps):
+    """Map each client name to an account id where that is unambiguous."""
+    accounts, configurations, jobs, _ = _managers(apps)
+    resolved = {}
+
+    # Jobs recorded the configuration they synced, so the account too
+    job_accounts = (
+        jobs
+        .filter(client_name__in=client_names, account_configuration__isnull=False)
+        .values('client_name')
+        .annotate(accounts=Count('account_configuration__account', distinct=True),
+                  account_id=Max('account_configuration__account'))
+    )
+    for row in job_accounts:
+        if row['accounts'] == 1:
+            resolved[row['client_name']] = row['account_id']
+
+    for name in set(client_names) - set(resolved):
+        account_ids = list(accounts.filter(name=name).values_list('id', flat=True))
+        if len(account_ids) > 1:
+            # Several accounts share the name: keep the one with a WooCommerce store
+            account_ids = list(
+                configurations
+                .filter(account_id__in=account_ids, config_type='woocommerce')
+                .values_list('account_id', flat=True)
+                .distinct()
+            )
+        if len(account_ids) == 1:
+            resolved[name] = account_ids[0]
+    return resolved
+
+
+def backfill_job_accounts(batch_size=ACCOUNT_BACKFILL_BATCH_SIZE, pause=0, apps=global_apps):
+    """Set ``account`` on jobs from their configuration; returns rows updated."""
+    _, configurations, jobs, _ = _managers(apps)
+    config_account = configurations.filter(pk=OuterRef('account_configuration')).values('account')
+    pending = jobs.filter(account__isnull=True, account_configuration__isnull=False)
+    return _update_in_chunks(pending, batch_size, pause, account=Subquery(config_account))
+
+
+def backfill_order_accounts(client_name=None, batch_size=ACCOUNT_BACKFILL_BATCH_SIZE, pause=0, apps=global_apps):
+    """
+    Set ``account`` on orders from their client name.
+
+    Returns ``(updated, unresolved)``: rows updated and the client names that
+    could not be matched to a single account.
+    """
+    orders = _managers(apps)[3]
+    pending = orders.filter(account__isnull=True)
+    if client_name:
+        pending = pending.filter(client_name=client_name)
+    client_names = list(pending.values_list('client_name', flat=True).distinct().order_by())
+
+    resolved = resolve_client_accounts(client_names, apps=apps)
+    # Migrations before 0019 see a rollup without the account column
+    rollup_model = apps.get_model('woocommerce', 'WooCommerceDailyRollup')
+    relink_rollup = any(field.name == 'account' for field in rollup_model._meta.get_fields())
+    updated = 0
+    for name, account_id in resolved.items():
+        count = _update_in_chunks(pending.filter(client_name=name), batch_size, pause, account_id=account_id)
+        logger.info('Linked %d orders of %s to account %s', count, name, account_id)
+        if count and relink_rollup:
+            rebuild_daily_rollup(name, apps=apps)
+        updated += count
+    return updated, sorted(set(client_names) - set(resolved))
@@ -0,0 +1,146 @@
+"""
+New vs returning customer classification for WooCommerce orders.
+
+An order is "new" when its customer (billing email, per client) has no earlier
+order, or the previous one is at least ``new_customer_window`` days older. The
+previous order date comes from ``LAG(date_created) OVER (PARTITION BY
+client_name, billing_email ORDER BY date_created)``, computed in one ordered
+pass over the customers' history (served by the (client_name, billing_email,
+date_created) index). That query runs once; its rows are streamed and the
+daily, per-customer and top-customer aggregates are folded from them in the
+same pass, skipping the older history that only feeds the LAG.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Case, F, IntegerField, Q, Value, When, Window
+from django.db.models.functions import Lag, TruncDate
+
+CURRENT_PERIOD = 1
+PREVIOUS_PERIOD = 0
+TOP_NEW_CUSTOMERS_LIMIT = 10
+HISTORY_CHUNK_SIZE = 2000
+
+
+def classified_orders(orders, start_date, end_date, new_customer_window, previous_start=None):
+    """
+    ``orders`` (with a billing email) up to ``end_date``, as a values queryset
+
+    Each row carries email, date_created, day, total, is_new (1/0) and
+    period: CURRENT_PERIOD from ``start_date``, PREVIOUS_PERIOD from
+    ``previous_start``, NULL for older history that only feeds the LAG.
+    """
+    previous_order_date = Window(
+        expression=Lag('date_created'),
+        partition_by=[F('client_name'), F('billing_email')],
+        order_by=[F('date_created').asc(), F('id').asc()],
+    )
+    period_whens = [When(date_created__gte=start_date, then=Value(CURRENT_PERIOD))]
+    if previous_start is not None:
+        period_whens.append(When(date_created__gte=previous_start, then=Value(PREVIOUS_PERIOD)))
+
+    # Only customers who ordered in the reported periods need their history walked
+    active_customers = orders.filter(
+        date_created__gte=previous_start if previous_start is not None else start_date,
+        date_created__lte=end_date,
+    ).values('billing_email')
+
+    history = (
+        orders
+        .exclude(billing_email__isnull=True)
+        .exclude(billing_email='')
+        .filter(date_created__lte=end_date, billing_email__in=active_customers)
+        .annotate(previous_order_date=previous_order_date)
+        .annotate(
+            is_new=Case(
+                When(
+                    Q(previous_order_date__isnull=True) |
+                    Q(previous_order_date__lte=F('date_created') - timedelta(days=new_customer_window)),
+                    then=Value(1),
+                ),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            period=Case(*period_whens, default=None, output_field=IntegerField()),
+            day=TruncDate('date_created'),
+        )
+        .values('date_created', 'total', 'day', 'is_new', 'period', email=F('billing_email'))
+        .order_by()
+    )
+    return history
+
+
+def customer_acquisition_summary(orders, start_date, end_date, new_customer_window, previous_start):
+    """
+    New/returning customer aggregates for ``orders`` between ``start_date`` and
+    ``end_date``, plus the previous period's new customer count
+
+    Returns a dict with ``daily`` (per-day new/returning orders and revenue),
+    ``customers`` (distinct new/returning emails, current and previous period)
+    and ``top_new_customers``.
+    """
+    history = classified_orders(
+        orders, start_date, end_date, new_customer_window, previous_start=previous_start
+    )
+
+    # day -> [new orders, new revenue, returning orders, returning revenue]
+    daily_totals = defaultdict(lambda: [0, 0, 0, 0])
+    new_emails, returning_emails, previous_new_emails = set(), set(), set()
+    # email -> [total spent, orders, first order date] over the new orders
+    new_customer_orders = {}
+
+    for row in history.iterator(chunk_size=HISTORY_CHUNK_SIZE):
+        period, is_new, total = row['period'], row['is_new'], row['total'] or 0
+        if period == PREVIOUS_PERIOD:
+            if is_new:
+                previous_new_emails.add(row['email'])
+            continue
+        if period != CURRENT_PERIOD:
+            continue
+
+        day = daily_totals[row['day']]
+        if is_new:
+            day[0] += 1
+            day[1] += total
+            new_emails.add(row['email'])
+            customer = new_customer_orders.setdefault(row['email'], [0, 0, row['date_created']])
+            customer[0] += total
+            customer[1] += 1
+            customer[2] = min(customer[2], row['date_created'])
+        else:
+            day[2] += 1
+            day[3] += total
+            returning_emails.add(row['email'])
+
+    daily = [
+        {
+            'date': day.isoformat(),
+            'new_customers': new_orders,
+            'revenue': float(new_revenue),
+            'orders': new_orders,
+            'returning_orders': returning_orders,
+            'returning_revenue': float(returning_revenue),
+        }
+        for day, (new_orders, new_revenue, returning_orders, returning_revenue) in sorted(daily_totals.items())
+    ]
+
+    top_rows = sorted(new_customer_orders.items(), key=lambda item: (-item[1][0], item[0]))
+    top_new_customers = [
+        {
+            'email': email,
+            'total_spent': float(total_spent),
+            'orders': order_count,
+            'first_order_date': first_order_date.isoformat(),
+        }
+        for email, (total_spent, order_count, first_order_date) in top_rows[:TOP_NEW_CUSTOMERS_LIMIT]
+    ]
+
+    return {
+        'daily': daily,
+        'customers': {
+            'new': len(new_emails),
+            'returning': len(returning_emails),
+            'previous_new': len(previous_new_emails),
+        },
+        'top_new_customers': top_new_customers,
+    }
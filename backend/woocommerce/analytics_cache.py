@@ -0,0 +1,164 @@
+"""
+Response cache for the WooCommerce analytics endpoints.
+
+Responses are cached per endpoint, user scope (role plus agency/company) and
+query parameters. Each key also embeds the cache versions of the clients the
+request can cover. ``bump_client_version`` after a sync (or
+``bump_global_version`` after a change affecting every client, such as channel
+reclassification) makes existing entries unreachable; they then expire on their TTL.
+
+Cache errors never fail a request: the endpoint is computed as if uncached.
+"""
+import hashlib
+import json
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+from users.scope import tenant_scope
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'woocommerce:analytics'
+GLOBAL_VERSION_KEY = f'{KEY_PREFIX}:version'
+METRIC_EVENTS = ('hit', 'miss')
+
+# Endpoint names registered by @cached_analytics, for cache_metrics()
+CACHED_ENDPOINTS = []
+
+
+def _client_version_key(client_name):
+    return f'{KEY_PREFIX}:version:client:{client_name}'
+
+
+def _metric_key(endpoint, event):
+    return f'{KEY_PREFIX}:metrics:{endpoint}:{event}'
+
+
+def _bump(key):
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception as e:
+        logger.warning(f"Could not bump analytics cache version {key}: {str(e)}")
+
+
+def bump_client_version(client_name):
+    """Invalidate cached analytics covering ``client_name``"""
+    _bump(_client_version_key(client_name))
+
+
+def bump_global_version():
+    """Invalidate every cached analytics response"""
+    _bump(GLOBAL_VERSION_KEY)
+
+
+def _record(endpoint, event):
+    key = _metric_key(endpoint, event)
+    try:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+    except Exception:
+        pass
+
+
+def cache_metrics():
+    """Hit/miss counters per cached endpoint since the cache was last flushed"""
+    keys = [_metric_key(endpoint, event) for endpoint in CACHED_ENDPOINTS for event in METRIC_EVENTS]
+    counts = cache.get_many(keys)
+    metrics = {}
+    for endpoint in CACHED_ENDPOINTS:
+        hits = counts.get(_metric_key(endpoint, 'hit'), 0)
+        misses = counts.get(_metric_key(endpoint, 'miss'), 0)
+        metrics[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / (hits + misses) * 100, 1) if hits + misses else 0,
+        }
+    return metrics
+
+
+def _user_scope(user):
+    """Cache partition shared by users who see the same accounts"""
+    if user.role == 'super_admin':
+        return 'all'
+    if user.role in ['agency_admin', 'agency_user']:
+        if not user.access_all_companies:
+            return f'user:{user.pk}'
+        return f'agency:{user.agency_id}'
+    if user.role in ['company_admin', 'company_user']:
+        return f'company:{user.company_id}'
+    return 'none'
+
+
+def _covered_clients(names, client_name):
+    """
+    Account names a request for ``client_name`` may include
+
+    Endpoints match the parameter loosely (icontains, or its part before
+    " - "), so this errs on the side of including too many clients.
+    """
+    client_name = (client_name or '').strip().lower()
+    if not client_name or client_name == 'all':
+        return names
+    candidates = {client_name, client_name.split(' - ')[0].strip()}
+    return [
+        name for name in names
+        if any(candidate in name.lower() or name.lower() in candidate for candidate in candidates)
+    ]
+
+
+def analytics_cache_key(endpoint, request):
+    names = tenant_scope(request.user)['account_names']
+    clients = sorted(_covered_clients(names, request.query_params.get('client_name')))
+    versions = cache.get_many([GLOBAL_VERSION_KEY] + [_client_version_key(name) for name in clients])
+    params = sorted((key, sorted(values)) for key, values in request.query_params.lists())
+    digest = hashlib.md5(json.dumps({
+        'params': params,
+        'versions': [versions.get(GLOBAL_VERSION_KEY, 0)] + [
+            [name, versions.get(_client_version_key(name), 0)] for name in clients
+        ],
+    }).encode()).hexdigest()
+    return f'{KEY_PREFIX}:{endpoint}:{_user_scope(request.user)}:{digest}'
+
+
+def cached_analytics(timeout=None):
+    """
+    Cache a GET analytics action's successful response
+
+    ``timeout`` defaults to ``settings.WOOCOMMERCE_ANALYTICS_CACHE_TTL``. Responses
+    carry ``X-Cache: HIT`` or ``MISS``.
+    """
+    def decorator(view_func):
+        endpoint = view_func.__name__
+        CACHED_ENDPOINTS.append(endpoint)
+
+        @wraps(view_func)
+        def wrapper(self, request, *args, **kwargs):
+            try:
+                key = analytics_cache_key(endpoint, request)
+                cached = cache.get(key)
+            except Exception as e:
+                logger.warning(f"Analytics cache unavailable for {endpoint}: {str(e)}")
+                return view_func(self, request, *args, **kwargs)
+
+            if cached is not None:
+                _record(endpoint, 'hit')
+                response = Response(cached)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            _record(endpoint, 'miss')
+            response = view_func(self, request, *args, **kwargs)
+            if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+                try:
+                    cache.set(key, response.data, timeout or settings.WOOCOMMERCE_ANALYTICS_CACHE_TTL)
+                except Exception as e:
+                    logger.warning(f"Could not cache {endpoint} response: {str(e)}")
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
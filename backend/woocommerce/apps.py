@@ -3,4 +3,7 @@ from django.apps import AppConfig
 
 class WooCommerceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'woocommerce' 
\ No newline at end of file
+    name = 'woocommerce' 
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,495 @@
+"""
+Channel attribution for WooCommerce orders.
+
+The sync resolves each order's normalised source, medium and channel type once
+(``resolve_order_attribution``) and stores them on the order, together with the
+source and medium extracted before raw payload overrides. Reports group on those
+columns in SQL; only orders not yet resolved have ``raw_data`` read, in one
+streamed pass. The per-group results are then folded into channel buckets
+exactly as the original per-order loop did.
+"""
+import re
+
+from django.apps import apps as global_apps
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Floor, Greatest
+
+from .models import WooCommerceOrder
+
+# Order columns resolve_order_attribution fills in
+ATTRIBUTION_FIELDS = ['traffic_source', 'traffic_medium', 'channel_type', 'extracted_source', 'extracted_medium']
+
+RAW_DATA_CHUNK_SIZE = 2000
+ATTRIBUTION_BACKFILL_BATCH_SIZE = 1000
+
+REFERRER_SOURCES = [
+    (('google',), 'google', 'organic'),
+    (('bing',), 'bing', 'organic'),
+    (('yahoo',), 'yahoo', 'organic'),
+    (('trustpilot',), 'trustpilot', 'referral'),
+    (('chatgpt', 'openai'), 'chatgpt', 'referral'),
+    (('facebook',), 'facebook', 'social'),
+    (('instagram',), 'instagram', 'social'),
+    (('linkedin',), 'linkedin', 'social'),
+    (('twitter', 'x.com'), 'twitter', 'social'),
+]
+
+
+def normalize_source(source):
+    """Normalize common source values"""
+    source = source.lower().strip()
+
+    # Normalize common sources
+    if 'google' in source:
+        return 'google'
+    elif 'facebook' in source or 'fb' in source:
+        return 'facebook'
+    elif 'instagram' in source or 'ig' in source:
+        return 'instagram'
+    elif 'linkedin' in source:
+        return 'linkedin'
+    elif 'twitter' in source or 'x.com' in source:
+        return 'twitter'
+    elif 'youtube' in source or 'yt' in source:
+        return 'youtube'
+    elif 'tiktok' in source:
+        return 'tiktok'
+    elif 'pinterest' in source:
+        return 'pinterest'
+    elif 'bing' in source:
+        return 'bing'
+    elif 'yahoo' in source:
+        return 'yahoo'
+    elif 'direct' in source or source == '(direct)':
+        return '(direct)'
+    elif 'email' in source:
+        return 'email'
+    elif 'referral' in source or 'referrer' in source:
+        return 'referral'
+
+    return source
+
+
+def normalize_medium(medium):
+    """Normalize common medium values"""
+    medium = medium.lower().strip()
+
+    # Normalize common mediums
+    if 'organic' in medium or 'natural' in medium:
+        return 'organic'
+    elif 'cpc' in medium or 'paid' in medium or 'ppc' in medium:
+        return 'cpc'
+    elif 'utm' in medium:
+        return 'utm'  # Keep utm as utm for Paid Search classification
+    elif 'social' in medium:
+        return 'social'
+    elif 'email' in medium:
+        return 'email'
+    elif 'referral' in medium:
+        return 'referral'
+    elif 'typein' in medium or 'direct' in medium:
+        return 'typein'
+    elif 'banner' in medium or 'display' in medium:
+        return 'display'
+    elif 'affiliate' in medium:
+        return 'affiliate'
+
+    return medium
+
+
+def extract_traffic_source(attr_source, attr_medium, raw_data):
+    """
+    Extract (source, medium) from an order's attribution fields, falling back
+    to UTM parameters, meta data, notes and referrer in its raw payload
+    """
+    source = '(direct)'
+    medium = 'typein'
+
+    # Prefer normalized attribution fields persisted on the model
+    if attr_source:
+        source = str(attr_source).strip().lower()
+        medium = str(attr_medium or 'utm').strip().lower()
+        return normalize_source(source), normalize_medium(medium)
+
+    if not raw_data or not isinstance(raw_data, dict):
+        return source, medium
+
+    # Method 1: Direct UTM parameters or WooCommerce attribution meta
+    utm_source = (
+        raw_data.get('utm_source') or
+        raw_data.get('source') or
+        raw_data.get('_source')
+    )
+
+    utm_medium = (
+        raw_data.get('utm_medium') or
+        raw_data.get('medium') or
+        raw_data.get('_medium')
+    )
+
+    # Method 2: Check meta_data array for UTM parameters and WC attribution keys
+    if not utm_source or not utm_medium:
+        meta_data = raw_data.get('meta_data', [])
+        if isinstance(meta_data, list):
+            for meta_item in meta_data:
+                if isinstance(meta_item, dict):
+                    key = meta_item.get('key', '').lower()
+                    value = meta_item.get('value', '')
+
+                    if 'utm_source' in key and value:
+                        utm_source = value
+                    elif 'utm_medium' in key and value:
+                        utm_medium = value
+                    # WooCommerce Order Attribution plugin keys
+                    elif key == '_wc_order_attribution_utm_source' and value:
+                        utm_source = value
+                    elif key == '_wc_order_attribution_source_type' and value:
+                        utm_medium = value
+                    elif 'source' in key and value:
+                        utm_source = value
+                    elif 'medium' in key and value:
+                        utm_medium = value
+
+    # Method 3: Extract from order notes using regex
+    if not utm_source or not utm_medium:
+        note = raw_data.get('note', '')
+        if note:
+            # Look for UTM parameters in notes
+            utm_source_match = re.search(r'utm_source[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
+            if utm_source_match:
+                utm_source = utm_source_match.group(1)
+
+            utm_medium_match = re.search(r'utm_medium[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
+            if utm_medium_match:
+                utm_medium = utm_medium_match.group(1)
+
+            # Look for other traffic source indicators
+            if not utm_source:
+                source_match = re.search(r'source[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
+                if source_match:
+                    utm_source = source_match.group(1)
+
+            if not utm_medium:
+                medium_match = re.search(r'medium[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
+                if medium_match:
+                    utm_medium = medium_match.group(1)
+
+    # Method 4: Check for referrer information
+    if not utm_source:
+        referrer = raw_data.get('referrer') or raw_data.get('_referrer')
+        if referrer:
+            # Extract domain from referrer
+            domain_match = re.search(r'https?://(?:www\.)?([^/]+)', referrer)
+            if domain_match:
+                domain = domain_match.group(1).lower()
+                for needles, referrer_source, referrer_medium in REFERRER_SOURCES:
+                    if any(needle in domain for needle in needles):
+                        utm_source = referrer_source
+                        utm_medium = referrer_medium
+                        break
+
+    # Method 5: Check custom fields that might contain traffic data
+    if not utm_source or not utm_medium:
+        for key, value in raw_data.items():
+            if isinstance(value, str) and value:
+                key_lower = key.lower()
+                if 'traffic' in key_lower or 'source' in key_lower:
+                    if not utm_source:
+                        utm_source = value
+                    elif not utm_medium:
+                        utm_medium = value
+
+    # Clean and validate extracted values
+    if utm_source and utm_source.strip():
+        source = utm_source.strip().lower()
+    if utm_medium and utm_medium.strip():
+        medium = utm_medium.strip().lower()
+
+    return normalize_source(source), normalize_medium(medium)
+
+
+def apply_raw_overrides(source, medium, raw_data):
+    """
+    Let top-level UTM keys or a UTM-tagged note in the raw payload override the
+    extracted source/medium (values are used as found, without normalizing)
+    """
+    if not raw_data or not isinstance(raw_data, dict):
+        return source, medium
+
+    utm_source = (
+        raw_data.get('utm_source') or
+        raw_data.get('source') or
+        raw_data.get('referrer') or
+        raw_data.get('_source') or
+        raw_data.get('_medium')
+    )
+
+    utm_medium = (
+        raw_data.get('utm_medium') or
+        raw_data.get('medium') or
+        raw_data.get('_medium')
+    )
+
+    # Check order notes for UTM parameters
+    if not utm_source and raw_data.get('note'):
+        note = raw_data.get('note', '')
+        utm_match = re.search(r'utm_source=([^&\s]+)', note)
+        if utm_match:
+            utm_source = utm_match.group(1)
+
+        utm_medium_match = re.search(r'utm_medium=([^&\s]+)', note)
+        if utm_medium_match:
+            utm_medium = utm_medium_match.group(1)
+
+    if utm_source:
+        source = utm_source
+    if utm_medium:
+        medium = utm_medium
+    return source, medium
+
+
+def load_classification_map(apps=global_apps):
+    """Active ChannelClassification rules keyed by lowercase (source, medium)"""
+    rules = apps.get_model('woocommerce', 'ChannelClassification')._default_manager.filter(is_active=True)
+    return {(rule.source.lower(), rule.medium.lower()): rule.channel_type for rule in rules}
+
+
+def resolve_order_attribution(attr_source, attr_medium, raw_data, classification_map):
+    """Values of ATTRIBUTION_FIELDS for an order"""
+    extracted_source, extracted_medium = extract_traffic_source(attr_source, attr_medium, raw_data)
+    source, medium = apply_raw_overrides(extracted_source, extracted_medium, raw_data)
+    return {
+        'traffic_source': str(source)[:255],
+        'traffic_medium': str(medium)[:255],
+        'channel_type': classification_map.get((source, medium), 'Direct'),
+        'extracted_source': str(extracted_source)[:255],
+        'extracted_medium': str(extracted_medium)[:255],
+    }
+
+
+def reclassify_orders(pairs=None):
+    """
+    Recompute stored channel_type from the active rules, one UPDATE per
+    (traffic_source, traffic_medium) pair
+
+    ``pairs`` limits the work to the lowercase pairs a rule change touched;
+    by default every stored pair is re-resolved. Returns rows updated.
+    """
+    classification_map = load_classification_map()
+    resolved = WooCommerceOrder.objects.exclude(channel_type='')
+    if pairs is None:
+        pairs = resolved.values_list('traffic_source', 'traffic_medium').distinct().order_by()
+
+    updated = 0
+    for source, medium in pairs:
+        channel_type = classification_map.get((source, medium), 'Direct')
+        updated += (
+            resolved.filter(traffic_source=source, traffic_medium=medium)
+            .exclude(channel_type=channel_type)
+            .update(channel_type=channel_type)
+        )
+    return updated
+
+
+def backfill_order_attribution(orders=None, batch_size=ATTRIBUTION_BACKFILL_BATCH_SIZE, apps=global_apps):
+    """
+    Resolve attribution for stored orders that don't have it yet; returns rows updated
+
+    ``apps`` is the app registry to take the models from (a migration passes
+    its historical one, which may predate some of ATTRIBUTION_FIELDS).
+    """
+    order_model = apps.get_model('woocommerce', 'WooCommerceOrder')
+    stored = {field.name for field in order_model._meta.get_fields()}
+    fields = [field for field in ATTRIBUTION_FIELDS if field in stored]
+    unresolved = Q(channel_type='')
+    if 'extracted_source' in stored:
+        unresolved |= Q(extracted_source='')
+    classification_map = load_classification_map(apps)
+    orders = (orders if orders is not None else order_model._default_manager.all()).filter(unresolved)
+
+    updated = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            orders.defer(None).filter(pk__gt=last_pk).order_by('pk')
+            .only('pk', 'attribution_utm_source', 'attribution_source_type', 'raw_data')[:batch_size]
+        )
+        if not batch:
+            return updated
+        for order in batch:
+            resolved = resolve_order_attribution(
+                order.attribution_utm_source, order.attribution_source_type, order.raw_data, classification_map
+            )
+            for field in fields:
+                setattr(order, field, resolved[field])
+        order_model._default_manager.bulk_update(batch, fields)
+        updated += len(batch)
+        last_pk = batch[-1].pk
+
+
+def _session_count():
+    # Orders count as one session unless attribution recorded more
+    return Case(
+        When(attribution_session_count__gt=0, then=F('attribution_session_count')),
+        default=Value(1),
+    )
+
+
+def attribution_groups(orders, classification_map):
+    """
+    Attribute a period's orders in one pass
+
+    Returns a list of groups, most recently created first, each holding the
+    channel report's source/medium and channel type, the extractor's
+    (pre-override) source/medium and the group's orders, revenue, sessions and
+    estimated sessions.
+    """
+    orders = orders.order_by()
+    groups = []
+
+    # Orders with stored attribution: one indexed group-by
+    resolved = (
+        orders.exclude(channel_type='')
+        .values('traffic_source', 'traffic_medium', 'channel_type', 'extracted_source', 'extracted_medium')
+        .annotate(
+            order_count=Count('id'),
+            revenue=Sum('total'),
+            sessions=Sum(_session_count()),
+            estimated_sessions=Sum(Greatest(
+                Floor(Coalesce(F('total'), Value(0)) / 100), Value(1), output_field=IntegerField()
+            )),
+            last_created=Max('date_created'),
+        )
+    )
+    for row in resolved:
+        groups.append({
+            'source': row['traffic_source'],
+            'medium': row['traffic_medium'],
+            'channel_type': row['channel_type'],
+            'extracted_source': row['extracted_source'],
+            'extracted_medium': row['extracted_medium'],
+            'orders': row['order_count'],
+            'revenue': float(row['revenue'] or 0),
+            'sessions': row['sessions'],
+            'estimated_sessions': row['estimated_sessions'],
+            'last_created': row['last_created'],
+        })
+
+    # Orders synced before attribution was stored need their raw payload; stream just the columns used
+    remaining = orders.filter(channel_type='').values_list(
+        'attribution_utm_source', 'attribution_source_type', 'attribution_session_count',
+        'total', 'date_created', 'raw_data'
+    )
+    for attr_source, attr_medium, session_count, total, date_created, raw_data in remaining.iterator(chunk_size=RAW_DATA_CHUNK_SIZE):
+        extracted_source, extracted_medium = extract_traffic_source(attr_source, attr_medium, raw_data)
+        source, medium = apply_raw_overrides(extracted_source, extracted_medium, raw_data)
+        total = float(total or 0)
+        groups.append({
+            'source': source,
+            'medium': medium,
+            'channel_type': classification_map.get((source, medium), 'Direct'),
+            'extracted_source': extracted_source,
+            'extracted_medium': extracted_medium,
+            'orders': 1,
+            'revenue': total,
+            'sessions': session_count if session_count and session_count > 0 else 1,
+            'estimated_sessions': max(1, int(total / 100)),
+            'last_created': date_created,
+        })
+
+    # Channels and examples are listed in the order they are first seen, newest order first
+    groups.sort(key=lambda group: (group['last_created'] is not None, group['last_created']), reverse=True)
+    return groups
+
+
+def _channel_bucket(channel_type, source, medium):
+    return {
+        'channelType': channel_type,
+        'sessions': 0,
+        'orders': 0,
+        'orderTotal': 0,
+        'cvr': 0,
+        'aov': 0,
+        'sourceMedium': f"{source}/{medium}"
+    }
+
+
+def channel_performance(groups):
+    """Sessions, orders, revenue, CVR and AOV per channel type plus a total"""
+    channel_data = {}
+    total_sessions = 0
+    total_orders = 0
+    total_revenue = 0
+
+    for group in groups:
+        source, medium = group['source'], group['medium']
+
+        channel_type = group['channel_type']
+        if channel_type not in channel_data:
+            channel_data[channel_type] = _channel_bucket(channel_type, source, medium)
+
+        # Override grouping for specific sources to align with expected report buckets
+        if source == 'bing':
+            channel_type = 'Bing'
+        elif source in ['trustpilot']:
+            channel_type = 'Trustpulot' if 'Trustpulot' in channel_data else 'Trustpilot'
+        elif source in ['chatgpt', 'openai']:
+            channel_type = 'ChatGPT'
+        if channel_type not in channel_data:
+            channel_data[channel_type] = _channel_bucket(channel_type, source, medium)
+
+        channel = channel_data[channel_type]
+        channel['orders'] += group['orders']
+        channel['orderTotal'] += group['revenue']
+        channel['sessions'] += group['sessions']
+        total_orders += group['orders']
+        total_revenue += group['revenue']
+        total_sessions += group['sessions']
+
+    # Calculate CVR and AOV for each channel
+    for channel in channel_data.values():
+        if channel['sessions'] > 0:
+            channel['cvr'] = (channel['orders'] / channel['sessions']) * 100
+        if channel['orders'] > 0:
+            channel['aov'] = channel['orderTotal'] / channel['orders']
+
+    return {
+        'total': {
+            'channelType': 'Total',
+            'sessions': total_sessions,
+            'orders': total_orders,
+            'orderTotal': total_revenue,
+            'cvr': (total_orders / total_sessions * 100) if total_sessions > 0 else 0,
+            'aov': (total_revenue / total_orders) if total_orders > 0 else 0,
+            'sourceMedium': 'All Channels'
+        },
+        'channels': list(channel_data.values())
+    }
+
+
+def unclassified_sources(groups, classification_map):
+    """Source/medium combinations no active classification rule covers"""
+    unclassified = {}
+
+    for group in groups:
+        source = (group['extracted_source'] or '(direct)').lower()
+        medium = (group['extracted_medium'] or 'typein').lower()
+
+        if (source, medium) not in classification_map:
+            key = f"{source}/{medium}"
+            if key not in unclassified:
+                unclassified[key] = {
+                    'source': source,
+                    'medium': medium,
+                    'sourceMedium': key,
+                    'sessions': 0
+                }
+            unclassified[key]['sessions'] += group['estimated_sessions']
+
+    # Convert to list and sort by sessions
+    unclassified_list = sorted(unclassified.values(), key=lambda x: x['sessions'], reverse=True)
+
+    return {
+        'count': len(unclassified_list),
+        'examples': unclassified_list[:10]  # Top 10 examples
+    }
@@ -0,0 +1,149 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+PER_PAGE = 100  # WooCommerce REST API maximum page size
+CONNECT_TIMEOUT = 10  # seconds
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class WooCommerceAPIError(Exception):
+    """Non-200 response from the WooCommerce REST API"""
+
+    def __init__(self, status_code, body, page=None):
+        self.status_code = status_code
+        self.body = body
+        self.page = page
+        super().__init__(f"WooCommerce API error: {status_code} - {body}")
+
+
+class WooCommerceClient:
+    """
+    WooCommerce REST API client for one store.
+
+    Owns a pooled ``requests.Session`` (keep-alive, timeouts, retries with
+    backoff on 429/5xx). ``iter_pages`` reads ``X-WP-TotalPages`` from the first
+    page and fetches the rest concurrently, at most ``max_workers`` at a time,
+    while still yielding pages in order.  ``bytes_fetched`` totals the
+    response bodies read so far.
+    """
+
+    def __init__(self, store_url, consumer_key, consumer_secret, max_workers=None, timeout=None, retries=3):
+        self.base_url = f"{store_url.rstrip('/')}/wp-json/wc/v3"
+        self.auth_params = {
+            'consumer_key': consumer_key,
+            'consumer_secret': consumer_secret,
+        }
+        self.max_workers = max(1, max_workers or settings.WOOCOMMERCE_MAX_CONCURRENT_PAGES)
+        self.timeout = (CONNECT_TIMEOUT, timeout or settings.WOOCOMMERCE_REQUEST_TIMEOUT)
+        self.session = self._build_session(retries)
+        self.bytes_fetched = 0
+        self.total_pages = None  # from X-WP-TotalPages once iter_pages has started
+        self._bytes_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config, **kwargs):
+        """Build a client from a WooCommerce AccountConfiguration"""
+        woocommerce_config = config.get_woocommerce_config()
+        if not woocommerce_config:
+            raise Exception("Invalid WooCommerce configuration")
+        kwargs.setdefault('max_workers', config.get_config('max_concurrent_requests'))
+        return cls(
+            woocommerce_config['store_url'],
+            woocommerce_config['consumer_key'],
+            woocommerce_config['consumer_secret'],
+            **kwargs
+        )
+
+    def _build_session(self, retries):
+        retry = Retry(
+            total=retries,
+            backoff_factor=1,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(['GET']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers, max_retries=retry)
+        session = requests.Session()
+        session.headers.update({'Content-Type': 'application/json'})
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_page(self, endpoint, params, page):
+        """Fetch one page; returns (rows, total_pages or None)"""
+        # Credentials go in the query string – some hosts reject Basic Auth entirely
+        response = self.session.get(
+            f"{self.base_url}/{endpoint}",
+            params={**params, **self.auth_params, 'per_page': PER_PAGE, 'page': page},
+            timeout=self.timeout,
+        )
+        with self._bytes_lock:
+            self.bytes_fetched += len(response.content)
+        if response.status_code != 200:
+            raise WooCommerceAPIError(response.status_code, response.text, page=page)
+
+        total_pages = response.headers.get('X-WP-TotalPages')
+        try:
+            total_pages = int(total_pages)
+        except (TypeError, ValueError):
+            total_pages = None
+        return response.json(), total_pages
+
+    def iter_pages(self, endpoint, params, start_page=1):
+        """
+        Yield ``(page, rows)`` for every page from ``start_page`` onwards, in order
+        """
+        rows, total_pages = self.get_page(endpoint, params, start_page)
+        self.total_pages = total_pages
+        if not rows:
+            return
+        yield start_page, rows
+        last_page, last_rows = start_page, rows
+
+        if total_pages and total_pages > start_page and self.max_workers > 1:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                pending = deque()
+                next_page = start_page + 1
+                try:
+                    while pending or next_page <= total_pages:
+                        # Keep at most max_workers requests in flight
+                        while next_page <= total_pages and len(pending) < self.max_workers:
+                            pending.append((next_page, executor.submit(self.get_page, endpoint, params, next_page)))
+                            next_page += 1
+                        page, future = pending.popleft()
+                        rows, _ = future.result()
+                        if not rows:
+                            return
+                        yield page, rows
+                        last_page, last_rows = page, rows
+                finally:
+                    for _, future in pending:
+                        future.cancel()
+
+        # Continue serially when the total is unknown or the result set grew mid-sync
+        while len(last_rows) >= PER_PAGE:
+            page = last_page + 1
+            rows, _ = self.get_page(endpoint, params, page)
+            if not rows:
+                return
+            yield page, rows
+            last_page, last_rows = page, rows
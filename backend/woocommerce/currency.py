@@ -0,0 +1,144 @@
+"""
+Currency resolution for the WooCommerce analytics endpoints.
+
+A client's configured currency (its company's ``currency_code``, else its
+active WooCommerce configuration's) is memoised per normalised client name
+in a small per-process LRU, backed by the shared cache.  Saving a Company or
+AccountConfiguration drops the names it covers from the shared cache and
+clears this process's LRU; other processes pick the change up within
+WOOCOMMERCE_CURRENCY_LOCAL_TTL seconds.
+
+Clients without a configured currency fall back to their first order's
+currency, which depends on the queryset passed in and is never cached.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from users.models import Account, AccountConfiguration
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'woocommerce:currency'
+DEFAULT_CURRENCY = 'DKK'
+
+# Stored for clients with no configured currency, so misses are cached too
+NO_CURRENCY = ''
+
+_local = OrderedDict()  # name -> (expires, currency)
+_local_lock = threading.Lock()
+
+
+def normalize_client_name(client_name):
+    """Lower-cased account part of a client label ("Porsa - woocommerce" -> "porsa")"""
+    return (client_name or '').split(' - ')[0].strip().lower()
+
+
+def _cache_key(name):
+    return f'{KEY_PREFIX}:{name}'
+
+
+def _local_get(name):
+    with _local_lock:
+        entry = _local.get(name)
+        if entry is None:
+            return None
+        expires, currency = entry
+        if expires < time.monotonic():
+            del _local[name]
+            return None
+        _local.move_to_end(name)
+        return currency
+
+
+def _local_set(name, currency):
+    with _local_lock:
+        _local[name] = (time.monotonic() + settings.WOOCOMMERCE_CURRENCY_LOCAL_TTL, currency)
+        _local.move_to_end(name)
+        while len(_local) > settings.WOOCOMMERCE_CURRENCY_LOCAL_SIZE:
+            _local.popitem(last=False)
+
+
+def _configured_currency(name):
+    """Company currency, else active WooCommerce config currency, else NO_CURRENCY"""
+    try:
+        acc = Account.objects.filter(name__iexact=name).select_related('company').first()
+        if acc and acc.company and acc.company.currency_code:
+            return acc.company.currency_code
+    except Exception:
+        pass
+
+    try:
+        cfg = AccountConfiguration.objects.filter(
+            account__name__iexact=name,
+            config_type='woocommerce',
+            is_active=True
+        ).first()
+        if cfg:
+            code = cfg.get_config('currency_code') or cfg.get_config('currency')
+            if code:
+                return code
+    except Exception:
+        pass
+
+    return NO_CURRENCY
+
+
+def configured_currency(client_name):
+    """The configured currency of ``client_name`` (memoised), or NO_CURRENCY"""
+    name = normalize_client_name(client_name)
+    if not name or name == 'all':
+        return NO_CURRENCY
+
+    currency = _local_get(name)
+    if currency is not None:
+        return currency
+
+    try:
+        currency = cache.get(_cache_key(name))
+    except Exception as e:
+        logger.warning(f"Currency cache unavailable: {str(e)}")
+    if currency is None:
+        currency = _configured_currency(name)
+        try:
+            cache.set(_cache_key(name), currency, settings.WOOCOMMERCE_CURRENCY_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"Could not cache currency for {name}: {str(e)}")
+
+    _local_set(name, currency)
+    return currency
+
+
+def get_currency_for_client(client_name, orders_queryset=None):
+    """
+    Determine the currency code for a client.
+    Priority: 1) Company currency, 2) WooCommerce config currency, 3) First order currency, 4) DKK default
+    """
+    currency = configured_currency(client_name)
+    if currency:
+        return currency
+
+    if orders_queryset is not None:
+        try:
+            first_currency = orders_queryset.exclude(currency__isnull=True).exclude(currency='').values_list('currency', flat=True).first()
+            if first_currency:
+                return first_currency
+        except Exception:
+            pass
+
+    return DEFAULT_CURRENCY
+
+
+def invalidate_currency(*client_names):
+    """Forget the memoised currency of ``client_names``"""
+    names = {normalize_client_name(name) for name in client_names} - {''}
+    with _local_lock:
+        _local.clear()
+    try:
+        cache.delete_many([_cache_key(name) for name in names])
+    except Exception as e:
+        logger.warning(f"Could not invalidate cached currencies: {str(e)}")
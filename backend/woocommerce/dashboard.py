@@ -0,0 +1,68 @@
+"""
+Query planning for the WooCommerce analytics dashboard.
+
+``period_kpis`` computes every scalar KPI of a period and the period before
+it in one pass over the daily rollup, with conditional (``FILTER``)
+aggregates.  ``period_breakdowns`` reads the period's rollup rows once,
+grouped by (date, status, payment method), and folds the daily trend and
+the status and payment method breakdowns from them.  Everything runs on
+the request's own connection.
+"""
+from django.db.models import Q, Sum
+
+COMPLETED_STATUSES = ('completed', 'processing')
+TOP_PAYMENT_METHODS = 10
+
+
+def period_kpis(rollup, start, prev_start):
+    """
+    Orders, revenue and completed orders from ``start`` on and for the
+    previous period ``prev_start``..``start`` (dates), in one query.
+    """
+    current = Q(date__gte=start)
+    previous = Q(date__gte=prev_start, date__lt=start)
+
+    # Prefixed so 'revenue' doesn't shadow the rollup field the later sums read
+    totals = rollup.filter(date__gte=prev_start).aggregate(
+        kpi_orders=Sum('order_count', filter=current),
+        kpi_revenue=Sum('revenue', filter=current),
+        kpi_completed_orders=Sum('order_count', filter=current & Q(status__in=COMPLETED_STATUSES)),
+        kpi_prev_orders=Sum('order_count', filter=previous),
+        kpi_prev_revenue=Sum('revenue', filter=previous),
+    )
+    return {key[len('kpi_'):]: value or 0 for key, value in totals.items()}
+
+
+def _totals(groups, name, count_key):
+    """``groups`` ({value: [orders, revenue]}) as dicts, most orders first"""
+    rows = [{name: value, count_key: count, 'revenue': revenue} for value, (count, revenue) in groups.items()]
+    return sorted(rows, key=lambda row: -row[count_key])
+
+
+def period_breakdowns(period_rollup):
+    """
+    ``daily_trends`` (by date), ``status_breakdown`` and ``payment_methods``
+    (top TOP_PAYMENT_METHODS, most orders first) of ``period_rollup``, in one
+    query.
+    """
+    days, statuses, methods = {}, {}, {}
+    rows = period_rollup.values('date', 'status', 'payment_method').annotate(
+        orders=Sum('order_count'),
+        revenue=Sum('revenue'),
+    ).order_by()
+    for row in rows:
+        revenue = row['revenue'] or 0
+        for groups, key in ((days, row['date']), (statuses, row['status']), (methods, row['payment_method'])):
+            totals = groups.setdefault(key, [0, 0])
+            totals[0] += row['orders']
+            totals[1] += revenue
+    methods.pop('', None)
+
+    return {
+        'daily_trends': [
+            {'date': day, 'orders': orders, 'revenue': revenue}
+            for day, (orders, revenue) in sorted(days.items())
+        ],
+        'status_breakdown': _totals(statuses, 'status', 'count'),
+        'payment_methods': _totals(methods, 'payment_method', 'count')[:TOP_PAYMENT_METHODS],
+    }
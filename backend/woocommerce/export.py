@@ -0,0 +1,166 @@
+"""
+Streaming CSV and Parquet exports of WooCommerce orders and channel reports.
+
+Orders are read with ``.iterator(chunk_size=WOOCOMMERCE_EXPORT_CHUNK_SIZE)``,
+which on PostgreSQL uses a server-side cursor, and encoded as they arrive,
+so memory stays flat however many orders a client has and the download
+starts with the first chunk.  Channel types are the ones stored on the
+order at sync time, so no raw payload is loaded; orders not classified yet
+export as UNCLASSIFIED_CHANNEL rather than passing for direct traffic.
+
+Parquet needs the optional ``pyarrow`` package; each chunk is written as one
+row group and flushed to the response before the next is read.
+"""
+import csv
+
+from django.conf import settings
+
+# Header -> order field, in export column order
+ORDER_EXPORT_COLUMNS = [
+    ('order_id', 'order_id'),
+    ('order_date', 'order_date'),
+    ('order_total', 'order_total'),
+    ('attribution_utm_source', 'attribution_utm_source'),
+    ('attribution_source_type', 'attribution_source_type'),
+    ('channel_type', 'channel_type'),
+    ('billing_email', 'billing_email'),
+    ('status', 'status'),
+    ('currency', 'currency'),
+    ('client_name', 'client_name'),
+]
+
+# CSV header of the orders export, as the channel report has always labelled it
+ORDER_CSV_HEADER = [
+    'Order ID', 'Order Date', 'Order Total',
+    'UTM Source (meta:_wc_order_attribution_utm_source)',
+    'Source Type (meta:_wc_order_attribution_source_type)',
+    'Classified Channel Type', 'Customer Email',
+    'Order Status', 'Currency', 'Client Name',
+]
+
+UNCLASSIFIED_CHANNEL = 'Unclassified'
+
+CHANNEL_EXPORT_COLUMNS = ['channel_type', 'source', 'medium', 'sessions', 'orders', 'order_total', 'cvr', 'aov']
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+def order_export_rows(orders, chunk_size=None):
+    """Yield one export row (a list) per order, newest first"""
+    chunk_size = chunk_size or settings.WOOCOMMERCE_EXPORT_CHUNK_SIZE
+    fields = [field for _, field in ORDER_EXPORT_COLUMNS]
+    date_index = fields.index('order_date')
+    total_index = fields.index('order_total')
+    channel_index = fields.index('channel_type')
+
+    rows = orders.order_by('-order_date', '-pk').values_list(*fields).iterator(chunk_size=chunk_size)
+    for values in rows:
+        row = ['' if value is None else value for value in values]
+        order_date = values[date_index]
+        row[date_index] = order_date.strftime('%Y-%m-%d %H:%M:%S') if order_date else ''
+        row[total_index] = float(values[total_index] or 0)
+        row[channel_index] = values[channel_index] or UNCLASSIFIED_CHANNEL
+        yield row
+
+
+def channel_export_rows(channel_data):
+    """Rows for the output of ``attribution.channel_performance``, total last"""
+    for channel in channel_data.get('channels', []) + [channel_data.get('total', {})]:
+        if not channel:
+            continue
+        yield [
+            channel.get('channelType', ''),
+            channel.get('source', ''),
+            channel.get('medium', ''),
+            channel.get('sessions', 0),
+            channel.get('orders', 0),
+            float(channel.get('orderTotal') or 0),
+            round(float(channel.get('cvr') or 0), 2),
+            round(float(channel.get('aov') or 0), 2),
+        ]
+
+
+class _Echo:
+    """File-like object whose write() hands the written value back"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """Yield CSV-encoded lines: the header, then one per row"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+class _ChunkSink:
+    """Write-only file that collects bytes until drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.chunks = b''.join(self.chunks), []
+        return data
+
+
+def parquet_available():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def stream_parquet(header, rows, chunk_size=None):
+    """Yield a Parquet file in pieces, one row group per ``chunk_size`` rows"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    chunk_size = chunk_size or settings.WOOCOMMERCE_EXPORT_CHUNK_SIZE
+    sink = _ChunkSink()
+    writer = None
+
+    def write(batch):
+        nonlocal writer
+        table = pa.Table.from_pylist([dict(zip(header, row)) for row in batch])
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema)
+        writer.write_table(table.cast(writer.schema))
+        return sink.drain()
+
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= chunk_size:
+            yield write(batch)
+            batch = []
+    if batch:
+        yield write(batch)
+    if writer is None:
+        # No rows: still a valid file with the header's columns
+        writer = pq.ParquetWriter(sink, pa.schema([(name, pa.string()) for name in header]))
+    writer.close()
+    yield sink.drain()
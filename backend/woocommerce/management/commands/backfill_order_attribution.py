@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from woocommerce.attribution import backfill_order_attribution
+from woocommerce.models import WooCommerceOrder
+
+
+class Command(BaseCommand):
+    help = "Resolve stored traffic and extracted source/medium and channel_type for orders synced before they existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--client-name',
+            type=str,
+            help='Only backfill this client (exact account name)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Orders updated per batch (default: 1000)'
+        )
+
+    def handle(self, *args, **options):
+        orders = WooCommerceOrder.objects.all()
+        if options.get('client_name'):
+            orders = orders.filter(client_name=options['client_name'])
+
+        updated = backfill_order_attribution(orders, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Resolved attribution for {updated} orders')
+        )
+        self.stdout.write('Run rebuild_woocommerce_rollup to regroup the daily rollup by the new source/medium.')
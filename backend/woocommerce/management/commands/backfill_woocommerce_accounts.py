@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from woocommerce.account_backfill import (
+    ACCOUNT_BACKFILL_BATCH_SIZE,
+    backfill_job_accounts,
+    backfill_order_accounts,
+)
+
+
+class Command(BaseCommand):
+    help = "Link WooCommerce orders and jobs synced before the account foreign key existed to their Account"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--client-name',
+            type=str,
+            help='Only backfill orders of this client (exact client name)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=ACCOUNT_BACKFILL_BATCH_SIZE,
+            help=f'Rows updated per statement (default: {ACCOUNT_BACKFILL_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to sleep between batches (default: 0.1)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pause = options['pause']
+
+        jobs = backfill_job_accounts(batch_size=batch_size, pause=pause)
+        orders, unresolved = backfill_order_accounts(
+            client_name=options.get('client_name'), batch_size=batch_size, pause=pause
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Linked {jobs} jobs and {orders} orders to their account'))
+        for name in unresolved:
+            self.stdout.write(self.style.WARNING(f'No single account matches client name "{name}"; orders left unlinked'))
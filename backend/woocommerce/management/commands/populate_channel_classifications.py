@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from woocommerce.attribution import reclassify_orders
 from woocommerce.models import ChannelClassification
 
 
@@ -162,6 +163,7 @@ class Command(BaseCommand):
                 f'Total: {ChannelClassification.objects.count()}'
             )
         )
+        self.stdout.write(f'Orders reclassified: {reclassify_orders()}')
 
 
 
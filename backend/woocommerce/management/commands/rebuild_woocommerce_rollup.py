@@ -0,0 +1,37 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from woocommerce.rollups import rebuild_daily_rollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild the WooCommerce daily order rollup from woocommerce_orders"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--client-name',
+            type=str,
+            help='Only rebuild this client (exact account name)'
+        )
+        parser.add_argument(
+            '--since',
+            type=str,
+            help='Only rebuild days on or after this date (YYYY-MM-DD)'
+        )
+
+    def handle(self, *args, **options):
+        since = options.get('since')
+        if since:
+            try:
+                since = date.fromisoformat(since)
+            except ValueError:
+                raise CommandError(f'Invalid --since date: {since}')
+
+        results = rebuild_daily_rollup(client_name=options.get('client_name'), since=since)
+
+        for client_name, rows in results.items():
+            self.stdout.write(f'{client_name}: {rows} rollup rows')
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt daily rollup for {len(results)} clients')
+        )
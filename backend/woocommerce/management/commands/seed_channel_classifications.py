@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 
+from woocommerce.attribution import reclassify_orders
 from woocommerce.models import ChannelClassification
 
 
@@ -74,5 +75,6 @@ class Command(BaseCommand):
                 f"Channel classification rules seeded. created={created_count}, updated={updated_count}"
             )
         )
+        self.stdout.write(f"Orders reclassified: {reclassify_orders()}")
 
 
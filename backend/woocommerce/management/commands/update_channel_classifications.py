@@ -1,4 +1,5 @@
 from django.core.management.base import BaseCommand
+from woocommerce.attribution import reclassify_orders
 from woocommerce.models import ChannelClassification
 
 
@@ -72,3 +73,4 @@ class Command(BaseCommand):
         self.stdout.write(f"   Total classification rules: {total_rules}")
         self.stdout.write(f"   Paid Search rules: {paid_search_rules}")
         self.stdout.write(f"   Referral rules: {referral_rules}")
+        self.stdout.write(f"   Orders reclassified: {reclassify_orders()}")
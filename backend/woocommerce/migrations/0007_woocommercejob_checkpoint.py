@@ -0,0 +1,39 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_add_company_currency_code'),
+        ('woocommerce', '0006_fix_channel_types'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommercejob',
+            name='account_configuration',
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name='woocommerce_jobs',
+                to='users.accountconfiguration',
+            ),
+        ),
+        migrations.AddField(
+            model_name='woocommercejob',
+            name='range_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='woocommercejob',
+            name='range_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='woocommercejob',
+            name='last_page_committed',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_add_company_currency_code'),
+        ('woocommerce', '0007_woocommercejob_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='woocommercejob',
+            name='job_type',
+            field=models.CharField(
+                choices=[
+                    ('daily_sync', 'Daily Sync'),
+                    ('historical_backfill', 'Historical Backfill'),
+                    ('manual_sync', 'Manual Sync'),
+                    ('incremental_sync', 'Incremental Sync'),
+                ],
+                max_length=20,
+            ),
+        ),
+        migrations.CreateModel(
+            name='WooCommerceSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders_modified_after', models.DateTimeField(blank=True, null=True)),
+                ('last_successful_sync_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('account_configuration', models.OneToOneField(
+                    on_delete=django.db.models.deletion.CASCADE,
+                    related_name='woocommerce_sync_state',
+                    to='users.accountconfiguration',
+                )),
+            ],
+            options={
+                'db_table': 'woocommerce_sync_state',
+            },
+        ),
+    ]
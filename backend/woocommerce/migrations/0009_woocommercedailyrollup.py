@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('woocommerce', '0008_woocommercesyncstate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WooCommerceDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_name', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('status', models.CharField(max_length=50)),
+                ('payment_method', models.CharField(blank=True, default='', max_length=100)),
+                ('source', models.CharField(blank=True, default='', max_length=255)),
+                ('medium', models.CharField(blank=True, default='', max_length=50)),
+                ('order_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customers', models.IntegerField(default=0)),
+                ('new_customers', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'woocommerce_daily_rollup',
+                'unique_together': {('client_name', 'date', 'status', 'payment_method', 'source', 'medium')},
+            },
+        ),
+    ]
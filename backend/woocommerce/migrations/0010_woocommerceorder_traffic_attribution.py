@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('woocommerce', '0009_woocommercedailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommerceorder',
+            name='traffic_source',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='woocommerceorder',
+            name='traffic_medium',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='woocommerceorder',
+            name='channel_type',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.AlterField(
+            model_name='woocommercedailyrollup',
+            name='medium',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='woocommerceorder',
+            index=models.Index(fields=['traffic_source', 'traffic_medium'], name='woocommerce_traffic_a71882_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='woocommerceorder',
+            index=models.Index(fields=['client_name', 'channel_type'], name='woocommerce_client__b06576_idx'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('woocommerce', '0010_woocommerceorder_traffic_attribution'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='woocommerceorder',
+            index=models.Index(fields=['client_name', 'billing_email', 'date_created'], name='woocommerce_client__85d28d_idx'),
+        ),
+    ]
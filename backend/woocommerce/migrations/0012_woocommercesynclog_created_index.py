@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('woocommerce', '0011_woocommerceorder_customer_history_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='woocommercesynclog',
+            index=models.Index(fields=['created_at'], name='woo_sync_logs_created_idx'),
+        ),
+    ]
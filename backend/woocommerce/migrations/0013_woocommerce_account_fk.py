@@ -0,0 +1,65 @@
+"""
+Link WooCommerce orders and jobs to their Account.
+
+The columns are added empty (nullable, so no table rewrite); fill them with
+``manage.py backfill_woocommerce_accounts``.  On PostgreSQL the
+(account, order_date) index is built CONCURRENTLY so orders stay writable
+while it builds, which is why this migration is not atomic.
+"""
+import django.db.models.deletion
+from django.db import migrations, models
+
+INDEX_NAME = 'woo_orders_account_date_idx'
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {INDEX_NAME} '
+            'ON woocommerce_orders (account_id, order_date)'
+        )
+    else:
+        model = apps.get_model('woocommerce', 'WooCommerceOrder')
+        schema_editor.add_index(model, models.Index(fields=['account', 'order_date'], name=INDEX_NAME))
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {INDEX_NAME}')
+    else:
+        model = apps.get_model('woocommerce', 'WooCommerceOrder')
+        schema_editor.remove_index(model, models.Index(fields=['account', 'order_date'], name=INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('users', '0009_add_company_currency_code'),
+        ('woocommerce', '0012_woocommercesynclog_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommercejob',
+            name='account',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='woocommerce_jobs', to='users.account'),
+        ),
+        migrations.AddField(
+            model_name='woocommerceorder',
+            name='account',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='woocommerce_orders', to='users.account'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='woocommerceorder',
+                    index=models.Index(fields=['account', 'order_date'], name=INDEX_NAME),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(create_index, drop_index),
+            ],
+        ),
+    ]
@@ -0,0 +1,26 @@
+"""
+Resolve traffic_source/traffic_medium/channel_type for orders synced before
+0010 added them, so reports and the daily rollup don't see them as
+unclassified.  Runs in batches outside one big transaction; orders already
+resolved are skipped, so an interrupted run can simply be repeated.
+"""
+from django.db import migrations
+
+
+def backfill_attribution(apps, schema_editor):
+    from woocommerce.attribution import backfill_order_attribution
+
+    backfill_order_attribution(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('woocommerce', '0013_woocommerce_account_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_attribution, migrations.RunPython.noop),
+    ]
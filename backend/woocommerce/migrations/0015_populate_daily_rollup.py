@@ -0,0 +1,26 @@
+"""
+Build the daily rollup from the orders already stored, so the analytics
+endpoints that read it have the full history as soon as this is deployed.
+Runs after 0014 because rows group on the resolved source/medium.  Each
+client is rebuilt in month-sized chunks, each in its own transaction.
+"""
+from django.db import migrations
+
+
+def populate_rollup(apps, schema_editor):
+    from woocommerce.rollups import rebuild_daily_rollup
+
+    rebuild_daily_rollup(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('woocommerce', '0014_backfill_order_attribution'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+"""
+Link orders and jobs stored before 0013 to their Account, so account-scoped
+order queries see them as soon as this is deployed.  Client names that match
+no single account are logged and left unlinked; ``manage.py
+backfill_woocommerce_accounts`` links them once the names are sorted out.
+"""
+import logging
+
+from django.db import migrations
+
+logger = logging.getLogger(__name__)
+
+
+def backfill_accounts(apps, schema_editor):
+    from woocommerce.account_backfill import backfill_job_accounts, backfill_order_accounts
+
+    backfill_job_accounts(apps=apps)
+    _, unresolved = backfill_order_accounts(apps=apps)
+    for name in unresolved:
+        logger.warning('No single account matches client name "%s"; orders left unlinked', name)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('woocommerce', '0015_populate_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_accounts, migrations.RunPython.noop),
+    ]
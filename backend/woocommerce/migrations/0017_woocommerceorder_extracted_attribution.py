@@ -0,0 +1,21 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('woocommerce', '0016_backfill_order_accounts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommerceorder',
+            name='extracted_source',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='woocommerceorder',
+            name='extracted_medium',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
@@ -0,0 +1,26 @@
+"""
+Fill in extracted_source/extracted_medium for orders resolved before 0017
+added them, so the channel report's unclassified sources come from stored
+columns.  Runs in batches outside one big transaction; orders already
+filled in are skipped, so an interrupted run can simply be repeated.
+"""
+from django.db import migrations
+
+
+def backfill_extracted_attribution(apps, schema_editor):
+    from woocommerce.attribution import backfill_order_attribution
+
+    backfill_order_attribution(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('woocommerce', '0017_woocommerceorder_extracted_attribution'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_extracted_attribution, migrations.RunPython.noop),
+    ]
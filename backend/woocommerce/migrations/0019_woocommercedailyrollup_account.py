@@ -0,0 +1,26 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_add_company_currency_code'),
+        ('woocommerce', '0018_backfill_extracted_attribution'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='woocommercedailyrollup',
+            name='account',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='woocommerce_daily_rollups', to='users.account'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='woocommercedailyrollup',
+            unique_together={('client_name', 'account', 'date', 'status', 'payment_method', 'source', 'medium')},
+        ),
+        migrations.AddIndex(
+            model_name='woocommercedailyrollup',
+            index=models.Index(fields=['account', 'date'], name='woo_rollup_account_date_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+"""
+Rebuild the daily rollup so its rows carry the account 0019 added, and the
+dashboards can scope it by account like the orders.  Each client's days are
+recomputed in month-sized chunks outside one big transaction.
+"""
+from django.db import migrations
+
+
+def rebuild_rollup(apps, schema_editor):
+    from woocommerce.rollups import rebuild_daily_rollup
+
+    rebuild_daily_rollup(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('woocommerce', '0019_woocommercedailyrollup_account'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_rollup, migrations.RunPython.noop),
+    ]
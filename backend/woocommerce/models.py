@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 
 User = get_user_model()
 from django.utils import timezone
+from users.models import Account, AccountConfiguration
 import json
 
 
@@ -20,9 +21,13 @@ class WooCommerceJob(models.Model):
         ('daily_sync', 'Daily Sync'),
         ('historical_backfill', 'Historical Backfill'),
         ('manual_sync', 'Manual Sync'),
+        ('incremental_sync', 'Incremental Sync'),
     ]
     
-    client_name = models.CharField(max_length=255, default='Unknown')  # Store account name instead of foreign key
+    client_name = models.CharField(max_length=255, default='Unknown')  # Account name, kept for display and logs
+    account = models.ForeignKey(
+        Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='woocommerce_jobs'
+    )
     job_type = models.CharField(max_length=20, choices=JOB_TYPE_CHOICES)
     status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='pending')
     scheduled_at = models.DateTimeField()
@@ -32,6 +37,15 @@ class WooCommerceJob(models.Model):
     orders_processed = models.IntegerField(default=0)
     orders_created = models.IntegerField(default=0)
     orders_updated = models.IntegerField(default=0)
+    
+    # Resume checkpoint: the configuration, date window and last page whose orders were committed
+    account_configuration = models.ForeignKey(
+        AccountConfiguration, on_delete=models.SET_NULL, null=True, blank=True, related_name='woocommerce_jobs'
+    )
+    range_start = models.DateTimeField(null=True, blank=True)
+    range_end = models.DateTimeField(null=True, blank=True)
+    last_page_committed = models.IntegerField(default=0)
+    
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -44,9 +58,36 @@ class WooCommerceJob(models.Model):
         return f"{self.client_name} - {self.get_job_type_display()} ({self.status})"
 
 
+# Bulky columns order querysets leave out unless asked for with with_payload()
+ORDER_PAYLOAD_FIELDS = ('raw_data', 'billing_address', 'shipping_address', 'customer_user_agent')
+
+
+class WooCommerceOrderQuerySet(models.QuerySet):
+    def with_payload(self, *fields):
+        """
+        Load the deferred payload columns: all of ORDER_PAYLOAD_FIELDS, or only
+        ``fields``. Clears any other defer() on the queryset.
+        """
+        still_deferred = [field for field in ORDER_PAYLOAD_FIELDS if fields and field not in fields]
+        queryset = self.defer(None)
+        return queryset.defer(*still_deferred) if still_deferred else queryset
+
+
+class WooCommerceOrderManager(models.Manager.from_queryset(WooCommerceOrderQuerySet)):
+    """Order manager that defers ORDER_PAYLOAD_FIELDS by default"""
+
+    def get_queryset(self):
+        return super().get_queryset().defer(*ORDER_PAYLOAD_FIELDS)
+
+
 class WooCommerceOrder(models.Model):
     """WooCommerce order data"""
-    client_name = models.CharField(max_length=255, default='Unknown')  # Store account name instead of foreign key
+    client_name = models.CharField(max_length=255, default='Unknown')  # Account name, kept for display and the upsert key
+    # Tenant the order belongs to; indexed through (account, order_date) below
+    account = models.ForeignKey(
+        Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='woocommerce_orders',
+        db_index=False
+    )
     order_id = models.CharField(max_length=50)
     order_number = models.CharField(max_length=50)
     order_date = models.DateTimeField(null=True, blank=True)  # order_date from export
@@ -136,10 +177,20 @@ class WooCommerceOrder(models.Model):
     attribution_user_agent = models.TextField(null=True, blank=True)
     attribution_utm_source = models.CharField(max_length=255, null=True, blank=True)
     
+    # Normalised attribution resolved at ingest (channel_type is empty until computed)
+    traffic_source = models.CharField(max_length=255, blank=True, default='')
+    traffic_medium = models.CharField(max_length=255, blank=True, default='')
+    channel_type = models.CharField(max_length=50, blank=True, default='')
+    # Source/medium as extracted, before raw_data UTM overrides (unclassified-source report)
+    extracted_source = models.CharField(max_length=255, blank=True, default='')
+    extracted_medium = models.CharField(max_length=255, blank=True, default='')
+    
     raw_data = models.JSONField(default=dict)  # Store complete WooCommerce response
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = WooCommerceOrderManager()
+    
     class Meta:
         db_table = 'woocommerce_orders'
         unique_together = ['client_name', 'order_id']
@@ -149,6 +200,10 @@ class WooCommerceOrder(models.Model):
             models.Index(fields=['billing_email']),
             models.Index(fields=['attribution_utm_source']),
             models.Index(fields=['order_date']),
+            models.Index(fields=['traffic_source', 'traffic_medium']),
+            models.Index(fields=['client_name', 'channel_type']),
+            models.Index(fields=['client_name', 'billing_email', 'date_created']),
+            models.Index(fields=['account', 'order_date'], name='woo_orders_account_date_idx'),
         ]
     
     def __str__(self):
@@ -177,6 +232,53 @@ class WooCommerceOrderItem(models.Model):
         return f"{self.order.order_number} - {self.product_name}"
 
 
+class WooCommerceDailyRollup(models.Model):
+    """Daily order aggregates per client, status, payment method and source/medium"""
+    client_name = models.CharField(max_length=255)
+    # Account of the row's orders; NULL for orders not linked to an account yet
+    account = models.ForeignKey(
+        Account, on_delete=models.SET_NULL, null=True, blank=True, related_name='woocommerce_daily_rollups',
+        db_index=False
+    )
+    date = models.DateField()
+    status = models.CharField(max_length=50)
+    payment_method = models.CharField(max_length=100, blank=True, default='')
+    source = models.CharField(max_length=255, blank=True, default='')
+    medium = models.CharField(max_length=255, blank=True, default='')
+    order_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    customers = models.IntegerField(default=0)  # Distinct billing emails within the row
+    new_customers = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'woocommerce_daily_rollup'
+        unique_together = ['client_name', 'account', 'date', 'status', 'payment_method', 'source', 'medium']
+        indexes = [
+            models.Index(fields=['account', 'date'], name='woo_rollup_account_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.client_name} - {self.date} ({self.status}): {self.order_count} orders"
+
+
+class WooCommerceSyncState(models.Model):
+    """Incremental sync state for a WooCommerce configuration"""
+    account_configuration = models.OneToOneField(
+        AccountConfiguration, on_delete=models.CASCADE, related_name='woocommerce_sync_state'
+    )
+    # High-water mark: newest order date_modified (GMT) seen by a successful sync
+    orders_modified_after = models.DateTimeField(null=True, blank=True)
+    last_successful_sync_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'woocommerce_sync_state'
+    
+    def __str__(self):
+        return f"{self.account_configuration} - modified after {self.orders_modified_after}"
+
+
 class WooCommerceSyncLog(models.Model):
     """Log of sync operations and errors"""
     LOG_LEVEL_CHOICES = [
@@ -196,6 +298,9 @@ class WooCommerceSyncLog(models.Model):
     class Meta:
         db_table = 'woocommerce_sync_logs'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='woo_sync_logs_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.client_name if self.client_name else 'System'} - {self.level}: {self.message[:50]}" 
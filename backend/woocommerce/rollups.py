@@ -0,0 +1,146 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import WooCommerceOrder
+
+ROLLUP_REBUILD_CHUNK_DAYS = 31
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def order_days(client_name, order_ids):
+    """Days (of date_created) that the given stored orders fall on"""
+    if not order_ids:
+        return set()
+    return set(
+        WooCommerceOrder.objects.filter(client_name=client_name, order_id__in=order_ids)
+        .exclude(date_created__isnull=True)
+        .annotate(day=TruncDate('date_created'))
+        .values_list('day', flat=True)
+        .distinct()
+    )
+
+
+def order_rollup_day(order):
+    """(client_name, day) of the rollup rows ``order`` counts towards, or None"""
+    if order.date_created is None:
+        return None
+    return order.client_name, timezone.localtime(order.date_created).date()
+
+
+def refresh_order_rollups(*keys):
+    """Refresh the rollup for ``(client_name, day)`` keys from ``order_rollup_day``"""
+    days_by_client = defaultdict(set)
+    for key in keys:
+        if key:
+            days_by_client[key[0]].add(key[1])
+    return sum(refresh_daily_rollup(client_name, days) for client_name, days in days_by_client.items())
+
+
+def refresh_daily_rollup(client_name, days, apps=global_apps):
+    """
+    Recompute one client's rollup rows for the given days from woocommerce_orders
+
+    Rows for a day are replaced wholesale, so orders that changed status or
+    payment method move between rows correctly. Returns the number of rows written.
+    ``apps`` is the app registry to take the models from (a migration passes
+    its historical one).
+    """
+    days = {day for day in days if day}
+    if not days:
+        return 0
+
+    rollup_model = apps.get_model('woocommerce', 'WooCommerceDailyRollup')
+    # Migrations before 0019 see a rollup without the account column
+    group_fields = ['day', 'status', 'traffic_source', 'traffic_medium']
+    if any(field.name == 'account' for field in rollup_model._meta.get_fields()):
+        group_fields.append('account')
+    aggregates = (
+        apps.get_model('woocommerce', 'WooCommerceOrder')._default_manager
+        .filter(
+            client_name=client_name,
+            date_created__gte=_day_start(min(days)),
+            date_created__lt=_day_start(max(days) + timedelta(days=1)),
+        )
+        .annotate(day=TruncDate('date_created'))
+        .filter(day__in=days)
+        .values(*group_fields, method=Coalesce('payment_method', Value('')))
+        .annotate(
+            order_count=Count('id'),
+            revenue=Sum('total'),
+            customers=Count('billing_email', distinct=True),
+            new_customers=Count('id', filter=Q(is_new_customer=True)),
+        )
+        .order_by()
+    )
+    rows = [
+        rollup_model(
+            client_name=client_name,
+            **({'account_id': row['account']} if 'account' in row else {}),
+            date=row['day'],
+            status=row['status'],
+            payment_method=row['method'],
+            source=row['traffic_source'],
+            medium=row['traffic_medium'],
+            order_count=row['order_count'],
+            revenue=row['revenue'] or 0,
+            customers=row['customers'],
+            new_customers=row['new_customers'],
+        )
+        for row in aggregates
+    ]
+
+    with transaction.atomic():
+        rollup_model._default_manager.filter(client_name=client_name, date__in=days).delete()
+        rollup_model._default_manager.bulk_create(rows)
+    return len(rows)
+
+
+def rebuild_daily_rollup(client_name=None, since=None, apps=global_apps):
+    """
+    Rebuild the rollup from scratch, optionally for one client and/or from a date
+
+    Works through each client's history in month-sized chunks. Returns a dict of
+    rows written per client.
+    """
+    rollup_model = apps.get_model('woocommerce', 'WooCommerceDailyRollup')
+    orders = apps.get_model('woocommerce', 'WooCommerceOrder')._default_manager.exclude(date_created__isnull=True)
+    if client_name:
+        orders = orders.filter(client_name=client_name)
+    if since:
+        orders = orders.filter(date_created__gte=_day_start(since))
+
+    results = {}
+    client_ranges = orders.values('client_name').annotate(
+        first=Min('date_created'),
+        last=Max('date_created'),
+    ).order_by('client_name')
+    for client in client_ranges:
+        name = client['client_name']
+        first = timezone.localtime(client['first']).date()
+        last = timezone.localtime(client['last']).date()
+
+        # Drop rows outside the orders' range (e.g. orders since deleted)
+        stale = rollup_model._default_manager.filter(client_name=name).exclude(date__range=(first, last))
+        if since:
+            stale = stale.filter(date__gte=since)
+        stale.delete()
+
+        written = 0
+        day = first
+        while day <= last:
+            chunk_end = min(day + timedelta(days=ROLLUP_REBUILD_CHUNK_DAYS - 1), last)
+            chunk = {day + timedelta(days=i) for i in range((chunk_end - day).days + 1)}
+            written += refresh_daily_rollup(name, chunk, apps=apps)
+            day = chunk_end + timedelta(days=1)
+        results[name] = written
+    return results
+
@@ -24,7 +24,7 @@ class WooCommerceOrderSerializer(serializers.ModelSerializer):
     class Meta:
         model = WooCommerceOrder
         fields = [
-            'id', 'client_name', 'order_id', 'order_number', 'order_date', 'paid_date',
+            'id', 'client_name', 'account', 'order_id', 'order_number', 'order_date', 'paid_date',
             'status', 'shipping_total', 'shipping_tax_total', 'fee_total', 'fee_tax_total',
             'tax_total', 'cart_discount', 'order_discount', 'discount_total', 'order_total',
             'order_subtotal', 'order_key', 'order_currency', 'payment_method', 'payment_method_title',
@@ -43,6 +43,7 @@ class WooCommerceOrderSerializer(serializers.ModelSerializer):
             'shipping_address', 'date_created', 'date_modified', 'date_completed',
             'items', 'created_at', 'updated_at'
         ]
+        read_only_fields = ['account']
 
 
 class WooCommerceJobSerializer(serializers.ModelSerializer):
@@ -52,10 +53,11 @@ class WooCommerceJobSerializer(serializers.ModelSerializer):
     class Meta:
         model = WooCommerceJob
         fields = [
-            'id', 'client_name', 'job_type', 'job_type_display',
+            'id', 'client_name', 'account', 'job_type', 'job_type_display',
             'status', 'status_display', 'scheduled_at', 'started_at',
             'completed_at', 'error_message', 'orders_processed',
-            'orders_created', 'orders_updated', 'created_by',
+            'orders_created', 'orders_updated', 'range_start',
+            'range_end', 'last_page_committed', 'created_by',
             'created_at', 'updated_at'
         ]
 
@@ -0,0 +1,34 @@
+"""
+Cache invalidation for memoised client currencies (see woocommerce.currency).
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from users.models import Account, AccountConfiguration, Company
+
+from .currency import invalidate_currency
+
+
+@receiver([post_save, post_delete], sender=Company)
+def company_currency_changed(sender, instance, **kwargs):
+    invalidate_currency(*instance.accounts.values_list('name', flat=True))
+
+
+@receiver(pre_save, sender=Account)
+def remember_account_name(sender, instance, **kwargs):
+    """Keep the stored name, so a rename also forgets the currency cached under it."""
+    instance._stored_name = (
+        Account.objects.filter(pk=instance.pk).values_list('name', flat=True).first() if instance.pk else None
+    )
+
+
+@receiver([post_save, post_delete], sender=Account)
+def account_currency_changed(sender, instance, **kwargs):
+    invalidate_currency(instance.name, getattr(instance, '_stored_name', None))
+
+
+@receiver([post_save, post_delete], sender=AccountConfiguration)
+def configuration_currency_changed(sender, instance, **kwargs):
+    account = Account.objects.filter(pk=instance.account_id).first()
+    if account:
+        invalidate_currency(account.name)
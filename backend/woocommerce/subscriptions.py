@@ -0,0 +1,105 @@
+"""
+Subscription (repeat purchase) detection for WooCommerce customers.
+
+A subscriber is a customer (billing email) who bought the same product at least
+``min_purchases`` times. Line items are streamed from one query as
+(email, product_id, product_name, date, total) tuples ordered by customer and
+product, so each customer/product's history is a consecutive run and is folded
+in a single pass; only the resulting subscribers are held in memory.
+"""
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import F
+from django.db.models.functions import Coalesce, Lower
+
+from .models import WooCommerceOrderItem
+
+PURCHASE_ROWS_CHUNK_SIZE = 5000
+
+
+def purchase_rows(orders):
+    """
+    (email, product_id, product_name, date, total) for every line item of
+    ``orders`` with a billing email, ordered by email, product and date
+
+    Undated items sort last within their product.
+    """
+    return (
+        WooCommerceOrderItem.objects
+        .filter(order__in=orders.values('pk'))
+        .exclude(order__billing_email__isnull=True)
+        .exclude(order__billing_email='')
+        .annotate(
+            email=Lower('order__billing_email'),
+            date=Coalesce('order__date_created', 'order__order_date'),
+        )
+        .order_by('email', 'product_id', 'product_name', F('date').asc(nulls_last=True))
+        .values_list('email', 'product_id', 'product_name', 'date', 'total_price')
+        .iterator(chunk_size=PURCHASE_ROWS_CHUNK_SIZE)
+    )
+
+
+def detect_subscribers(rows, start_date, end_date, min_purchases=2, reorder_window=35,
+                       churn_multiplier=1.5, at_risk_days=7):
+    """
+    Yield a subscriber dict per (email, product) run in ``rows`` with at least
+    ``min_purchases`` purchases
+
+    ``rows`` must be ordered as ``purchase_rows`` returns them. Status is
+    'churned' once the time since the last order exceeds the average reorder
+    interval times ``churn_multiplier``, 'at_risk' within ``at_risk_days`` of
+    the interval, and 'active' otherwise. ``is_new_subscriber`` is set when the
+    ``min_purchases``-th purchase falls on or after ``start_date``.
+    """
+    for (email, product_id, product_name), purchases in groupby(rows, key=itemgetter(0, 1, 2)):
+        total_orders = 0
+        total_revenue = 0
+        first_order_date = last_order_date = None
+        subscription_start_date = None
+        interval_total = interval_count = 0
+
+        for _, _, _, date, total in purchases:
+            total_orders += 1
+            total_revenue += float(total)
+            if total_orders == 1:
+                first_order_date = date
+            elif date and last_order_date:
+                interval = (date - last_order_date).days
+                if interval > 0:
+                    interval_total += interval
+                    interval_count += 1
+            if total_orders == min_purchases:
+                subscription_start_date = date
+            last_order_date = date
+
+        if total_orders < min_purchases:
+            continue
+
+        avg_interval = interval_total / interval_count if interval_count else reorder_window
+        if last_order_date:
+            days_since_last = (end_date - last_order_date).days
+            expected_interval = avg_interval if avg_interval > 0 else reorder_window
+            if days_since_last > expected_interval * churn_multiplier:
+                status = 'churned'
+            elif days_since_last > expected_interval - at_risk_days:
+                status = 'at_risk'
+            else:
+                status = 'active'
+        else:
+            status = 'unknown'
+            days_since_last = None
+
+        yield {
+            'email': email,
+            'product_id': product_id,
+            'product_name': product_name,
+            'total_orders': total_orders,
+            'total_revenue': total_revenue,
+            'first_order_date': first_order_date,
+            'last_order_date': last_order_date,
+            'avg_interval_days': round(avg_interval, 1),
+            'days_since_last_order': days_since_last,
+            'status': status,
+            'is_new_subscriber': bool(subscription_start_date and subscription_start_date >= start_date),
+        }
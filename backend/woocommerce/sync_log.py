@@ -0,0 +1,101 @@
+"""
+Buffered writer for WooCommerceSyncLog.
+
+A sync logs several lines per API page.  ``SyncLogBuffer`` collects them in
+memory and writes them with one ``bulk_create`` once the buffer holds
+WOOCOMMERCE_SYNC_LOG_BUFFER_SIZE records or the oldest has waited
+WOOCOMMERCE_SYNC_LOG_FLUSH_SECONDS, and again when the job ends.
+
+ERROR records are never held back: logging one flushes the buffer with it
+straight away, so a crash after an error cannot lose it.  Should the bulk
+insert fail, ERROR records are retried one at a time; the rest only reach the
+worker log.  ``created_at`` is stamped when a record is flushed; ids keep the
+order records were logged in.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import WooCommerceSyncLog
+
+logger = logging.getLogger(__name__)
+
+
+class SyncLogBuffer:
+    """
+    Callable ``log(level, message, details=None)`` that buffers
+    WooCommerceSyncLog rows for one client and job.
+
+    Use as a context manager, or call ``flush()`` when the job ends.
+    """
+
+    def __init__(self, client_name=None, job=None, max_records=None, max_age=None):
+        self.client_name = client_name
+        self.job = job
+        self.max_records = max_records or settings.WOOCOMMERCE_SYNC_LOG_BUFFER_SIZE
+        self.max_age = settings.WOOCOMMERCE_SYNC_LOG_FLUSH_SECONDS if max_age is None else max_age
+        self.records = []
+        self.oldest = None
+
+    def __call__(self, level, message, details=None):
+        self.records.append(WooCommerceSyncLog(
+            client_name=self.client_name,
+            job=self.job,
+            level=level,
+            message=message,
+            details=details or {},
+        ))
+        if self.oldest is None:
+            self.oldest = time.monotonic()
+
+        if (
+            level == 'ERROR'
+            or len(self.records) >= self.max_records
+            or time.monotonic() - self.oldest >= self.max_age
+        ):
+            self.flush()
+
+    def flush(self):
+        """Write the buffered records; returns how many were written."""
+        records, self.records, self.oldest = self.records, [], None
+        if not records:
+            return 0
+        try:
+            with transaction.atomic():
+                WooCommerceSyncLog.objects.bulk_create(records)
+        except Exception as e:
+            # A log write must not fail the sync; keep the lines in the worker log
+            logger.error('Failed to write %d WooCommerce sync log records: %s', len(records), e)
+            for record in records:
+                logger.log(logging.getLevelName(record.level), '%s: %s', record.client_name, record.message)
+            return self._write_errors(records)
+        return len(records)
+
+    def _write_errors(self, records):
+        """Save the ERROR records one by one, so one bad row can't lose them all."""
+        written = 0
+        for record in records:
+            if record.level != 'ERROR':
+                continue
+            try:
+                with transaction.atomic():
+                    WooCommerceSyncLog.objects.create(
+                        client_name=record.client_name,
+                        job=record.job,
+                        level=record.level,
+                        message=record.message,
+                        details=record.details,
+                    )
+                written += 1
+            except Exception as e:
+                logger.error('Failed to write WooCommerce sync log error record: %s', e)
+        return written
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.flush()
+        return False
@@ -6,18 +6,29 @@ from celery import shared_task
 from django.utils import timezone
 from django.db import transaction
 from django.db import models
-from django.db.models import F
-from pipelines.models import PipelineLog, DataQualityCheck, PipelineAnalytics
+from pipelines.metrics import record_job_metrics
+from pipelines.models import PipelineLog, DataQualityCheck
+from pipelines.progress import JobProgress, finish_job, start_job
 from users.models import AccountConfiguration
+from .client import WooCommerceClient, WooCommerceAPIError
+from .rollups import order_days, refresh_daily_rollup
+from .sync_log import SyncLogBuffer
+from .analytics_cache import bump_client_version, bump_global_version
+from .attribution import load_classification_map, reclassify_orders, resolve_order_attribution
 from .models import (
     WooCommerceJob, 
     WooCommerceOrder, 
     WooCommerceOrderItem,
-    WooCommerceSyncLog
+    WooCommerceSyncLog,
+    WooCommerceSyncState
 )
 
 logger = logging.getLogger(__name__)
 
+# Incremental syncs re-read this much before the high-water mark so orders
+# modified while the previous sync was paginating are not missed
+INCREMENTAL_SYNC_OVERLAP = timedelta(minutes=5)
+
 
 def test_woocommerce_connection(config_data):
     """
@@ -71,38 +82,43 @@ def test_woocommerce_connection(config_data):
         return False, f"Connection test failed: {str(e)}"
 
 
+def _woocommerce_pipeline(config):
+    """The DataPipeline for a WooCommerce configuration, or None"""
+    try:
+        from pipelines.models import DataPipeline
+        return DataPipeline.objects.filter(account=config.account, account_configuration=config, pipeline_type='woocommerce').first()
+    except Exception:
+        return None
+
+
 @shared_task
-def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, end_date=None):
+def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, end_date=None, resume_job_id=None,
+                            pipeline_job_id=None):
     """
     Sync WooCommerce data for a specific account configuration
+
+    Orders are fetched and persisted one API page at a time; after each page the
+    job records ``last_page_committed`` so a crashed run can be continued with
+    ``resume_job_id`` instead of starting again from page 1.
+
+    ``incremental_sync`` jobs only fetch orders modified since the configuration's
+    high-water mark (``WooCommerceSyncState``), which is advanced on success.
+    Without a stored mark they run as a ``daily_sync`` to establish one.
+
+    Sync log lines are buffered and written in batches (see ``SyncLogBuffer``).
+    With ``pipeline_job_id`` (a sync queued from the pipelines API) page progress
+    and the outcome are also written to that ``PipelineJob``.
     """
+    log = None
+    run_started_at = timezone.now()
+    fetch_stats = {'bytes_fetched': 0}
+    progress = None
+    if pipeline_job_id:
+        start_job(pipeline_job_id)
+        progress = JobProgress(pipeline_job_id)
     try:
         config = AccountConfiguration.objects.get(id=config_id, config_type='woocommerce')
         
-        # Create job record
-        job = WooCommerceJob.objects.create(
-            client_name=config.account.name,  # Store account name for backward compatibility
-            job_type=job_type,
-            status='running',
-            started_at=timezone.now(),
-            scheduled_at=timezone.now()
-        )
-        
-        # Log start with date range
-        WooCommerceSyncLog.objects.create(
-            client_name=config.account.name,  # Store account name for backward compatibility
-            job=job,
-            level='INFO',
-            message=f'Starting {job_type} for {config.account.name} ({config.name})',
-            details={
-                'job_id': job.id, 
-                'config_id': config.id,
-                'start_date': start_date.isoformat() if start_date else None,
-                'end_date': end_date.isoformat() if end_date else None,
-                'date_range_days': (end_date - start_date).days if start_date and end_date else None
-            }
-        )
-        
         # Determine date range
         from django.utils.dateparse import parse_datetime
         if isinstance(start_date, str):
@@ -110,6 +126,34 @@ def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, e
         if isinstance(end_date, str):
             end_date = parse_datetime(end_date)
 
+        start_page = 1
+        if resume_job_id:
+            # Claim the job first so two resumes can't run from the same checkpoint
+            claimed = (
+                WooCommerceJob.objects.filter(id=resume_job_id, account_configuration=config)
+                .exclude(status__in=('running', 'completed'))
+                .update(status='running', error_message='', completed_at=None, updated_at=timezone.now())
+            )
+            if not claimed:
+                if pipeline_job_id:
+                    finish_job(pipeline_job_id, error='Job is already running or completed')
+                return {'success': False, 'error': 'Job is already running or completed'}
+            # Continue the job with its original window, counters and page checkpoint
+            job = WooCommerceJob.objects.get(id=resume_job_id)
+            job_type = job.job_type
+            start_date = job.range_start
+            end_date = job.range_end
+            start_page = job.last_page_committed + 1
+        else:
+            job = None
+
+        if job_type == 'incremental_sync' and not job:
+            state = WooCommerceSyncState.objects.filter(account_configuration=config).first()
+            if state and state.orders_modified_after:
+                start_date = state.orders_modified_after - INCREMENTAL_SYNC_OVERLAP
+            else:
+                job_type = 'daily_sync'
+
         if not start_date:
             if job_type == 'daily_sync':
                 start_date = timezone.now() - timedelta(days=30)  # Extended to 30 days to catch more historical data
@@ -119,52 +163,134 @@ def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, e
         if not end_date:
             # Add 5 minutes buffer to ensure we capture orders created during sync
             end_date = timezone.now() + timedelta(minutes=5)
-        
-        # Fetch orders from WooCommerce API
-        def log(level, message, details=None):
-            WooCommerceSyncLog.objects.create(
-                client_name=config.account.name,
-                job=job,
-                level=level,
-                message=message,
-                details=details or {}
-            )
 
-        orders_data = fetch_woocommerce_orders(config, start_date, end_date, log=log)
+        if not job:
+            # Create job record
+            job = WooCommerceJob.objects.create(
+                client_name=config.account.name,  # Store account name for backward compatibility
+                account=config.account,
+                account_configuration=config,
+                job_type=job_type,
+                status='running',
+                started_at=timezone.now(),
+                scheduled_at=timezone.now(),
+                range_start=start_date,
+                range_end=end_date
+            )
         
-        # Log sync summary
-        if log:
-            log('INFO', f'Fetched {len(orders_data)} orders from WooCommerce API', {
-                'orders_fetched': len(orders_data),
-                'date_range': f'{start_date} to {end_date}',
-                'client': config.account.name
-            })
+        log = SyncLogBuffer(client_name=config.account.name, job=job)
+
+        # Log start with date range
+        log('INFO', f'{"Resuming" if start_page > 1 else "Starting"} {job_type} for {config.account.name} ({config.name})', {
+            'job_id': job.id,
+            'config_id': config.id,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'date_range_days': (end_date - start_date).days,
+            'start_page': start_page
+        })
         
-        # Process orders
-        orders_processed = 0
-        orders_created = 0
-        orders_updated = 0
+        # Fetch orders from WooCommerce API
+
+        # Process orders page by page; counters carry over when resuming
+        orders_fetched = 0
+        orders_processed = job.orders_processed
+        job_processed_before = job.orders_processed
+        orders_created = job.orders_created
+        orders_updated = job.orders_updated
+        orders_skipped = 0
+        max_modified = None
+        # Oldest date_modified_gmt of an order that failed to save; the mark
+        # must not move past it or the next incremental window would skip it
+        failed_modified = None
+        hold_mark = False
+        pages_done = 0
         
-        for order_data in orders_data:
+        pages = iter_woocommerce_order_pages(
+            config, start_date, end_date, log=log, start_page=start_page,
+            by_modified=job_type == 'incremental_sync', stats=fetch_stats
+        )
+        for page, page_orders in pages:
+            orders_fetched += len(page_orders)
+            page_order_ids = [str(order_data['id']) for order_data in page_orders]
+            # Days whose rollup rows need recomputing, before and after the upsert
+            rollup_days = order_days(config.account.name, page_order_ids)
+            failed_ids = set()
+
             try:
                 with transaction.atomic():
-                    order, created = process_woocommerce_order(config, order_data)
-                    orders_processed += 1
-                    
-                    if created:
-                        orders_created += 1
-                    else:
-                        orders_updated += 1
-                        
+                    batch = upsert_woocommerce_orders(config, page_orders)
             except Exception as e:
-                WooCommerceSyncLog.objects.create(
-                    client_name=config.account.name,
-                    job=job,
-                    level='ERROR',
-                    message=f'Failed to process order {order_data.get("id")}: {str(e)}',
-                    details={'order_data': order_data, 'error': str(e)}
+                # Fall back to row-by-row so a single bad order doesn't drop the whole page
+                log('WARNING', f'Batch upsert failed for page {page}, retrying order by order: {str(e)}', {
+                    'page': page,
+                    'error': str(e)
+                })
+                batch = {'processed': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+                for order_data in page_orders:
+                    try:
+                        with transaction.atomic():
+                            order, created = process_woocommerce_order(config, order_data)
+                            batch['processed'] += 1
+                            batch['created' if created else 'updated'] += 1
+                    except Exception as e:
+                        failed_ids.add(str(order_data.get('id')))
+                        log('ERROR', f'Failed to process order {order_data.get("id")}: {str(e)}', {
+                            'order_id': order_data.get('id'),
+                            'error': str(e)
+                        })
+                        continue
+
+            for order_data in page_orders:
+                modified = _parse_aware(order_data.get('date_modified_gmt'))
+                if str(order_data.get('id')) in failed_ids:
+                    if modified is None:
+                        hold_mark = True
+                    elif failed_modified is None or modified < failed_modified:
+                        failed_modified = modified
+                elif modified and (max_modified is None or modified > max_modified):
+                    max_modified = modified
+
+            orders_processed += batch['processed']
+            orders_created += batch['created']
+            orders_updated += batch['updated']
+            orders_skipped += batch['skipped']
+            log('INFO', 'Persisted page', {'page': page, **batch})
+
+            if batch['processed']:
+                try:
+                    rollup_days |= order_days(config.account.name, page_order_ids)
+                    refresh_daily_rollup(config.account.name, rollup_days)
+                except Exception as e:
+                    log('WARNING', f'Daily rollup refresh failed for page {page}: {str(e)}', {
+                        'page': page,
+                        'days': sorted(day.isoformat() for day in rollup_days),
+                        'error': str(e)
+                    })
+
+            # Checkpoint the page so a crashed run resumes after it
+            job.last_page_committed = page
+            job.orders_processed = orders_processed
+            job.orders_created = orders_created
+            job.orders_updated = orders_updated
+            job.save(update_fields=[
+                'last_page_committed', 'orders_processed', 'orders_created', 'orders_updated', 'updated_at'
+            ])
+            pages_done += 1
+            if progress:
+                total_pages = fetch_stats.get('total_pages')
+                progress.update(
+                    pages_fetched=pages_done,
+                    total_pages=total_pages - start_page + 1 if total_pages else None,
+                    rows_written=orders_processed,
                 )
-                continue
+        
+        # Log sync summary
+        log('INFO', f'Fetched {orders_fetched} orders from WooCommerce API', {
+            'orders_fetched': orders_fetched,
+            'date_range': f'{start_date} to {end_date}',
+            'client': config.account.name
+        })
         
         # Update job status
         job.status = 'completed'
@@ -173,28 +299,44 @@ def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, e
         job.orders_created = orders_created
         job.orders_updated = orders_updated
         job.save()
+
+        # Advance the incremental high-water mark. Only incremental runs move an
+        # existing mark: date-created windows say nothing about older orders.
+        # Orders that failed to save hold it back so the next window re-reads them.
+        if hold_mark:
+            max_modified = None
+        elif failed_modified and max_modified and failed_modified < max_modified:
+            max_modified = failed_modified
+        if hold_mark or failed_modified:
+            log('WARNING', 'High-water mark held back by orders that failed to save', {
+                'orders_modified_after': max_modified.isoformat() if max_modified else None
+            })
+        state, _ = WooCommerceSyncState.objects.get_or_create(account_configuration=config)
+        if max_modified and (
+            not state.orders_modified_after
+            or (job_type == 'incremental_sync' and max_modified > state.orders_modified_after)
+        ):
+            state.orders_modified_after = max_modified
+        state.last_successful_sync_at = job.completed_at
+        state.save()
+
+        # Cached analytics for this client are stale now
+        bump_client_version(config.account.name)
         
         # Log completion
-        WooCommerceSyncLog.objects.create(
-            client_name=config.account.name,
-            job=job,
-            level='INFO',
-            message=f'Completed {job_type} for {config.account.name}: {orders_processed} processed, {orders_created} created, {orders_updated} updated',
-            details={
-                'orders_processed': orders_processed,
-                'orders_created': orders_created,
-                'orders_updated': orders_updated,
-                'start_date': start_date.isoformat(),
-                'end_date': end_date.isoformat()
-            }
-        )
+        log('INFO', f'Completed {job_type} for {config.account.name}: {orders_processed} processed, {orders_created} created, {orders_updated} updated, {orders_skipped} unchanged', {
+            'orders_processed': orders_processed,
+            'orders_created': orders_created,
+            'orders_updated': orders_updated,
+            'orders_skipped': orders_skipped,
+            'start_date': start_date.isoformat(),
+            'end_date': end_date.isoformat(),
+            'orders_modified_after': state.orders_modified_after.isoformat() if state.orders_modified_after else None
+        })
+        log.flush()
 
         # Map to a DataPipeline if one exists for this account/config
-        try:
-            from pipelines.models import DataPipeline
-            pipeline = DataPipeline.objects.filter(account=config.account, account_configuration=config, pipeline_type='woocommerce').first()
-        except Exception:
-            pipeline = None
+        pipeline = _woocommerce_pipeline(config)
 
         # Pipeline logs (aggregate summary)
         try:
@@ -222,32 +364,39 @@ def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, e
         except Exception:
             pass
 
-        # Daily analytics rollup (very basic)
-        try:
-            if pipeline:
-                from django.utils.timezone import now
-                today = now().date()
-                analytics, _ = PipelineAnalytics.objects.get_or_create(pipeline=pipeline, date=today)
-                analytics.total_jobs += 1
-                analytics.successful_jobs += 1
-                analytics.failed_jobs += 0
-                analytics.total_items_processed += int(orders_processed)
-                analytics.save()
-        except Exception:
-            pass
+        # Job duration, throughput and daily analytics
+        record_job_metrics(
+            pipeline, f'woocommerce_{job_type}', run_started_at,
+            items_processed=orders_processed - job_processed_before,
+            bytes_fetched=fetch_stats['bytes_fetched'], job_id=job.id,
+        )
+
+        if pipeline_job_id:
+            finish_job(
+                pipeline_job_id,
+                total_items=orders_fetched,
+                processed_items=orders_processed,
+                created_items=orders_created,
+                updated_items=orders_updated,
+            )
         
         return {
             'success': True,
             'orders_processed': orders_processed,
             'orders_created': orders_created,
-            'orders_updated': orders_updated
+            'orders_updated': orders_updated,
+            'orders_skipped': orders_skipped
         }
         
     except AccountConfiguration.DoesNotExist:
         logger.error(f"WooCommerce configuration {config_id} not found")
+        if pipeline_job_id:
+            finish_job(pipeline_job_id, error='Configuration not found')
         return {'success': False, 'error': 'Configuration not found'}
     except Exception as e:
         logger.error(f"Error syncing WooCommerce configuration {config_id}: {str(e)}")
+        if pipeline_job_id:
+            finish_job(pipeline_job_id, error=str(e))
         
         # Update job status to failed
         if 'job' in locals():
@@ -256,61 +405,118 @@ def sync_woocommerce_config(config_id, job_type='daily_sync', start_date=None, e
             job.completed_at = timezone.now()
             job.save()
             
-            WooCommerceSyncLog.objects.create(
-                client_name=config.account.name if 'config' in locals() else None,
-                job=job,
-                level='ERROR',
-                message=f'Sync failed: {str(e)}',
-                details={'error': str(e)}
-            )
+            if log is None:
+                log = SyncLogBuffer(client_name=config.account.name if 'config' in locals() else None, job=job)
+            log('ERROR', f'Sync failed: {str(e)}', {'error': str(e)})
+
+            if 'config' in locals():
+                record_job_metrics(
+                    _woocommerce_pipeline(config), f'woocommerce_{job_type}', run_started_at,
+                    bytes_fetched=fetch_stats['bytes_fetched'], success=False, job_id=job.id,
+                )
         
         return {'success': False, 'error': str(e)}
+    finally:
+        if log is not None:
+            log.flush()
 
 
 @shared_task
 def sync_all_woocommerce_configs():
     """
-    Sync all enabled WooCommerce configurations (daily task)
+    Sync all enabled WooCommerce configurations (scheduled task)
+
+    Configurations with a high-water mark get an incremental sync; the rest
+    run a daily sync, which establishes one.
     """
     configs = AccountConfiguration.objects.filter(
         config_type='woocommerce',
         is_active=True
-    )
+    ).select_related('account', 'woocommerce_sync_state')
     results = []
     
     for config in configs:
-        result = sync_woocommerce_config.delay(config.id, 'daily_sync')
+        state = getattr(config, 'woocommerce_sync_state', None)
+        job_type = 'incremental_sync' if state and state.orders_modified_after else 'daily_sync'
+        result = sync_woocommerce_config.delay(config.id, job_type)
         results.append({
             'config_id': config.id,
             'account_name': config.account.name,
             'config_name': config.name,
+            'job_type': job_type,
             'task_id': result.id
         })
     
     WooCommerceSyncLog.objects.create(
         level='INFO',
-        message=f'Started daily sync for {len(configs)} WooCommerce configurations',
+        message=f'Started sync for {len(configs)} WooCommerce configurations',
         details={'configs': results}
     )
     
     return results
 
 
+@shared_task
+def resume_woocommerce_job(job_id):
+    """
+    Resume a failed or cancelled WooCommerce sync from its last committed page
+
+    A job still marked running is refused (cancel it first if its worker died),
+    so two runs never share one job's checkpoint and counters.
+    """
+    try:
+        job = WooCommerceJob.objects.get(id=job_id)
+    except WooCommerceJob.DoesNotExist:
+        logger.error(f"WooCommerce job {job_id} not found")
+        return {'success': False, 'error': 'Job not found'}
+
+    if job.status == 'completed':
+        return {'success': False, 'error': 'Job already completed'}
+    if job.status == 'running':
+        return {'success': False, 'error': 'Job is still running'}
+    if not job.account_configuration_id:
+        return {'success': False, 'error': 'Job has no configuration to resume from'}
+
+    return sync_woocommerce_config(job.account_configuration_id, job.job_type, resume_job_id=job.id)
+
+
+@shared_task
+def reclassify_woocommerce_orders(pairs=None):
+    """
+    Re-resolve stored order channel types after ChannelClassification rules change
+    """
+    pairs = [tuple(pair) for pair in pairs] if pairs is not None else None
+    updated = reclassify_orders(pairs)
+    bump_global_version()
+    logger.info(f"Reclassified {updated} WooCommerce orders")
+    return {'success': True, 'orders_updated': updated}
+
+
 def fetch_woocommerce_orders(config, start_date, end_date, log=None):
     """
     Fetch orders from WooCommerce REST API using account configuration
+
+    Collects every page into one list; sync code should iterate
+    ``iter_woocommerce_order_pages`` instead so memory stays bounded.
     """
-    woocommerce_config = config.get_woocommerce_config()
-    if not woocommerce_config:
-        raise Exception("Invalid WooCommerce configuration")
-    
-    base_url = woocommerce_config['store_url'].rstrip('/')
-    api_url = f"{base_url}/wp-json/wc/v3/orders"
-    
-    headers = {
-        'Content-Type': 'application/json',
-    }
-    
+    orders = []
+    for _, page_orders in iter_woocommerce_order_pages(config, start_date, end_date, log=log):
+        orders.extend(page_orders)
+    return orders
+
+
+def iter_woocommerce_order_pages(config, start_date, end_date, log=None, start_page=1, by_modified=False,
+                                 stats=None):
+    """
+    Yield ``(page, orders)`` tuples from the WooCommerce REST API, one page at a time
+
+    With ``by_modified`` the window filters on the orders' GMT modification date
+    (``modified_after``/``modified_before``) instead of their creation date.
+    Pages after the first are fetched concurrently by ``WooCommerceClient``.
+    A ``stats`` dict, if given, has ``bytes_fetched`` and ``total_pages`` kept up to date.
+    """
+    client = WooCommerceClient.from_config(config)
+
     # Use Zulu time formatting for maximum compatibility
     def z(dt):
         try:
@@ -321,238 +527,357 @@ def fetch_woocommerce_orders(config, start_date, end_date, log=None):
             return dt.isoformat()
 
     params = {
-        'consumer_key': woocommerce_config['consumer_key'],
-        'consumer_secret': woocommerce_config['consumer_secret'],
-        'per_page': 100,  # Maximum allowed by WooCommerce
-        'after': z(start_date),
-        'before': z(end_date),
         'status': 'any',
         'orderby': 'date',
         'order': 'asc'
     }
+    if by_modified:
+        params['modified_after'] = z(start_date)
+        params['modified_before'] = z(end_date)
+        params['dates_are_gmt'] = 'true'
+    else:
+        params['after'] = z(start_date)
+        params['before'] = z(end_date)
     
-    orders = []
-    page = 1
+    total_orders = 0
     
     if log:
         log('INFO', 'Starting WooCommerce fetch', {
-            'base_url': base_url,
-            'after': params['after'],
-            'before': params['before']
+            'base_url': client.base_url,
+            'after': z(start_date),
+            'before': z(end_date),
+            'by_modified': by_modified,
+            'start_page': start_page,
+            'max_concurrent_pages': client.max_workers
         })
 
-    while True:
-        params['page'] = page
-        response = requests.get(api_url, headers=headers, params=params)
-        if response.status_code in (401, 403):
-            # Retry with credentials in params only – some hosts reject Basic Auth entirely
-            retry_params = params.copy()
-            # If first request used params (it does), keep as-is; this simply standardizes retry path
-            response = requests.get(api_url, headers=headers, params=retry_params)
-        
-        if response.status_code != 200:
+    with client:
+        try:
+            for page, page_orders in client.iter_pages('orders', params, start_page=start_page):
+                if stats is not None:
+                    stats['bytes_fetched'] = client.bytes_fetched
+                    stats['total_pages'] = client.total_pages
+                if log:
+                    log('INFO', 'Fetched page', {'page': page, 'orders_in_page': len(page_orders)})
+                total_orders += len(page_orders)
+                yield page, page_orders
+        except WooCommerceAPIError as e:
             if log:
                 log('ERROR', 'WooCommerce API error', {
-                    'status': response.status_code,
-                    'body': response.text[:500],
-                    'page': page
+                    'status': e.status_code,
+                    'body': e.body[:500],
+                    'page': e.page
                 })
-            raise Exception(f"WooCommerce API error: {response.status_code} - {response.text}")
-        
-        page_orders = response.json()
-        if log:
+            raise
+    
+    if log:
+        log('INFO', 'WooCommerce fetch completed', {'total_orders': total_orders})
+
+
+# WooCommerce attribution meta keys mapped to WooCommerceOrder fields
+ATTRIBUTION_META_FIELDS = {
+    '_wc_order_attribution_device_type': 'attribution_device_type',
+    '_wc_order_attribution_referrer': 'attribution_referrer',
+    '_wc_order_attribution_session_count': 'attribution_session_count',
+    '_wc_order_attribution_session_entry': 'attribution_session_entry',
+    '_wc_order_attribution_session_pages': 'attribution_session_pages',
+    '_wc_order_attribution_session_start_time': 'attribution_session_start_time',
+    '_wc_order_attribution_source_type': 'attribution_source_type',
+    '_wc_order_attribution_user_agent': 'attribution_user_agent',
+    '_wc_order_attribution_utm_source': 'attribution_utm_source',
+}
+
+# Fields rewritten when an already-stored order is upserted again.
+# is_new_customer and created_at are deliberately left as first recorded.
+ORDER_UPSERT_UPDATE_FIELDS = [
+    'order_number', 'order_date', 'paid_date', 'status', 'date_created', 'date_modified',
+    'shipping_total', 'shipping_tax_total', 'fee_total', 'fee_tax_total', 'tax_total',
+    'cart_discount', 'order_discount', 'discount_total', 'order_total', 'order_subtotal',
+    'order_key', 'order_currency', 'payment_method', 'payment_method_title', 'transaction_id',
+    'customer_ip_address', 'customer_user_agent', 'shipping_method', 'customer_id', 'customer_user',
+    'billing_first_name', 'billing_last_name', 'billing_company', 'billing_email', 'billing_phone',
+    'billing_address_1', 'billing_address_2', 'billing_postcode', 'billing_city', 'billing_state',
+    'billing_country', 'shipping_first_name', 'shipping_last_name', 'shipping_company',
+    'shipping_phone', 'shipping_address_1', 'shipping_address_2', 'shipping_postcode',
+    'shipping_city', 'shipping_state', 'shipping_country', 'customer_note', 'wt_import_key',
+    'attribution_device_type', 'attribution_referrer', 'attribution_session_count',
+    'attribution_session_entry', 'attribution_session_pages', 'attribution_session_start_time',
+    'attribution_source_type', 'attribution_user_agent', 'attribution_utm_source',
+    'total', 'currency', 'billing_address', 'shipping_address', 'date_completed',
+    'traffic_source', 'traffic_medium', 'channel_type', 'extracted_source', 'extracted_medium',
+    'account', 'raw_data', 'updated_at',
+]
+
+ORDER_ITEM_BATCH_SIZE = 1000
+
+
+def _parse_aware(dt_value):
+    """Convert various datetime representations to aware UTC datetime or None."""
+    from django.utils import dateparse
+
+    if not dt_value:
+        return None
+    if isinstance(dt_value, datetime):
+        dt = dt_value
+    else:
+        # Try Django parser first
+        dt = dateparse.parse_datetime(dt_value)
+        if dt is None:
+            # Fallback to fromisoformat with 'Z' handling
             try:
-                count = len(page_orders)
+                dt = datetime.fromisoformat(str(dt_value).replace('Z', '+00:00'))
             except Exception:
-                count = 'unknown'
-            log('INFO', 'Fetched page', {'page': page, 'orders_in_page': count})
+                return None
+    try:
+        return dt if timezone.is_aware(dt) else timezone.make_aware(dt, timezone.utc)
+    except Exception:
+        # As a last resort, return naive parsed value
+        return dt
+
+
+def _extract_attribution_data(order_data):
+    """Extract attribution data from WooCommerce meta fields"""
+    attribution_data = {}
+    for meta_item in order_data.get('meta_data') or []:
+        if isinstance(meta_item, dict):
+            field = ATTRIBUTION_META_FIELDS.get(meta_item.get('key', ''))
+            if field:
+                attribution_data[field] = meta_item.get('value', '')
+    return attribution_data
+
+
+def build_order_fields(order_data, classification_map):
+    """
+    Map a WooCommerce API order payload to WooCommerceOrder field values
+    (everything except client_name, order_id and is_new_customer)
+    """
+    order_id = str(order_data['id'])
+    attribution_data = _extract_attribution_data(order_data)
+    billing = order_data.get('billing') or {}
+    shipping = order_data.get('shipping') or {}
+
+    fields = {
+        'order_number': order_data.get('number', order_id),
+        'order_date': _parse_aware(order_data.get('date_created')),
+        'paid_date': _parse_aware(order_data.get('date_paid')),
+        'status': order_data.get('status', ''),
+        'date_created': _parse_aware(order_data.get('date_created')),
+        'date_modified': _parse_aware(order_data.get('date_modified', order_data.get('date_created'))),
         
-        if not page_orders:
-            break
-            
-        orders.extend(page_orders)
-        page += 1
+        # Financial fields
+        'shipping_total': order_data.get('shipping_total', '0.00'),
+        'shipping_tax_total': order_data.get('shipping_tax_total', '0.00'),
+        'fee_total': order_data.get('fee_total', '0.00'),
+        'fee_tax_total': order_data.get('fee_tax_total', '0.00'),
+        'tax_total': order_data.get('tax_total', '0.00'),
+        'cart_discount': order_data.get('cart_discount', '0.00'),
+        'order_discount': order_data.get('order_discount', '0.00'),
+        'discount_total': order_data.get('discount_total', '0.00'),
+        'order_total': order_data.get('total', '0.00'),
+        'order_subtotal': order_data.get('subtotal', '0.00'),
+        
+        'order_key': order_data.get('order_key'),
+        'order_currency': order_data.get('currency', 'USD'),
+        
+        # Payment details
+        'payment_method': order_data.get('payment_method'),
+        'payment_method_title': order_data.get('payment_method_title'),
+        'transaction_id': order_data.get('transaction_id'),
+        
+        # Customer analytics
+        'customer_ip_address': order_data.get('customer_ip_address'),
+        'customer_user_agent': order_data.get('customer_user_agent'),
         
-        # Safety check to prevent infinite loops
-        if page > 100:
-            break
+        # Shipping details
+        'shipping_method': order_data.get('shipping_method'),
+        
+        # Customer info
+        'customer_id': order_data.get('customer_id'),
+        'customer_user': order_data.get('customer_user'),
+        
+        # Detailed billing address
+        'billing_first_name': billing.get('first_name'),
+        'billing_last_name': billing.get('last_name'),
+        'billing_company': billing.get('company'),
+        'billing_email': billing.get('email'),
+        'billing_phone': billing.get('phone'),
+        'billing_address_1': billing.get('address_1'),
+        'billing_address_2': billing.get('address_2'),
+        'billing_postcode': billing.get('postcode'),
+        'billing_city': billing.get('city'),
+        'billing_state': billing.get('state'),
+        'billing_country': billing.get('country'),
+        
+        # Detailed shipping address
+        'shipping_first_name': shipping.get('first_name'),
+        'shipping_last_name': shipping.get('last_name'),
+        'shipping_company': shipping.get('company'),
+        'shipping_phone': shipping.get('phone'),
+        'shipping_address_1': shipping.get('address_1'),
+        'shipping_address_2': shipping.get('address_2'),
+        'shipping_postcode': shipping.get('postcode'),
+        'shipping_city': shipping.get('city'),
+        'shipping_state': shipping.get('state'),
+        'shipping_country': shipping.get('country'),
+        
+        # Customer notes and import key
+        'customer_note': order_data.get('customer_note'),
+        'wt_import_key': order_data.get('wt_import_key'),
+        
+        # Attribution data
+        'attribution_device_type': attribution_data.get('attribution_device_type'),
+        'attribution_referrer': attribution_data.get('attribution_referrer'),
+        'attribution_session_count': attribution_data.get('attribution_session_count'),
+        'attribution_session_entry': attribution_data.get('attribution_session_entry'),
+        'attribution_session_pages': attribution_data.get('attribution_session_pages'),
+        'attribution_session_start_time': _parse_aware(attribution_data.get('attribution_session_start_time')),
+        'attribution_source_type': attribution_data.get('attribution_source_type'),
+        'attribution_user_agent': attribution_data.get('attribution_user_agent'),
+        'attribution_utm_source': attribution_data.get('attribution_utm_source'),
+        
+        # Legacy fields for backward compatibility
+        'total': order_data.get('total', '0.00'),
+        'currency': order_data.get('currency', 'USD'),
+        'billing_address': billing,
+        'shipping_address': shipping,
+        'date_completed': _parse_aware(order_data.get('date_completed')),
+        'raw_data': order_data
+    }
     
-    if log:
-        log('INFO', 'WooCommerce fetch completed', {'total_orders': len(orders)})
-    return orders
+    # Normalised source/medium/channel, so reports don't re-parse raw_data
+    fields.update(resolve_order_attribution(
+        fields['attribution_utm_source'], fields['attribution_source_type'], order_data, classification_map
+    ))
+    return fields
+
+
+def build_order_items(order_pk, line_items):
+    """Build unsaved WooCommerceOrderItem rows for an order's line items"""
+    return [
+        WooCommerceOrderItem(
+            order_id=order_pk,
+            product_id=str(item_data.get('product_id', '')),
+            product_name=item_data.get('name', ''),
+            product_sku=item_data.get('sku'),
+            quantity=item_data.get('quantity', 0),
+            unit_price=item_data.get('price', '0.00'),
+            total_price=item_data.get('total', '0.00'),
+            subtotal=item_data.get('subtotal', '0.00'),  # Product Item X Subtotal
+            tax_class=item_data.get('tax_class'),
+            tax_total=item_data.get('total_tax', '0.00'),
+            meta_data=item_data.get('meta_data', [])
+        )
+        for item_data in line_items
+    ]
+
+
+def upsert_woocommerce_orders(config, orders_data):
+    """
+    Persist a batch (one API page) of WooCommerce orders in a handful of queries:
+    one upsert on (client_name, order_id), one delete of their line items and one
+    bulk insert of the replacements. Call inside ``transaction.atomic()``.
+
+    Orders whose stored ``date_modified`` matches the payload are skipped.
+    Returns a dict with processed/created/updated/skipped counts for the batch.
+    """
+    client_name = config.account.name
+
+    # Deduplicate by order id; a single INSERT .. ON CONFLICT cannot touch a row twice
+    payloads = {}
+    for order_data in orders_data:
+        payloads[str(order_data['id'])] = order_data
+    received = len(payloads)
+
+    client_orders = WooCommerceOrder.objects.filter(client_name=client_name)
+    stored_modified = dict(client_orders.filter(order_id__in=payloads).values_list('order_id', 'date_modified'))
+
+    # Leave unchanged orders alone
+    for order_id, modified in stored_modified.items():
+        order_data = payloads[order_id]
+        if modified and modified == _parse_aware(order_data.get('date_modified', order_data.get('date_created'))):
+            del payloads[order_id]
+    skipped = received - len(payloads)
+    if not payloads:
+        return {'processed': 0, 'created': 0, 'updated': 0, 'skipped': skipped}
+
+    existing_ids = set(stored_modified) & set(payloads)
+
+    # An order created in this batch is a new customer's when no earlier order has its billing email
+    new_emails = {
+        (order_data.get('billing') or {}).get('email')
+        for order_id, order_data in payloads.items()
+        if order_id not in existing_ids
+    } - {None, ''}
+    seen_emails = set(
+        client_orders.filter(billing_email__in=new_emails).values_list('billing_email', flat=True)
+    ) if new_emails else set()
+
+    classification_map = load_classification_map()
+    orders = []
+    for order_id, order_data in payloads.items():
+        fields = build_order_fields(order_data, classification_map)
+        is_new_customer = True
+        billing_email = fields['billing_email']
+        if billing_email:
+            is_new_customer = billing_email not in seen_emails
+            seen_emails.add(billing_email)
+        orders.append(WooCommerceOrder(
+            client_name=client_name,
+            account_id=config.account_id,
+            order_id=order_id,
+            is_new_customer=is_new_customer,
+            **fields
+        ))
+
+    WooCommerceOrder.objects.bulk_create(
+        orders,
+        update_conflicts=True,
+        unique_fields=['client_name', 'order_id'],
+        update_fields=ORDER_UPSERT_UPDATE_FIELDS,
+    )
+
+    # Replace line items for every order in the batch
+    order_pks = dict(client_orders.filter(order_id__in=payloads).values_list('order_id', 'id'))
+    WooCommerceOrderItem.objects.filter(order_id__in=order_pks.values()).delete()
+    items = []
+    for order_id, order_data in payloads.items():
+        items.extend(build_order_items(order_pks[order_id], order_data.get('line_items', [])))
+    WooCommerceOrderItem.objects.bulk_create(items, batch_size=ORDER_ITEM_BATCH_SIZE)
+
+    created = len(payloads) - len(existing_ids)
+    return {'processed': len(payloads), 'created': created, 'updated': len(existing_ids), 'skipped': skipped}
 
 
 def process_woocommerce_order(config, order_data):
     """
     Process a single WooCommerce order and save to database
+
+    Used as the row-by-row fallback when a batch upsert fails, so the offending
+    order can be isolated and logged.
     """
     order_id = str(order_data['id'])
-    
-    # Extract attribution data from meta fields
-    attribution_data = {}
-    if 'meta_data' in order_data:
-        for meta_item in order_data['meta_data']:
-            if isinstance(meta_item, dict):
-                key = meta_item.get('key', '')
-                value = meta_item.get('value', '')
-                
-                # Map WooCommerce attribution meta fields to our model fields
-                if key == '_wc_order_attribution_device_type':
-                    attribution_data['attribution_device_type'] = value
-                elif key == '_wc_order_attribution_referrer':
-                    attribution_data['attribution_referrer'] = value
-                elif key == '_wc_order_attribution_session_count':
-                    attribution_data['attribution_session_count'] = value
-                elif key == '_wc_order_attribution_session_entry':
-                    attribution_data['attribution_session_entry'] = value
-                elif key == '_wc_order_attribution_session_pages':
-                    attribution_data['attribution_session_pages'] = value
-                elif key == '_wc_order_attribution_session_start_time':
-                    attribution_data['attribution_session_start_time'] = value
-                elif key == '_wc_order_attribution_source_type':
-                    attribution_data['attribution_source_type'] = value
-                elif key == '_wc_order_attribution_user_agent':
-                    attribution_data['attribution_user_agent'] = value
-                elif key == '_wc_order_attribution_utm_source':
-                    attribution_data['attribution_utm_source'] = value
-    
-    # Helper to parse timestamps to timezone-aware UTC datetimes
-    from django.utils import dateparse
-
-    def parse_aware(dt_value):
-        """Convert various datetime representations to aware UTC datetime or None."""
-        if not dt_value:
-            return None
-        if isinstance(dt_value, datetime):
-            dt = dt_value
-        else:
-            # Try Django parser first
-            dt = dateparse.parse_datetime(dt_value)
-            if dt is None:
-                # Fallback to fromisoformat with 'Z' handling
-                try:
-                    dt = datetime.fromisoformat(str(dt_value).replace('Z', '+00:00'))
-                except Exception:
-                    return None
-        try:
-            return dt if timezone.is_aware(dt) else timezone.make_aware(dt, timezone.utc)
-        except Exception:
-            # As a last resort, return naive parsed value
-            return dt
+    fields = build_order_fields(order_data, load_classification_map())
 
     # Check if order already exists
     order, created = WooCommerceOrder.objects.get_or_create(
         client_name=config.account.name,  # Store account name for backward compatibility
         order_id=order_id,
-        defaults={
-            'order_number': order_data.get('number', order_id),
-            'order_date': parse_aware(order_data.get('date_created')),
-            'paid_date': parse_aware(order_data.get('date_paid')),
-            'status': order_data.get('status', ''),
-            'date_created': parse_aware(order_data.get('date_created')),
-            'date_modified': parse_aware(order_data.get('date_modified', order_data.get('date_created'))),
-            
-            # Financial fields
-            'shipping_total': order_data.get('shipping_total', '0.00'),
-            'shipping_tax_total': order_data.get('shipping_tax_total', '0.00'),
-            'fee_total': order_data.get('fee_total', '0.00'),
-            'fee_tax_total': order_data.get('fee_tax_total', '0.00'),
-            'tax_total': order_data.get('tax_total', '0.00'),
-            'cart_discount': order_data.get('cart_discount', '0.00'),
-            'order_discount': order_data.get('order_discount', '0.00'),
-            'discount_total': order_data.get('discount_total', '0.00'),
-            'order_total': order_data.get('total', '0.00'),
-            'order_subtotal': order_data.get('subtotal', '0.00'),
-            
-            'order_key': order_data.get('order_key'),
-            'order_currency': order_data.get('currency', 'USD'),
-            
-            # Payment details
-            'payment_method': order_data.get('payment_method'),
-            'payment_method_title': order_data.get('payment_method_title'),
-            'transaction_id': order_data.get('transaction_id'),
-            
-            # Customer analytics
-            'customer_ip_address': order_data.get('customer_ip_address'),
-            'customer_user_agent': order_data.get('customer_user_agent'),
-            
-            # Shipping details
-            'shipping_method': order_data.get('shipping_method'),
-            
-            # Customer info
-            'customer_id': order_data.get('customer_id'),
-            'customer_user': order_data.get('customer_user'),
-            
-            # Detailed billing address
-            'billing_first_name': order_data.get('billing', {}).get('first_name'),
-            'billing_last_name': order_data.get('billing', {}).get('last_name'),
-            'billing_company': order_data.get('billing', {}).get('company'),
-            'billing_email': order_data.get('billing', {}).get('email'),
-            'billing_phone': order_data.get('billing', {}).get('phone'),
-            'billing_address_1': order_data.get('billing', {}).get('address_1'),
-            'billing_address_2': order_data.get('billing', {}).get('address_2'),
-            'billing_postcode': order_data.get('billing', {}).get('postcode'),
-            'billing_city': order_data.get('billing', {}).get('city'),
-            'billing_state': order_data.get('billing', {}).get('state'),
-            'billing_country': order_data.get('billing', {}).get('country'),
-            
-            # Detailed shipping address
-            'shipping_first_name': order_data.get('shipping', {}).get('first_name'),
-            'shipping_last_name': order_data.get('shipping', {}).get('last_name'),
-            'shipping_company': order_data.get('shipping', {}).get('company'),
-            'shipping_phone': order_data.get('shipping', {}).get('phone'),
-            'shipping_address_1': order_data.get('shipping', {}).get('address_1'),
-            'shipping_address_2': order_data.get('shipping', {}).get('address_2'),
-            'shipping_postcode': order_data.get('shipping', {}).get('postcode'),
-            'shipping_city': order_data.get('shipping', {}).get('city'),
-            'shipping_state': order_data.get('shipping', {}).get('state'),
-            'shipping_country': order_data.get('shipping', {}).get('country'),
-            
-            # Customer notes and import key
-            'customer_note': order_data.get('customer_note'),
-            'wt_import_key': order_data.get('wt_import_key'),
-            
-            # Attribution data
-            'attribution_device_type': attribution_data.get('attribution_device_type'),
-            'attribution_referrer': attribution_data.get('attribution_referrer'),
-            'attribution_session_count': attribution_data.get('attribution_session_count'),
-            'attribution_session_entry': attribution_data.get('attribution_session_entry'),
-            'attribution_session_pages': attribution_data.get('attribution_session_pages'),
-            'attribution_session_start_time': parse_aware(attribution_data.get('attribution_session_start_time')),
-            'attribution_source_type': attribution_data.get('attribution_source_type'),
-            'attribution_user_agent': attribution_data.get('attribution_user_agent'),
-            'attribution_utm_source': attribution_data.get('attribution_utm_source'),
-            
-            # Legacy fields for backward compatibility
-            'total': order_data.get('total', '0.00'),
-            'currency': order_data.get('currency', 'USD'),
-            'billing_address': order_data.get('billing', {}),
-            'shipping_address': order_data.get('shipping', {}),
-            'date_completed': parse_aware(order_data.get('date_completed')),
-            'is_new_customer': True,  # Default to True, will be updated below if needed
-            'raw_data': order_data
-        }
+        defaults={**fields, 'account_id': config.account_id, 'is_new_customer': True}
     )
     
-    # Mark as new customer if this is the first order for this client+billing_email
-    billing_email = order_data.get('billing', {}).get('email')
-    if billing_email:
-        from .models import WooCommerceOrder as WOrder
-        existed = WOrder.objects.filter(client_name=config.account.name, billing_email=billing_email).exclude(id=F('id')).exists()
-        # existed will always be False for a brand-new row; set flag accordingly after create
-    
     if not created:
         # Update existing order with new data
-        order.status = order_data.get('status', '')
-        order.order_total = order_data.get('total', '0.00')
-        order.order_date = parse_aware(order_data.get('date_modified'))
-        order.raw_data = order_data
+        for field, value in fields.items():
+            setattr(order, field, value)
+        order.account_id = config.account_id
         order.save()
     else:
+        billing_email = fields['billing_email']
         if billing_email:
             # First time we see this billing email for this client?
-            from .models import WooCommerceOrder as WOrder
-            before_count = WOrder.objects.filter(client_name=config.account.name, billing_email=billing_email).exclude(id=F('id')).count()
+            before_count = WooCommerceOrder.objects.filter(
+                client_name=config.account.name, billing_email=billing_email
+            ).exclude(id=order.id).count()
             order.is_new_customer = before_count == 0
             order.save(update_fields=['is_new_customer'])
 
@@ -570,17 +895,4 @@ def process_order_items(order, line_items):
     WooCommerceOrderItem.objects.filter(order=order).delete()
     
     # Create new items
-    for item_data in line_items:
-        WooCommerceOrderItem.objects.create(
-            order=order,
-            product_id=str(item_data.get('product_id', '')),
-            product_name=item_data.get('name', ''),
-            product_sku=item_data.get('sku'),
-            quantity=item_data.get('quantity', 0),
-            unit_price=item_data.get('price', '0.00'),
-            total_price=item_data.get('total', '0.00'),
-            subtotal=item_data.get('subtotal', '0.00'),  # Product Item X Subtotal
-            tax_class=item_data.get('tax_class'),
-            tax_total=item_data.get('total_tax', '0.00'),
-            meta_data=item_data.get('meta_data', [])
-        ) 
\ No newline at end of file
+    WooCommerceOrderItem.objects.bulk_create(build_order_items(order.pk, line_items))
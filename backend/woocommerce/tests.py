@@ -0,0 +1,881 @@
+import csv
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from operator import itemgetter
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient
+
+from users.models import Account, AccountConfiguration, Agency, Company, User
+
+from .account_backfill import backfill_job_accounts, backfill_order_accounts
+from .acquisition import customer_acquisition_summary
+from .attribution import (
+    apply_raw_overrides, attribution_groups, backfill_order_attribution, channel_performance, extract_traffic_source,
+    load_classification_map, unclassified_sources,
+)
+from .client import PER_PAGE, WooCommerceAPIError, WooCommerceClient
+from .currency import configured_currency
+from .dashboard import period_breakdowns, period_kpis
+from .export import ORDER_CSV_HEADER, UNCLASSIFIED_CHANNEL, order_export_rows
+from .models import (
+    ChannelClassification, WooCommerceDailyRollup, WooCommerceJob, WooCommerceOrder, WooCommerceOrderItem,
+    WooCommerceSyncLog, WooCommerceSyncState,
+)
+from .rollups import rebuild_daily_rollup, refresh_daily_rollup
+from .subscriptions import detect_subscribers, purchase_rows
+from .sync_log import SyncLogBuffer
+from .tasks import (
+    INCREMENTAL_SYNC_OVERLAP, process_woocommerce_order, resume_woocommerce_job, sync_woocommerce_config,
+    upsert_woocommerce_orders,
+)
+from .views import WooCommerceOrderViewSet
+
+
+def make_tenant(name='Porsa'):
+    """A company user and the account they can see"""
+    agency = Agency.objects.create(name=f'{name} Agency')
+    company = Company.objects.create(name=f'{name} ApS', agency=agency)
+    account = Account.objects.create(name=name, company=company)
+    user = User.objects.create_user(
+        username=f'{name.lower()}@example.com', email=f'{name.lower()}@example.com',
+        password='pass', role='company_user', company=company, agency=agency,
+    )
+    return user, account
+
+
+def make_order(client_name='Porsa', order_id='1', order_date=None, order_total='100.00', **fields):
+    """Create an order with the columns the reports read filled in"""
+    order_date = order_date or timezone.make_aware(datetime(2025, 1, 15, 12, 0))
+    fields.setdefault('status', 'completed')
+    return WooCommerceOrder.objects.create(
+        client_name=client_name,
+        order_id=order_id,
+        order_number=order_id,
+        order_date=order_date,
+        order_total=Decimal(order_total),
+        total=Decimal(order_total),
+        date_created=order_date,
+        date_modified=order_date,
+        **fields
+    )
+
+
+class OrderAttributionBackfillTests(TestCase):
+    def setUp(self):
+        ChannelClassification.objects.create(
+            source='google', medium='organic', source_medium='google/organic',
+            channel='google / organic', channel_type='Organic Search',
+        )
+
+    def test_backfill_resolves_unclassified_orders(self):
+        """Orders without channel_type get source, medium and channel resolved"""
+        order = make_order(attribution_utm_source='Google', attribution_source_type='organic')
+        direct = make_order(order_id='2')
+
+        self.assertEqual(backfill_order_attribution(batch_size=1), 2)
+
+        order.refresh_from_db()
+        self.assertEqual(
+            (order.traffic_source, order.traffic_medium, order.channel_type),
+            ('google', 'organic', 'Organic Search'),
+        )
+        direct.refresh_from_db()
+        self.assertEqual(direct.channel_type, 'Direct')
+
+    def test_backfill_skips_classified_orders(self):
+        make_order(
+            channel_type='Paid Search', traffic_source='google', traffic_medium='cpc',
+            extracted_source='google', extracted_medium='cpc',
+        )
+        self.assertEqual(backfill_order_attribution(), 0)
+        self.assertEqual(WooCommerceOrder.objects.get().channel_type, 'Paid Search')
+
+    def test_backfill_fills_in_extracted_source(self):
+        """Orders resolved before extracted_source/medium existed get them too"""
+        make_order(
+            channel_type='Organic Search', traffic_source='bing', traffic_medium='organic',
+            attribution_utm_source='google', attribution_source_type='organic', raw_data={'utm_source': 'bing'},
+        )
+        self.assertEqual(backfill_order_attribution(), 1)
+        order = WooCommerceOrder.objects.get()
+        self.assertEqual(
+            (order.traffic_source, order.extracted_source, order.extracted_medium), ('bing', 'google', 'organic'),
+        )
+
+    def test_backfill_with_historical_models(self):
+        """The data migration runs it against the migration state's models"""
+        order = make_order(attribution_utm_source='google', attribution_source_type='organic')
+        apps = MigrationExecutor(connection).loader.project_state(
+            ('woocommerce', '0014_backfill_order_attribution')
+        ).apps
+
+        self.assertEqual(backfill_order_attribution(apps=apps), 1)
+
+        order.refresh_from_db()
+        self.assertEqual((order.channel_type, order.extracted_source), ('Organic Search', ''))
+
+
+class ChannelReportTests(TestCase):
+    def setUp(self):
+        cache.clear()  # analytics responses are cached per user id
+        ChannelClassification.objects.create(
+            source='google', medium='organic', source_medium='google/organic',
+            channel='google / organic', channel_type='Organic Search',
+        )
+        self.user, account = make_tenant()
+        yesterday = timezone.now() - timedelta(days=1)
+        for order_id, total, fields in (
+            ('1', '100.00', {'attribution_utm_source': 'Google', 'attribution_source_type': 'organic'}),
+            ('2', '300.00', {'attribution_utm_source': 'google', 'attribution_source_type': 'organic',
+                             'attribution_session_count': 2}),
+            ('3', '80.00', {'raw_data': {'utm_source': 'newsletter', 'utm_medium': 'email'}}),
+            # Top-level override: reported as bing, listed as unclassified google/organic
+            ('4', '250.00', {'attribution_utm_source': 'google', 'attribution_source_type': 'organic',
+                             'attribution_session_count': 3, 'raw_data': {'utm_source': 'bing'}}),
+            ('5', '50.00', {}),
+        ):
+            order_date = yesterday + timedelta(minutes=int(order_id))
+            make_order(account=account, order_id=order_id, order_total=total, order_date=order_date, **fields)
+        backfill_order_attribution()
+
+    def test_groups_match_the_per_order_attribution(self):
+        """Grouping stored attribution gives what resolving each order's raw payload gave"""
+        classification_map = load_classification_map()
+        per_order = []
+        for order in WooCommerceOrder.objects.defer(None).order_by('-date_created'):
+            extracted = extract_traffic_source(order.attribution_utm_source, order.attribution_source_type, order.raw_data)
+            source, medium = apply_raw_overrides(*extracted, order.raw_data)
+            per_order.append({
+                'source': source, 'medium': medium, 'channel_type': classification_map.get((source, medium), 'Direct'),
+                'extracted_source': extracted[0], 'extracted_medium': extracted[1], 'orders': 1,
+                'revenue': float(order.total), 'sessions': max(order.attribution_session_count or 0, 1),
+                'estimated_sessions': max(1, int(order.total / 100)),
+            })
+
+        with self.assertNumQueries(2):
+            groups = attribution_groups(WooCommerceOrder.objects.all(), classification_map)
+
+        self.assertEqual(channel_performance(groups), channel_performance(per_order))
+        self.assertEqual(
+            unclassified_sources(groups, classification_map), unclassified_sources(per_order, classification_map),
+        )
+
+    def test_channels_report(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/woocommerce/orders/channels_report/', {'period': 30})
+
+        self.assertEqual(response.status_code, 200)
+        current = response.data['currentPeriod']
+        self.assertEqual(
+            {channel['channelType']: (channel['orders'], channel['orderTotal'], channel['sessions'])
+             for channel in current['channels']},
+            {'Organic Search': (2, 400.0, 3), 'Direct': (2, 130.0, 2), 'Bing': (1, 250.0, 3)},
+        )
+        self.assertEqual((current['total']['orders'], current['total']['sessions']), (5, 8))
+        self.assertEqual(
+            [(example['sourceMedium'], example['sessions']) for example in response.data['unclassifiedData']['examples']],
+            [('(direct)/typein', 1), ('newsletter/email', 1)],
+        )
+
+
+class OrderExportTests(TestCase):
+    def test_rows_mark_unclassified_orders(self):
+        """Orders not classified yet are not reported as direct traffic"""
+        make_order(order_id='1', channel_type='SEO', order_date=timezone.make_aware(datetime(2025, 1, 2)))
+        make_order(order_id='2', order_date=timezone.make_aware(datetime(2025, 1, 3)))
+
+        rows = list(order_export_rows(WooCommerceOrder.objects.all(), chunk_size=1))
+
+        self.assertEqual([row[0] for row in rows], ['2', '1'])
+        self.assertEqual([row[5] for row in rows], [UNCLASSIFIED_CHANNEL, 'SEO'])
+        self.assertEqual(rows[0][1], '2025-01-03 00:00:00')
+        self.assertEqual(rows[0][2], 100.0)
+
+    def test_export_streams_csv_of_the_users_orders(self):
+        user, account = make_tenant()
+        make_order(account=account, channel_type='SEO', order_date=timezone.now())
+        make_order(client_name='Other', order_id='2', order_date=timezone.now())
+
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/woocommerce/orders/export/', {'report': 'orders', 'period': 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ORDER_CSV_HEADER)
+        self.assertEqual([row[0] for row in rows[1:]], ['1'])
+
+    def test_export_rejects_unknown_format(self):
+        user, _ = make_tenant()
+        client = APIClient()
+        client.force_authenticate(user)
+        response = client.get('/api/woocommerce/orders/export/', {'file_format': 'xlsx'})
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderEditSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = WooCommerceOrder
+        fields = ['status', 'date_created']
+
+
+class DailyRollupTests(TestCase):
+    def rollup(self):
+        return {
+            (row.date, row.status): (row.order_count, row.revenue)
+            for row in WooCommerceDailyRollup.objects.filter(client_name='Porsa')
+        }
+
+    def test_refresh_replaces_the_days_rows(self):
+        make_order(order_id='1')
+        make_order(order_id='2', order_total='50.00', status='processing')
+        WooCommerceDailyRollup.objects.create(client_name='Porsa', date=date(2025, 1, 15), status='refunded', order_count=9)
+
+        self.assertEqual(refresh_daily_rollup('Porsa', {date(2025, 1, 15)}), 2)
+        self.assertEqual(self.rollup(), {
+            (date(2025, 1, 15), 'completed'): (1, Decimal('100.00')),
+            (date(2025, 1, 15), 'processing'): (1, Decimal('50.00')),
+        })
+
+    def test_rebuild_with_historical_models(self):
+        """The data migration populates the rollup from the stored orders"""
+        make_order(order_id='1')
+        make_order(order_id='2', order_date=timezone.make_aware(datetime(2025, 3, 1)))
+        WooCommerceDailyRollup.objects.create(client_name='Porsa', date=date(2024, 6, 1), status='completed')
+        apps = MigrationExecutor(connection).loader.project_state(
+            ('woocommerce', '0015_populate_daily_rollup')
+        ).apps
+
+        self.assertEqual(rebuild_daily_rollup(apps=apps), {'Porsa': 2})
+        self.assertEqual(set(self.rollup()), {(date(2025, 1, 15), 'completed'), (date(2025, 3, 1), 'completed')})
+
+    def test_order_edits_refresh_the_rollup(self):
+        """perform_update/perform_destroy refresh the days the order left and joined"""
+        order = make_order()
+        refresh_daily_rollup('Porsa', {date(2025, 1, 15)})
+        view = WooCommerceOrderViewSet()
+
+        serializer = OrderEditSerializer(
+            order, data={'status': 'cancelled', 'date_created': '2025-01-16T12:00:00Z'}, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+        view.perform_update(serializer)
+        self.assertEqual(self.rollup(), {(date(2025, 1, 16), 'cancelled'): (1, Decimal('100.00'))})
+
+        view.perform_destroy(WooCommerceOrder.objects.get(pk=order.pk))
+        self.assertEqual(self.rollup(), {})
+
+
+class AnalyticsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user, self.account = make_tenant()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_order_edits_invalidate_cached_analytics(self):
+        order = make_order(account=self.account, order_date=timezone.now() - timedelta(days=1))
+        rebuild_daily_rollup()
+        self.assertEqual(self.client.get('/api/woocommerce/orders/stats/')['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get('/api/woocommerce/orders/stats/')['X-Cache'], 'HIT')
+
+        serializer = OrderEditSerializer(order, data={'status': 'cancelled'}, partial=True)
+        serializer.is_valid(raise_exception=True)
+        WooCommerceOrderViewSet().perform_update(serializer)
+
+        response = self.client.get('/api/woocommerce/orders/stats/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['status_breakdown'], [{'status': 'cancelled', 'count': 1}])
+
+        WooCommerceOrderViewSet().perform_destroy(WooCommerceOrder.objects.get(pk=order.pk))
+        self.assertEqual(self.client.get('/api/woocommerce/orders/stats/').data['total_orders'], 0)
+
+    def test_cache_metrics_are_for_super_admins(self):
+        self.assertEqual(self.client.get('/api/woocommerce/orders/cache_metrics/').status_code, 403)
+
+        self.user.role = 'super_admin'
+        self.user.save()
+        response = self.client.get('/api/woocommerce/orders/cache_metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('stats', response.data['endpoints'])
+
+
+class AccountBackfillTests(TestCase):
+    def setUp(self):
+        _, self.account = make_tenant()
+        self.company = self.account.company
+
+    def test_exact_name_match(self):
+        order = make_order()
+        self.assertEqual(backfill_order_accounts(batch_size=1), (1, []))
+        order.refresh_from_db()
+        self.assertEqual(order.account, self.account)
+
+    def test_shared_name_resolved_by_woocommerce_config(self):
+        Account.objects.create(name='Porsa', company=self.company)
+        AccountConfiguration.objects.create(account=self.account, config_type='woocommerce')
+        order = make_order()
+
+        self.assertEqual(backfill_order_accounts(), (1, []))
+        order.refresh_from_db()
+        self.assertEqual(order.account, self.account)
+
+    def test_ambiguous_name_left_unlinked(self):
+        Account.objects.create(name='Porsa', company=self.company)
+        make_order()
+        make_order(client_name='Unknown shop', order_id='2')
+
+        self.assertEqual(backfill_order_accounts(), (0, ['Porsa', 'Unknown shop']))
+        self.assertFalse(WooCommerceOrder.objects.filter(account__isnull=False).exists())
+
+    def test_job_configuration_resolves_name(self):
+        """A job synced for the client name links it even when the account is named differently"""
+        config = AccountConfiguration.objects.create(account=self.account, config_type='woocommerce')
+        job = WooCommerceJob.objects.create(
+            client_name='Porsa - woocommerce', job_type='incremental_sync', scheduled_at=timezone.now(),
+            account_configuration=config,
+        )
+        order = make_order(client_name='Porsa - woocommerce')
+
+        self.assertEqual(backfill_job_accounts(), 1)
+        self.assertEqual(backfill_order_accounts(), (1, []))
+        job.refresh_from_db()
+        order.refresh_from_db()
+        self.assertEqual((job.account, order.account), (self.account, self.account))
+
+    def test_backfill_with_historical_models(self):
+        make_order()
+        apps = MigrationExecutor(connection).loader.project_state(
+            ('woocommerce', '0016_backfill_order_accounts')
+        ).apps
+        self.assertEqual(backfill_order_accounts(apps=apps), (1, []))
+
+    def test_linked_orders_relink_their_rollup(self):
+        make_order()
+        refresh_daily_rollup('Porsa', {date(2025, 1, 15)})
+        self.assertIsNone(WooCommerceDailyRollup.objects.get().account_id)
+
+        backfill_order_accounts()
+        self.assertEqual(WooCommerceDailyRollup.objects.get().account_id, self.account.id)
+
+
+class AccountScopeTests(TestCase):
+    """Views scope orders and the rollup by account, and unlinked rows by client name"""
+
+    def setUp(self):
+        cache.clear()  # analytics responses are cached per user id
+        self.user, account = make_tenant()
+        _, other = make_tenant('Other')
+        recent = timezone.now() - timedelta(days=1)
+        for order_id, client_name, order_account in (
+            ('1', 'Porsa - woocommerce', account),
+            ('2', 'Porsa', None),  # the account backfill couldn't resolve it
+            ('3', 'Porsa', other),
+            ('4', 'Other', None),
+        ):
+            make_order(client_name=client_name, order_id=order_id, account=order_account,
+                       order_date=recent + timedelta(minutes=int(order_id)))
+        rebuild_daily_rollup()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def exported_order_ids(self, **params):
+        response = self.client.get('/api/woocommerce/orders/export/', {'report': 'orders', 'period': 7, **params})
+        return sorted(row[0] for row in csv.reader(b''.join(response.streaming_content).decode().splitlines()[1:]))
+
+    def test_orders(self):
+        self.assertEqual(self.exported_order_ids(), ['1', '2'])
+        self.assertEqual(self.exported_order_ids(client_name='porsa'), ['1', '2'])
+        self.assertEqual(self.exported_order_ids(client_name='Other'), [])
+
+    def test_rollup(self):
+        self.assertEqual(
+            set(WooCommerceDailyRollup.objects.values_list('client_name', 'account__name')),
+            {('Porsa - woocommerce', 'Porsa'), ('Porsa', None), ('Porsa', 'Other'), ('Other', None)},
+        )
+        for params in ({}, {'client_name': 'porsa'}):
+            response = self.client.get('/api/woocommerce/orders/analytics/', {'period': 7, **params})
+            self.assertEqual(response.data['overview']['total_orders'], 2)
+
+
+class CustomerAcquisitionTests(TestCase):
+    def test_summary_classifies_orders_by_previous_order(self):
+        end = timezone.make_aware(datetime(2025, 3, 31, 23, 0))
+        start = end - timedelta(days=30)
+        previous_start = start - timedelta(days=30)
+
+        def order(order_id, email, when, total='100.00'):
+            make_order(order_id=order_id, billing_email=email, order_date=when, order_total=total)
+
+        # New: first order ever
+        order('1', 'new@example.com', timezone.make_aware(datetime(2025, 3, 10)), '300.00')
+        # Returning: ordered in the previous period (new then)
+        order('2', 'back@example.com', timezone.make_aware(datetime(2025, 2, 10)))
+        order('3', 'back@example.com', timezone.make_aware(datetime(2025, 3, 10)))
+        # New again: the previous order is older than the window
+        order('4', 'lapsed@example.com', timezone.make_aware(datetime(2023, 1, 1)))
+        order('5', 'lapsed@example.com', timezone.make_aware(datetime(2025, 3, 11)), '50.00')
+        # No email: not a customer
+        order('6', '', timezone.make_aware(datetime(2025, 3, 10)))
+
+        summary = customer_acquisition_summary(
+            WooCommerceOrder.objects.all(), start, end, 365, previous_start=previous_start
+        )
+
+        self.assertEqual(summary['customers'], {'new': 2, 'returning': 1, 'previous_new': 1})
+        self.assertEqual(summary['daily'], [
+            {'date': '2025-03-10', 'new_customers': 1, 'revenue': 300.0, 'orders': 1,
+             'returning_orders': 1, 'returning_revenue': 100.0},
+            {'date': '2025-03-11', 'new_customers': 1, 'revenue': 50.0, 'orders': 1,
+             'returning_orders': 0, 'returning_revenue': 0.0},
+        ])
+        self.assertEqual(
+            [(customer['email'], customer['total_spent'], customer['orders']) for customer in summary['top_new_customers']],
+            [('new@example.com', 300.0, 1), ('lapsed@example.com', 50.0, 1)],
+        )
+        self.assertEqual(summary['top_new_customers'][0]['first_order_date'], '2025-03-10T00:00:00+00:00')
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()  # analytics responses are cached per user id
+        def row(day, status, method, orders, revenue, client_name='Porsa'):
+            WooCommerceDailyRollup.objects.create(
+                client_name=client_name, date=day, status=status, payment_method=method,
+                order_count=orders, revenue=Decimal(revenue),
+            )
+
+        row(date(2025, 1, 1), 'completed', 'stripe', 2, '200.00')
+        row(date(2025, 1, 10), 'completed', 'stripe', 3, '300.00')
+        row(date(2025, 1, 10), 'completed', 'mobilepay', 1, '50.00')
+        row(date(2025, 1, 11), 'cancelled', '', 1, '10.00')
+        row(date(2025, 1, 11), 'completed', 'stripe', 9, '900.00', client_name='Other')
+
+    def test_period_kpis(self):
+        rollup = WooCommerceDailyRollup.objects.filter(client_name='Porsa')
+        self.assertEqual(period_kpis(rollup, date(2025, 1, 5), date(2024, 12, 31)), {
+            'orders': 5, 'revenue': Decimal('360.00'), 'completed_orders': 4,
+            'prev_orders': 2, 'prev_revenue': Decimal('200.00'),
+        })
+
+    def test_period_breakdowns(self):
+        breakdowns = period_breakdowns(WooCommerceDailyRollup.objects.filter(client_name='Porsa', date__gte=date(2025, 1, 5)))
+
+        self.assertEqual(breakdowns['daily_trends'], [
+            {'date': date(2025, 1, 10), 'orders': 4, 'revenue': Decimal('350.00')},
+            {'date': date(2025, 1, 11), 'orders': 1, 'revenue': Decimal('10.00')},
+        ])
+        self.assertEqual(breakdowns['status_breakdown'], [
+            {'status': 'completed', 'count': 4, 'revenue': Decimal('350.00')},
+            {'status': 'cancelled', 'count': 1, 'revenue': Decimal('10.00')},
+        ])
+        self.assertEqual(breakdowns['payment_methods'], [
+            {'payment_method': 'stripe', 'count': 3, 'revenue': Decimal('300.00')},
+            {'payment_method': 'mobilepay', 'count': 1, 'revenue': Decimal('50.00')},
+        ])
+
+    def test_analytics_endpoint_reads_the_users_rollup(self):
+        user, account = make_tenant()
+        client = APIClient()
+        client.force_authenticate(user)
+        today = timezone.localdate()
+        for client_name, status, orders in (('Porsa', 'completed', 3), ('Porsa', 'cancelled', 1), ('Other', 'completed', 9)):
+            WooCommerceDailyRollup.objects.create(
+                client_name=client_name, date=today, status=status, order_count=orders, revenue=Decimal(orders * 10),
+            )
+
+        response = client.get('/api/woocommerce/orders/analytics/', {'period': 7})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['overview']['total_orders'], 4)
+        self.assertEqual(response.data['overview']['completion_rate'], 75.0)
+        self.assertEqual([item['status'] for item in response.data['breakdowns']['status']], ['completed', 'cancelled'])
+        self.assertEqual(response.data['trends']['daily'], [{'date': today.isoformat(), 'orders': 4, 'revenue': 40.0}])
+
+
+class SyncLogBufferTests(TestCase):
+    def test_records_wait_for_a_full_buffer(self):
+        log = SyncLogBuffer('Porsa', max_records=3, max_age=60)
+        log('INFO', 'page 1')
+        log('INFO', 'page 2')
+        self.assertEqual(WooCommerceSyncLog.objects.count(), 0)
+
+        log('INFO', 'page 3')
+        self.assertEqual(
+            list(WooCommerceSyncLog.objects.order_by('id').values_list('message', flat=True)),
+            ['page 1', 'page 2', 'page 3'],
+        )
+
+    def test_error_flushes_straight_away(self):
+        log = SyncLogBuffer('Porsa', max_records=100, max_age=60)
+        log('INFO', 'page 1')
+        log('ERROR', 'page 2 failed', {'page': 2})
+        self.assertEqual(WooCommerceSyncLog.objects.count(), 2)
+
+    def test_context_manager_flushes_the_rest(self):
+        with SyncLogBuffer('Porsa', max_records=100, max_age=60) as log:
+            log('INFO', 'done')
+        self.assertEqual(WooCommerceSyncLog.objects.get().message, 'done')
+
+    def test_failed_bulk_insert_keeps_error_records(self):
+        log = SyncLogBuffer('Porsa', max_records=100, max_age=60)
+        log('INFO', 'page 1')
+        with patch.object(WooCommerceSyncLog.objects, 'bulk_create', side_effect=RuntimeError('db down')):
+            log('ERROR', 'page 2 failed', {'page': 2})
+
+        error = WooCommerceSyncLog.objects.get()
+        self.assertEqual((error.level, error.message, error.details), ('ERROR', 'page 2 failed', {'page': 2}))
+        self.assertEqual(log.records, [])
+
+
+class CurrencyCacheTests(TestCase):
+    def setUp(self):
+        _, self.account = make_tenant()
+        self.company = self.account.company
+        self.company.currency_code = 'EUR'
+        self.company.save()
+
+    def test_company_change_invalidates_its_accounts(self):
+        self.assertEqual(configured_currency('Porsa - woocommerce'), 'EUR')
+        self.company.currency_code = 'SEK'
+        self.company.save()
+        self.assertEqual(configured_currency('Porsa'), 'SEK')
+
+    def test_rename_invalidates_old_and_new_name(self):
+        self.assertEqual(configured_currency('Porsa'), 'EUR')
+        # Cached as "no currency" before the account takes the name
+        self.assertEqual(configured_currency('PorsaNordic'), '')
+
+        self.account.name = 'PorsaNordic'
+        self.account.save()
+
+        self.assertEqual(configured_currency('PorsaNordic'), 'EUR')
+        self.assertEqual(configured_currency('Porsa'), '')
+
+
+def order_payload(order_id, email='anna@example.com', modified='2025-01-15T12:00:00', items=('Sko',), **fields):
+    """A WooCommerce REST API order as the sync receives it"""
+    return {
+        'id': order_id,
+        'number': str(order_id),
+        'status': 'completed',
+        'date_created': '2025-01-15T12:00:00',
+        'date_modified': modified,
+        'total': '100.00',
+        'currency': 'DKK',
+        'billing': {'email': email, 'first_name': 'Anna'},
+        'shipping': {},
+        'meta_data': [],
+        'line_items': [
+            {'product_id': i, 'name': name, 'quantity': 1, 'price': '100.00', 'total': '100.00'}
+            for i, name in enumerate(items, 1)
+        ],
+        **fields
+    }
+
+
+class OrderUpsertTests(TestCase):
+    def setUp(self):
+        _, account = make_tenant()
+        self.config = AccountConfiguration.objects.create(account=account, config_type='woocommerce')
+
+    def test_batch_creates_updates_and_skips(self):
+        counts = upsert_woocommerce_orders(self.config, [order_payload(1), order_payload(2, email='bo@example.com')])
+        self.assertEqual(counts, {'processed': 2, 'created': 2, 'updated': 0, 'skipped': 0})
+
+        counts = upsert_woocommerce_orders(self.config, [
+            order_payload(1),  # unchanged
+            order_payload(2, email='bo@example.com', modified='2025-01-16T08:00:00', status='refunded', items=('Hat', 'Sok')),
+            order_payload(3),  # returning customer
+        ])
+        self.assertEqual(counts, {'processed': 2, 'created': 1, 'updated': 1, 'skipped': 1})
+
+        orders = {order.order_id: order for order in WooCommerceOrder.objects.filter(client_name='Porsa')}
+        self.assertEqual(orders['2'].status, 'refunded')
+        self.assertEqual(orders['2'].account_id, self.config.account_id)
+        self.assertEqual(
+            sorted(WooCommerceOrderItem.objects.filter(order=orders['2']).values_list('product_name', flat=True)),
+            ['Hat', 'Sok'],
+        )
+        self.assertEqual(
+            {order_id: order.is_new_customer for order_id, order in orders.items()},
+            {'1': True, '2': True, '3': False},
+        )
+        self.assertEqual(orders['1'].channel_type, 'Direct')
+
+    def test_duplicate_ids_in_a_page_keep_the_last(self):
+        counts = upsert_woocommerce_orders(self.config, [order_payload(1), order_payload(1, status='cancelled')])
+        self.assertEqual(counts['processed'], 1)
+        self.assertEqual(WooCommerceOrder.objects.get().status, 'cancelled')
+
+    def test_row_by_row_fallback_matches_the_batch(self):
+        """process_woocommerce_order, the fallback for a failed batch, stores the same order"""
+        order, created = process_woocommerce_order(self.config, order_payload(1))
+        self.assertTrue(created)
+        self.assertTrue(order.is_new_customer)
+
+        order, created = process_woocommerce_order(self.config, order_payload(1, status='refunded', items=('Hat',)))
+        self.assertFalse(created)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.account_id), ('refunded', self.config.account_id))
+        self.assertEqual(list(order.items.values_list('product_name', flat=True)), ['Hat'])
+
+    def test_failed_batch_falls_back_to_order_by_order(self):
+        """A page whose batch upsert fails is saved order by order; the bad order is logged"""
+        page = [order_payload(1), order_payload(2, total='not a number')]
+        with patch('woocommerce.tasks.iter_woocommerce_order_pages', return_value=iter([(1, page)])), \
+                patch('woocommerce.tasks.upsert_woocommerce_orders', side_effect=RuntimeError('deadlock')):
+            sync_woocommerce_config(self.config.id)
+
+        self.assertEqual(list(WooCommerceOrder.objects.values_list('order_id', flat=True)), ['1'])
+        job = WooCommerceJob.objects.get()
+        self.assertEqual((job.orders_processed, job.orders_created), (1, 1))
+        self.assertTrue(WooCommerceSyncLog.objects.filter(job=job, level='ERROR', details__order_id=2).exists())
+
+
+class IncrementalSyncTests(TestCase):
+    def setUp(self):
+        _, account = make_tenant()
+        self.config = AccountConfiguration.objects.create(account=account, config_type='woocommerce')
+        self.mark = timezone.make_aware(datetime(2025, 1, 10))
+        WooCommerceSyncState.objects.create(account_configuration=self.config, orders_modified_after=self.mark)
+
+    def sync(self, pages, batch_error=None):
+        """Run an incremental sync over *pages*; returns the page fetch call"""
+        with patch('woocommerce.tasks.iter_woocommerce_order_pages', return_value=iter(pages)) as fetch, \
+                patch('woocommerce.tasks.upsert_woocommerce_orders', side_effect=batch_error,
+                      wraps=upsert_woocommerce_orders):
+            sync_woocommerce_config(self.config.id, 'incremental_sync')
+        return fetch.call_args
+
+    def test_window_overlaps_the_mark_and_advances_it(self):
+        call = self.sync([(1, [order_payload(1, date_modified_gmt='2025-01-20T08:00:00')])])
+
+        self.assertEqual(call.args[1], self.mark - INCREMENTAL_SYNC_OVERLAP)
+        self.assertTrue(call.kwargs['by_modified'])
+        self.assertEqual(
+            WooCommerceSyncState.objects.get().orders_modified_after,
+            timezone.make_aware(datetime(2025, 1, 20, 8, 0)),
+        )
+
+    def test_failed_order_stays_in_the_next_window(self):
+        page = [
+            order_payload(1, date_modified_gmt='2025-01-20T08:00:00'),
+            order_payload(2, date_modified_gmt='2025-01-15T08:00:00', total='not a number'),
+        ]
+        self.sync([(1, page)], batch_error=RuntimeError('deadlock'))
+
+        failed_at = timezone.make_aware(datetime(2025, 1, 15, 8, 0))
+        self.assertFalse(WooCommerceOrder.objects.filter(order_id='2').exists())
+        self.assertEqual(WooCommerceSyncState.objects.get().orders_modified_after, failed_at)
+
+        call = self.sync([])
+        self.assertLess(call.args[1], failed_at)
+
+
+class ResumeSyncTests(TestCase):
+    def setUp(self):
+        _, account = make_tenant()
+        self.config = AccountConfiguration.objects.create(account=account, config_type='woocommerce')
+
+    def test_resume_continues_after_the_last_committed_page(self):
+        def crash_after_two_pages(*args, **kwargs):
+            yield 1, [order_payload(1), order_payload(2)]
+            yield 2, [order_payload(3)]
+            raise WooCommerceAPIError('502 from the store')
+
+        with patch('woocommerce.tasks.iter_woocommerce_order_pages', side_effect=crash_after_two_pages):
+            self.assertFalse(sync_woocommerce_config(self.config.id)['success'])
+
+        job = WooCommerceJob.objects.get()
+        self.assertEqual((job.status, job.last_page_committed, job.orders_processed), ('failed', 2, 3))
+
+        with patch('woocommerce.tasks.iter_woocommerce_order_pages', return_value=iter([(3, [order_payload(4)])])) as fetch:
+            result = resume_woocommerce_job(job.id)
+
+        self.assertEqual(fetch.call_args.kwargs['start_page'], 3)
+        self.assertEqual((fetch.call_args.args[1], fetch.call_args.args[2]), (job.range_start, job.range_end))
+        self.assertEqual((result['orders_processed'], result['orders_created']), (4, 4))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_page_committed, job.orders_processed), ('completed', 3, 4))
+        self.assertEqual(WooCommerceJob.objects.count(), 1)
+
+    def test_running_job_is_not_resumed(self):
+        job = WooCommerceJob.objects.create(
+            client_name='Porsa', account_configuration=self.config, job_type='daily_sync', status='running',
+            scheduled_at=timezone.now(), range_start=timezone.now() - timedelta(days=30), range_end=timezone.now(),
+            last_page_committed=4,
+        )
+        with patch('woocommerce.tasks.iter_woocommerce_order_pages') as fetch:
+            self.assertEqual(resume_woocommerce_job(job.id)['error'], 'Job is still running')
+            # A second resume queued while the first one runs loses the claim
+            self.assertFalse(sync_woocommerce_config(self.config.id, resume_job_id=job.id)['success'])
+
+        fetch.assert_not_called()
+
+
+class FakeResponse:
+    def __init__(self, rows, total_pages=None, status_code=200):
+        self.rows = rows
+        self.status_code = status_code
+        self.content = b'x' * len(rows)
+        self.text = ''
+        self.headers = {'X-WP-TotalPages': str(total_pages)} if total_pages else {}
+
+    def json(self):
+        return self.rows
+
+
+class WooCommerceClientTests(TestCase):
+    def client_with_pages(self, pages, total_pages=None, max_workers=3, delays=None):
+        """A client whose session serves ``pages`` ({page: rows}); records the order requests finish in"""
+        client = WooCommerceClient('https://porsa.dk', 'ck', 'cs', max_workers=max_workers)
+        client.finished = []
+        lock = threading.Lock()
+
+        def get(url, params, timeout):
+            page = params['page']
+            time.sleep((delays or {}).get(page, 0))
+            with lock:
+                client.finished.append(page)
+            return FakeResponse(pages.get(page, []), total_pages)
+
+        client.session.get = get
+        return client
+
+    def test_concurrent_pages_yield_in_order(self):
+        pages = {page: [{'id': page}] for page in (1, 2, 3, 4)}
+        client = self.client_with_pages(pages, total_pages=4, delays={2: 0.2})
+
+        self.assertEqual([page for page, _ in client.iter_pages('orders', {})], [1, 2, 3, 4])
+        self.assertLess(client.finished.index(3), client.finished.index(2))
+        self.assertEqual((client.total_pages, client.bytes_fetched), (4, 4))
+
+    def test_missing_total_pages_falls_back_to_serial(self):
+        full_page = [{'id': i} for i in range(PER_PAGE)]
+        client = self.client_with_pages({1: full_page, 2: full_page, 3: [{'id': 0}]})
+
+        self.assertEqual([page for page, _ in client.iter_pages('orders', {})], [1, 2, 3])
+        self.assertEqual(client.finished, [1, 2, 3])  # stops after the short page
+        self.assertIsNone(client.total_pages)
+
+    def test_pages_beyond_100(self):
+        client = self.client_with_pages({page: [{'id': page}] for page in range(1, 106)}, total_pages=105, max_workers=8)
+        pages = [page for page, _ in client.iter_pages('orders', {}, start_page=3)]
+        self.assertEqual(pages, list(range(3, 106)))
+
+    def test_error_page_raises(self):
+        client = self.client_with_pages({1: [{'id': 1}]}, total_pages=2)
+        client.session.get = lambda url, params, timeout: FakeResponse([], status_code=503)
+        with self.assertRaises(WooCommerceAPIError):
+            list(client.iter_pages('orders', {}))
+
+    def test_session_retries_with_backoff(self):
+        client = WooCommerceClient('https://porsa.dk/', 'ck', 'cs', max_workers=4, retries=5)
+        adapter = client.session.get_adapter('https://porsa.dk/wp-json/wc/v3/orders')
+        retry = adapter.max_retries
+
+        self.assertEqual(client.base_url, 'https://porsa.dk/wp-json/wc/v3')
+        self.assertEqual((retry.total, retry.backoff_factor), (5, 1))
+        self.assertTrue(retry.respect_retry_after_header)
+        self.assertTrue({429, 503} <= set(retry.status_forcelist))
+        self.assertEqual(adapter._pool_maxsize, 4)
+
+
+def baseline_subscribers(orders, start_date, end_date, min_purchases=2, reorder_window=35,
+                         churn_multiplier=1.5, at_risk_days=7):
+    """The per-order subscriber detection detect_subscribers replaced, kept as the reference"""
+    customer_product_orders = defaultdict(list)
+    for order in orders.exclude(billing_email__isnull=True).exclude(billing_email='').prefetch_related('items'):
+        for item in order.items.all():
+            key = (order.billing_email.lower(), item.product_id, item.product_name)
+            customer_product_orders[key].append({
+                'date': order.date_created or order.order_date, 'total': float(item.total_price),
+            })
+
+    subscribers = []
+    for (email, product_id, product_name), orders_list in customer_product_orders.items():
+        if len(orders_list) < min_purchases:
+            continue
+        orders_list.sort(key=lambda x: x['date'] if x['date'] else timezone.now())
+        intervals = [
+            (later['date'] - earlier['date']).days for earlier, later in zip(orders_list, orders_list[1:])
+            if later['date'] and earlier['date'] and (later['date'] - earlier['date']).days > 0
+        ]
+        avg_interval = sum(intervals) / len(intervals) if intervals else reorder_window
+        last_order_date = orders_list[-1]['date']
+        days_since_last = (end_date - last_order_date).days
+        expected_interval = avg_interval if avg_interval > 0 else reorder_window
+        if days_since_last > expected_interval * churn_multiplier:
+            status = 'churned'
+        elif days_since_last > expected_interval - at_risk_days:
+            status = 'at_risk'
+        else:
+            status = 'active'
+        subscription_start_date = orders_list[min_purchases - 1]['date']
+        subscribers.append({
+            'email': email,
+            'product_id': product_id,
+            'product_name': product_name,
+            'total_orders': len(orders_list),
+            'total_revenue': sum(o['total'] for o in orders_list),
+            'first_order_date': orders_list[0]['date'],
+            'last_order_date': last_order_date,
+            'avg_interval_days': round(avg_interval, 1),
+            'days_since_last_order': days_since_last,
+            'status': status,
+            'is_new_subscriber': bool(subscription_start_date and subscription_start_date >= start_date),
+        })
+    return subscribers
+
+
+class SubscriberDetectionTests(TestCase):
+    def test_single_pass_matches_the_per_order_detection(self):
+        """Interleaved customers and products, mixed-case emails and one-off purchases"""
+        first = timezone.make_aware(datetime(2025, 1, 1, 9, 0))
+        purchases = [
+            # (billing email, days after first, products bought)
+            ('anna@example.com', 0, [('10', 'Kaffe'), ('20', 'Filter')]),
+            ('bo@example.com', 1, [('10', 'Kaffe')]),
+            ('Anna@Example.com', 30, [('10', 'Kaffe')]),
+            ('cleo@example.com', 31, [('20', 'Filter')]),
+            ('bo@example.com', 33, [('20', 'Filter'), ('10', 'Kaffe')]),
+            ('anna@example.com', 58, [('10', 'Kaffe'), ('20', 'Filter')]),
+            ('bo@example.com', 70, [('10', 'Kaffe')]),
+            ('anna@example.com', 58, [('10', 'Kaffe Extra')]),
+            ('', 60, [('10', 'Kaffe')]),
+            ('bo@example.com', 80, [('10', 'Kaffe')]),
+        ]
+        for order_id, (email, days, items) in enumerate(purchases, 1):
+            order = make_order(order_id=str(order_id), billing_email=email, order_date=first + timedelta(days=days))
+            for product_id, name in items:
+                WooCommerceOrderItem.objects.create(
+                    order=order, product_id=product_id, product_name=name, quantity=1,
+                    unit_price=Decimal('50.00'), total_price=Decimal(f'{40 + order_id}.00'),
+                )
+
+        start_date, end_date = first + timedelta(days=45), first + timedelta(days=90)
+        orders = WooCommerceOrder.objects.all()
+
+        def by_key(subscribers):
+            return sorted(subscribers, key=itemgetter('email', 'product_id', 'product_name'))
+
+        expected = by_key(baseline_subscribers(orders, start_date, end_date))
+        self.assertEqual(by_key(detect_subscribers(purchase_rows(orders), start_date, end_date)), expected)
+        self.assertEqual(
+            [(s['email'], s['product_name'], s['total_orders'], s['status']) for s in expected],
+            [('anna@example.com', 'Kaffe', 3, 'at_risk'), ('anna@example.com', 'Filter', 2, 'active'),
+             ('bo@example.com', 'Kaffe', 4, 'active')],
+        )
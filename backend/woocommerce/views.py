@@ -2,16 +2,19 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
 from django.db import models
-from django.db.models import Count, Sum, Avg, Q, Min, Max, Subquery, OuterRef
+from django.db.models import Count, Sum, Avg, Q, Min, Max
 from django.db.models.functions import TruncDate, TruncMonth, TruncWeek, ExtractHour
-from users.models import AccountConfiguration, Account
+from users.models import AccountConfiguration
+from users.scope import matching_account_ids, scope_to_accounts, scope_to_accounts_or_names, scope_to_client_names
 from users.serializers import AccountConfigurationSerializer
 from .models import (
     WooCommerceJob, 
     WooCommerceOrder,
+    WooCommerceDailyRollup,
     WooCommerceSyncLog,
     ChannelClassification
 )
@@ -21,67 +24,34 @@ from .serializers import (
     WooCommerceSyncLogSerializer,
     ChannelClassificationSerializer
 )
-from .tasks import sync_woocommerce_config
+from .tasks import sync_woocommerce_config, resume_woocommerce_job, reclassify_woocommerce_orders
+from .acquisition import customer_acquisition_summary
+from .currency import get_currency_for_client
+from .dashboard import period_breakdowns, period_kpis
+from .export import (
+    CHANNEL_EXPORT_COLUMNS,
+    EXPORT_CONTENT_TYPES,
+    ORDER_CSV_HEADER,
+    ORDER_EXPORT_COLUMNS,
+    channel_export_rows,
+    order_export_rows,
+    parquet_available,
+    stream_csv,
+    stream_parquet
+)
+from .analytics_cache import bump_client_version, cache_metrics, cached_analytics
+from .attribution import (
+    attribution_groups,
+    channel_performance,
+    extract_traffic_source,
+    load_classification_map,
+    unclassified_sources
+)
+from .rollups import order_rollup_day, refresh_order_rollups
+from .subscriptions import detect_subscribers, purchase_rows
 import json
 
 
-def _get_user_accounts(user):
-    """Return Account queryset scoped to the user's role/company."""
-    if user.role == 'super_admin':
-        return Account.objects.all()
-    if user.role in ['agency_admin', 'agency_user']:
-        return Account.objects.filter(company__agency=user.agency)
-    if user.role in ['company_admin', 'company_user']:
-        return Account.objects.filter(company=user.company)
-    return Account.objects.none()
-
-
-def get_currency_for_client(client_name, orders_queryset=None):
-    """
-    Determine the currency code for a client.
-    Priority: 1) Company currency, 2) WooCommerce config currency, 3) First order currency, 4) USD default
-    """
-    currency_code = 'DKK'
-
-    # Normalize client name
-    base_client_name = (client_name or '').split(' - ')[0].strip() if client_name else ''
-
-    # 1) Prefer company-level currency
-    if base_client_name and base_client_name != 'all':
-        try:
-            acc = Account.objects.filter(name__iexact=base_client_name).select_related('company').first()
-            if acc and acc.company and hasattr(acc.company, 'currency_code') and acc.company.currency_code:
-                return acc.company.currency_code
-        except Exception:
-            pass
-
-    # 2) Prefer client-level currency from active WooCommerce config
-    if base_client_name and base_client_name != 'all':
-        try:
-            cfg = AccountConfiguration.objects.filter(
-                account__name__iexact=base_client_name,
-                config_type='woocommerce',
-                is_active=True
-            ).first()
-            if cfg:
-                code = cfg.get_config('currency_code') or cfg.get_config('currency')
-                if code:
-                    return code
-        except Exception:
-            pass
-
-    # 3) Fallback to first order currency in the queryset
-    if orders_queryset is not None:
-        try:
-            first_currency = orders_queryset.exclude(currency__isnull=True).exclude(currency='').values_list('currency', flat=True).first()
-            if first_currency:
-                return first_currency
-        except Exception:
-            pass
-
-    return currency_code
-
-
 class WooCommerceConfigViewSet(viewsets.ReadOnlyModelViewSet):
     """API endpoint for managing WooCommerce configurations"""
     queryset = AccountConfiguration.objects.filter(config_type='woocommerce')
@@ -90,12 +60,8 @@ class WooCommerceConfigViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         """Restrict configs to those the current user can access."""
-        user = self.request.user
         base_qs = AccountConfiguration.objects.filter(config_type='woocommerce')
-        if user.role == 'super_admin':
-            return base_qs
-        accounts = _get_user_accounts(user)
-        return base_qs.filter(account__in=accounts)
+        return scope_to_accounts(base_qs, self.request.user)
 
     @action(detail=True, methods=['post'])
     def test_connection(self, request, pk=None):
@@ -163,16 +129,15 @@ class WooCommerceJobViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = WooCommerceJob.objects.all()
-
-        if user.role != 'super_admin':
-            allowed_names = list(_get_user_accounts(user).values_list('name', flat=True))
-            queryset = queryset.filter(client_name__in=allowed_names)
+        # Jobs without a configuration can't be linked to an account: match those by name
+        queryset = scope_to_accounts_or_names(WooCommerceJob.objects.all(), self.request.user)
 
         client_name = self.request.query_params.get('client_name')
         if client_name:
-            queryset = queryset.filter(client_name__icontains=client_name)
+            queryset = queryset.filter(
+                Q(account__in=matching_account_ids(self.request.user, client_name)) |
+                Q(account__isnull=True, client_name__icontains=client_name.strip())
+            )
         return queryset.order_by('-created_at')
     
     @action(detail=True, methods=['post'])
@@ -195,6 +160,24 @@ class WooCommerceJobViewSet(viewsets.ReadOnlyModelViewSet):
                 'message': 'Job cannot be cancelled (not running)'
             }, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=['post'])
+    def resume(self, request, pk=None):
+        """Resume a failed or cancelled job from its last committed page"""
+        job = self.get_object()
+        
+        if job.status in ('failed', 'cancelled') and job.account_configuration_id:
+            task = resume_woocommerce_job.delay(job.id)
+            return Response({
+                'success': True,
+                'message': f'Resuming job from page {job.last_page_committed + 1}',
+                'task_id': task.id
+            })
+        else:
+            return Response({
+                'success': False,
+                'message': 'Job cannot be resumed (only failed or cancelled jobs with a configuration)'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
 
 class ChannelClassificationViewSet(viewsets.ModelViewSet):
     """ViewSet for managing channel classification rules"""
@@ -227,6 +210,21 @@ class ChannelClassificationViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('channel_type', 'source')
 
+    def perform_create(self, serializer):
+        rule = serializer.save()
+        reclassify_woocommerce_orders.delay([[rule.source.lower(), rule.medium.lower()]])
+
+    def perform_update(self, serializer):
+        # Orders matching the rule's previous source/medium need re-resolving too
+        previous = [serializer.instance.source.lower(), serializer.instance.medium.lower()]
+        rule = serializer.save()
+        reclassify_woocommerce_orders.delay([previous, [rule.source.lower(), rule.medium.lower()]])
+
+    def perform_destroy(self, instance):
+        pair = [instance.source.lower(), instance.medium.lower()]
+        instance.delete()
+        reclassify_woocommerce_orders.delay([pair])
+
 class WooCommerceOrderViewSet(viewsets.ModelViewSet):
     """ViewSet for WooCommerce orders with analytics capabilities"""
     
@@ -235,18 +233,57 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        user = self.request.user
-        queryset = WooCommerceOrder.objects.all()
-
-        if user.role != 'super_admin':
-            allowed_names = list(_get_user_accounts(user).values_list('name', flat=True))
-            queryset = queryset.filter(client_name__in=allowed_names)
+        queryset = scope_to_accounts_or_names(WooCommerceOrder.objects.all(), self.request.user)
 
         client_name = self.request.query_params.get('client_name')
         if client_name:
-            queryset = queryset.filter(client_name__icontains=client_name)
+            queryset = self.filter_client(queryset, client_name)
+
+        # The serializer exposes the address/user agent payload columns
+        if self.action in ['list', 'retrieve', 'create', 'update', 'partial_update']:
+            queryset = queryset.with_payload('billing_address', 'shipping_address', 'customer_user_agent')
         return queryset.order_by('-date_created')
 
+    def filter_client(self, queryset, client_name):
+        """
+        Orders (or rollup rows) of the user's accounts whose name contains
+        ``client_name``; rows not linked to an account yet match on their
+        client name
+        """
+        return queryset.filter(
+            Q(account__in=matching_account_ids(self.request.user, client_name)) |
+            Q(account__isnull=True, client_name__icontains=client_name.strip())
+        )
+
+    def get_rollup_queryset(self):
+        """Daily rollup rows for the accounts the user may see"""
+        queryset = scope_to_accounts_or_names(WooCommerceDailyRollup.objects.all(), self.request.user)
+
+        client_name = self.request.query_params.get('client_name')
+        if client_name:
+            queryset = self.filter_client(queryset, client_name)
+        return queryset
+
+    def perform_create(self, serializer):
+        order = serializer.save()
+        refresh_order_rollups(order_rollup_day(order))
+        bump_client_version(order.client_name)
+
+    def perform_update(self, serializer):
+        # The order may have moved to another day (or client): refresh both
+        previous = order_rollup_day(serializer.instance)
+        previous_client = serializer.instance.client_name
+        order = serializer.save()
+        refresh_order_rollups(previous, order_rollup_day(order))
+        for client_name in {previous_client, order.client_name}:
+            bump_client_version(client_name)
+
+    def perform_destroy(self, instance):
+        day = order_rollup_day(instance)
+        instance.delete()
+        refresh_order_rollups(day)
+        bump_client_version(instance.client_name)
+
     @action(detail=False, methods=['get'])
     def client_names(self, request):
         """Get distinct client names from orders for dropdown filtering"""
@@ -265,28 +302,49 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         ])
 
     @action(detail=False, methods=['get'])
+    def cache_metrics(self, request):
+        """Hit/miss counts of the analytics response cache (all clients, so super admins only)"""
+        if request.user.role != 'super_admin':
+            return Response(
+                {'error': 'Only super admins can read cache metrics'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        try:
+            return Response({'endpoints': cache_metrics()})
+        except Exception as e:
+            return Response(
+                {'error': f'Failed to read cache metrics: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    @action(detail=False, methods=['get'])
+    @cached_analytics()
     def stats(self, request):
         """Get order statistics"""
         client_name = request.GET.get('client_name') if hasattr(request, 'GET') else getattr(request, 'query_params', {}).get('client_name')
         queryset = self.get_queryset()
         
         if client_name:
-            queryset = queryset.filter(client_name__icontains=client_name)
+            queryset = self.filter_client(queryset, client_name)
         
-        total_orders = queryset.count()
-        total_revenue = queryset.aggregate(
-            total=models.Sum('total')
-        )['total'] or 0
+        rollup = self.get_rollup_queryset()
         
-        # Orders by status
-        status_counts = queryset.values('status').annotate(
-            count=models.Count('id')
+        recent_start = (timezone.now() - timedelta(days=30)).date()
+        totals = rollup.aggregate(
+            orders=Sum('order_count'),
+            revenue=Sum('revenue'),
+            recent=Sum('order_count', filter=Q(date__gte=recent_start))
         )
+        total_orders = totals['orders'] or 0
+        total_revenue = totals['revenue'] or 0
+        
+        # Orders by status
+        status_counts = rollup.values('status').annotate(
+            count=Sum('order_count')
+        ).order_by()
         
         # Recent orders (last 30 days)
-        recent_orders = queryset.filter(
-            date_created__gte=timezone.now() - timedelta(days=30)
-        ).count()
+        recent_orders = totals['recent'] or 0
         
         # Resolve currency for this client
         currency_code = get_currency_for_client(client_name, queryset)
@@ -300,6 +358,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         })
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def analytics(self, request):
         """Get comprehensive analytics dashboard data"""
         client_name = request.GET.get('client_name') if hasattr(request, 'GET') else getattr(request, 'query_params', {}).get('client_name')
@@ -307,98 +366,71 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         
         queryset = self.get_queryset()
         if client_name:
-            queryset = queryset.filter(client_name__icontains=client_name)
+            queryset = self.filter_client(queryset, client_name)
+        
+        rollup = self.get_rollup_queryset()
         
-        # Date range for analysis
+        # Date range for analysis, aligned to whole days to match the daily rollup
         end_date = timezone.now()
-        start_date = end_date - timedelta(days=period)
+        start_date = (end_date - timedelta(days=period)).replace(hour=0, minute=0, second=0, microsecond=0)
+        prev_start = start_date - timedelta(days=period)
         period_orders = queryset.filter(date_created__gte=start_date)
+        period_rollup = rollup.filter(date__gte=start_date.date())
         
-        # Basic metrics
-        total_orders = period_orders.count()
-        total_revenue = period_orders.aggregate(Sum('total'))['total__sum'] or 0
-        avg_order_value = period_orders.aggregate(Avg('total'))['total__avg'] or 0
-        
-        # Initialize growth metrics
-        revenue_growth = 0
-        order_growth = 0
-        
-        # Growth comparison (previous period) - only if we have orders
-        if total_orders > 0:
-            prev_start = start_date - timedelta(days=period)
-            prev_orders = queryset.filter(date_created__gte=prev_start, date_created__lt=start_date)
-            prev_revenue = prev_orders.aggregate(Sum('total'))['total__sum'] or 0
-            prev_count = prev_orders.count()
-            
-            revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
-            order_growth = ((total_orders - prev_count) / prev_count * 100) if prev_count > 0 else 0
-        
-        # Daily trends
-        daily_trends = period_orders.annotate(
-            date=TruncDate('date_created')
-        ).values('date').annotate(
-            orders=Count('id'),
-            revenue=Sum('total')
-        ).order_by('date')
+        # Scalar KPIs for this and the previous period in one conditional-aggregate query
+        kpis = period_kpis(rollup, start_date.date(), prev_start.date())
+        total_orders = kpis['orders']
+        total_revenue = kpis['revenue']
+        avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
         
-        # Orders by status
-        status_breakdown = period_orders.values('status').annotate(
-            count=Count('id'),
-            revenue=Sum('total')
-        ).order_by('-count')
+        # Growth comparison (previous period)
+        prev_revenue = kpis['prev_revenue']
+        prev_count = kpis['prev_orders']
         
-        # Payment methods
-        payment_methods = period_orders.exclude(
-            payment_method__isnull=True
-        ).values('payment_method').annotate(
-            count=Count('id'),
-            revenue=Sum('total')
-        ).order_by('-count')[:10]
+        revenue_growth = ((total_revenue - prev_revenue) / prev_revenue * 100) if prev_revenue > 0 else 0
+        order_growth = ((total_orders - prev_count) / prev_count * 100) if prev_count > 0 else 0
         
+        # Daily trends, orders by status and payment methods from one grouped rollup read
+        breakdowns = period_breakdowns(period_rollup)
+        daily_trends = breakdowns['daily_trends']
+        status_breakdown = breakdowns['status_breakdown']
+        payment_methods = breakdowns['payment_methods']
+
         # Top customers by revenue
-        top_customers = period_orders.exclude(
+        top_customers = list(period_orders.exclude(
             billing_email__isnull=True
         ).values(
             'billing_email', 'billing_first_name', 'billing_last_name'
         ).annotate(
             order_count=Count('id'),
             total_spent=Sum('total')
-        ).order_by('-total_spent')[:10]
+        ).order_by('-total_spent')[:10])
+
+        # Customer insights (distinct across days, so read from orders)
+        unique_customers = period_orders.aggregate(
+            count=Count('billing_email', distinct=True)
+        )['count']
         
-        # Monthly trends (for longer periods)
+        # Monthly trends (for longer periods), folded from the daily rows
+        monthly_trends = []
         if period > 60:
-            monthly_trends = period_orders.annotate(
-                month=TruncMonth('date_created')
-            ).values('month').annotate(
-                orders=Count('id'),
-                revenue=Sum('total')
-            ).order_by('month')
-        else:
-            monthly_trends = []
+            months = {}
+            for trend in daily_trends:
+                month = trend['date'].replace(day=1)
+                bucket = months.setdefault(month, {'month': month, 'orders': 0, 'revenue': 0})
+                bucket['orders'] += trend['orders']
+                bucket['revenue'] += trend['revenue'] or 0
+            monthly_trends = [
+                {**bucket, 'month': timezone.make_aware(datetime.combine(month, datetime.min.time()))}
+                for month, bucket in sorted(months.items())
+            ]
         
         # Order completion rate
-        completed_orders = period_orders.filter(
-            status__in=['completed', 'processing']
-        ).count()
-        completion_rate = (completed_orders / total_orders * 100) if total_orders > 0 else 0
+        completion_rate = (kpis['completed_orders'] / total_orders * 100) if total_orders > 0 else 0
         
         # Average time to completion (for completed orders) - simplified for now
-        completed_orders_count = period_orders.filter(date_completed__isnull=False).count()
         avg_completion_hours = 24.0  # Default placeholder value
         
-        # Customer insights
-        unique_customers = period_orders.exclude(
-            billing_email__isnull=True
-        ).values('billing_email').distinct().count()
-        
-        # Payment method breakdown with revenue
-        payment_methods = period_orders.exclude(
-            payment_method__isnull=True
-        ).values('payment_method').annotate(
-            count=Count('id'),
-            revenue=Sum('total')
-        ).order_by('-count')[:10]
-        
         # Resolve currency for this client
         currency_code = get_currency_for_client(client_name, period_orders)
 
@@ -482,6 +514,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         return self.analytics(request)
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def customer_acquisition(self, request):
         """Get customer acquisition analytics with CAC (Customer Acquisition Cost)"""
         try:
@@ -491,69 +524,23 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
 
             queryset = self.get_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
+                queryset = self.filter_client(queryset, client_name)
 
             # Date range for analysis
             end_date = timezone.now()
             start_date = end_date - timedelta(days=period)
             period_orders = queryset.filter(date_created__gte=start_date)
+            prev_start = start_date - timedelta(days=period)
 
-            # Identify new customers using a single annotated query instead of N+1
-            # A customer is "new" if they haven't ordered in the last {new_customer_window} days before their current order
-            prev_order_qs = self.get_queryset().filter(
-                billing_email=OuterRef('billing_email'),
-                date_created__lt=OuterRef('date_created'),
-            )
-            if client_name:
-                prev_order_qs = prev_order_qs.filter(client_name__icontains=client_name)
-
-            annotated_orders = period_orders.exclude(
-                billing_email__isnull=True
-            ).exclude(
-                billing_email=''
-            ).annotate(
-                prev_order_date=Subquery(
-                    prev_order_qs.order_by('-date_created').values('date_created')[:1]
-                )
+            # New vs returning per order via one LAG() window pass over each customer's history
+            acquisition = customer_acquisition_summary(
+                queryset, start_date, end_date, new_customer_window, previous_start=prev_start
             )
-
-            new_customers_data = []
-            returning_customers_data = []
-
-            for order in annotated_orders:
-                prev_date = order.prev_order_date
-
-                if prev_date is None:
-                    is_new = True
-                    days_since_last_order = None
-                else:
-                    days_since_last_order = (order.date_created - prev_date).days
-                    is_new = days_since_last_order >= new_customer_window
-
-                if is_new:
-                    new_customers_data.append({
-                        'order_id': order.order_id,
-                        'email': order.billing_email,
-                        'order_date': order.date_created,
-                        'total': float(order.total or 0),
-                        'previous_order_date': prev_date
-                    })
-                else:
-                    returning_customers_data.append({
-                        'order_id': order.order_id,
-                        'email': order.billing_email,
-                        'order_date': order.date_created,
-                        'total': float(order.total or 0),
-                        'days_since_last_order': days_since_last_order
-                    })
-
-            # Count unique new customers
-            unique_new_customer_emails = set([c['email'] for c in new_customers_data])
-            new_customers_count = len(unique_new_customer_emails)
-
-            # Count unique returning customers
-            unique_returning_customer_emails = set([c['email'] for c in returning_customers_data])
-            returning_customers_count = len(unique_returning_customer_emails)
+            daily_trends = acquisition['daily']
+            top_new_customers = acquisition['top_new_customers']
+            new_customers_count = acquisition['customers']['new']
+            returning_customers_count = acquisition['customers']['returning']
+            prev_new_customers_count = acquisition['customers']['previous_new']
 
             # Total unique customers in period
             total_unique_customers = period_orders.exclude(
@@ -561,8 +548,10 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             ).values('billing_email').distinct().count()
 
             # Revenue breakdown
-            new_customer_revenue = sum([c['total'] for c in new_customers_data])
-            returning_customer_revenue = sum([c['total'] for c in returning_customers_data])
+            new_customer_orders = sum(day['orders'] for day in daily_trends)
+            returning_customer_orders = sum(day['returning_orders'] for day in daily_trends)
+            new_customer_revenue = sum(day['revenue'] for day in daily_trends)
+            returning_customer_revenue = sum(day['returning_revenue'] for day in daily_trends)
             total_revenue = float(period_orders.aggregate(Sum('total'))['total__sum'] or 0)
 
             # Calculate CAC (Customer Acquisition Cost)
@@ -574,74 +563,8 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             cac = (total_marketing_spend / new_customers_count) if new_customers_count > 0 else 0
 
             # Average order value for new vs returning
-            avg_new_customer_order_value = (new_customer_revenue / len(new_customers_data)) if new_customers_data else 0
-            avg_returning_customer_order_value = (returning_customer_revenue / len(returning_customers_data)) if returning_customers_data else 0
-
-            # Daily new customer trends
-            daily_new_customers = {}
-            for customer in new_customers_data:
-                date_str = customer['order_date'].date().isoformat()
-                if date_str not in daily_new_customers:
-                    daily_new_customers[date_str] = {
-                        'date': date_str,
-                        'new_customers': 0,
-                        'revenue': 0,
-                        'orders': 0
-                    }
-                daily_new_customers[date_str]['new_customers'] += 1
-                daily_new_customers[date_str]['revenue'] += customer['total']
-                daily_new_customers[date_str]['orders'] += 1
-
-            daily_trends = sorted(daily_new_customers.values(), key=lambda x: x['date'])
-
-            # Top new customers by spend
-            new_customer_spend = {}
-            for customer in new_customers_data:
-                email = customer['email']
-                if email not in new_customer_spend:
-                    new_customer_spend[email] = {
-                        'email': email,
-                        'total_spent': 0,
-                        'orders': 0,
-                        'first_order_date': customer['order_date']
-                    }
-                new_customer_spend[email]['total_spent'] += customer['total']
-                new_customer_spend[email]['orders'] += 1
-
-            top_new_customers = sorted(
-                new_customer_spend.values(),
-                key=lambda x: x['total_spent'],
-                reverse=True
-            )[:10]
-
-            # Format dates for JSON serialization
-            for customer in top_new_customers:
-                customer['first_order_date'] = customer['first_order_date'].isoformat()
-
-            # Previous period comparison
-            prev_start = start_date - timedelta(days=period)
-            prev_period_orders = queryset.filter(date_created__gte=prev_start, date_created__lt=start_date)
-
-            # Calculate previous period new customers using annotation
-            prev_annotated = prev_period_orders.exclude(
-                billing_email__isnull=True
-            ).exclude(
-                billing_email=''
-            ).annotate(
-                prev_order_date=Subquery(
-                    prev_order_qs.order_by('-date_created').values('date_created')[:1]
-                )
-            )
-
-            prev_new_customers_count = 0
-            for order in prev_annotated:
-                prev_date = order.prev_order_date
-                if prev_date is None:
-                    prev_new_customers_count += 1
-                else:
-                    days_since_last = (order.date_created - prev_date).days
-                    if days_since_last >= new_customer_window:
-                        prev_new_customers_count += 1
+            avg_new_customer_order_value = (new_customer_revenue / new_customer_orders) if new_customer_orders else 0
+            avg_returning_customer_order_value = (returning_customer_revenue / returning_customer_orders) if returning_customer_orders else 0
 
             # Growth metrics
             new_customer_growth = ((new_customers_count - prev_new_customers_count) / prev_new_customers_count * 100) if prev_new_customers_count > 0 else 0
@@ -668,8 +591,8 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                     'new_customer_revenue_percentage': round((new_customer_revenue / total_revenue * 100), 1) if total_revenue > 0 else 0,
                     'avg_new_customer_order_value': round(avg_new_customer_order_value, 2),
                     'avg_returning_customer_order_value': round(avg_returning_customer_order_value, 2),
-                    'total_new_customer_orders': len(new_customers_data),
-                    'total_returning_customer_orders': len(returning_customers_data)
+                    'total_new_customer_orders': new_customer_orders,
+                    'total_returning_customer_orders': returning_customer_orders
                 },
                 'cac_metrics': {
                     'total_marketing_spend': float(total_marketing_spend),
@@ -697,6 +620,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             )
 
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def subscription_analytics(self, request):
         """
         Analyze subscription/repeat purchase patterns.
@@ -721,84 +645,20 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             # Filter orders
             queryset = self.get_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
-
-            # Get all orders with items (not just period orders - we need history)
-            all_orders = queryset.prefetch_related('items')
-
-            # Find subscribers: customers who purchased same product multiple times
-            # Group by email + product_id
-            from collections import defaultdict
-            customer_product_orders = defaultdict(list)
-
-            for order in all_orders.exclude(billing_email__isnull=True).exclude(billing_email=''):
-                for item in order.items.all():
-                    key = (order.billing_email.lower(), item.product_id, item.product_name)
-                    customer_product_orders[key].append({
-                        'order_id': order.order_id,
-                        'date': order.date_created or order.order_date,
-                        'quantity': item.quantity,
-                        'total': float(item.total_price),
-                        'order_total': float(order.total) if order.total else 0,
-                    })
-
-            # Identify subscribers (min_purchases of same product)
-            subscribers = []
-            for (email, product_id, product_name), orders_list in customer_product_orders.items():
-                if len(orders_list) >= min_purchases:
-                    # Sort orders by date
-                    orders_list.sort(key=lambda x: x['date'] if x['date'] else timezone.now())
-
-                    # Calculate intervals between orders
-                    intervals = []
-                    for i in range(1, len(orders_list)):
-                        if orders_list[i]['date'] and orders_list[i-1]['date']:
-                            interval = (orders_list[i]['date'] - orders_list[i-1]['date']).days
-                            if interval > 0:
-                                intervals.append(interval)
-
-                    avg_interval = sum(intervals) / len(intervals) if intervals else reorder_window
-                    last_order_date = orders_list[-1]['date']
-                    first_order_date = orders_list[0]['date']
-                    total_revenue = sum(o['total'] for o in orders_list)
-                    total_orders = len(orders_list)
-
-                    # Determine status
-                    if last_order_date:
-                        days_since_last = (end_date - last_order_date).days
-                        expected_interval = avg_interval if avg_interval > 0 else reorder_window
-
-                        if days_since_last > expected_interval * churn_multiplier:
-                            status = 'churned'
-                        elif days_since_last > expected_interval - at_risk_days:
-                            status = 'at_risk'
-                        else:
-                            status = 'active'
-                    else:
-                        status = 'unknown'
-                        days_since_last = None
-
-                    # Check if became subscriber in this period
-                    is_new_subscriber = False
-                    if len(orders_list) >= min_purchases:
-                        # The date they became a subscriber is the date of their min_purchases-th order
-                        subscription_start_date = orders_list[min_purchases - 1]['date']
-                        if subscription_start_date and subscription_start_date >= start_date:
-                            is_new_subscriber = True
-
-                    subscribers.append({
-                        'email': email,
-                        'product_id': product_id,
-                        'product_name': product_name,
-                        'total_orders': total_orders,
-                        'total_revenue': total_revenue,
-                        'first_order_date': first_order_date,
-                        'last_order_date': last_order_date,
-                        'avg_interval_days': round(avg_interval, 1),
-                        'days_since_last_order': days_since_last,
-                        'status': status,
-                        'is_new_subscriber': is_new_subscriber,
-                    })
+                queryset = self.filter_client(queryset, client_name)
+
+            # One streamed, sorted pass over every line item (history, not just the period)
+            subscribers = list(detect_subscribers(
+                purchase_rows(queryset),
+                start_date,
+                end_date,
+                min_purchases=min_purchases,
+                reorder_window=reorder_window,
+                churn_multiplier=churn_multiplier,
+                at_risk_days=at_risk_days,
+            ))
+            # Most recently bought first: the per-email lists below keep the first row's details
+            subscribers.sort(key=lambda s: s['last_order_date'] or end_date, reverse=True)
 
             # Calculate overview metrics
             total_subscribers = len(subscribers)
@@ -955,7 +815,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
 
             # Iterate orders and derive source/medium using the same logic as reporting
             traffic_sources = {}
-            for order in self.get_queryset():
+            for order in self.get_queryset().with_payload('raw_data'):
                 source, medium = self._extract_traffic_source(order)
                 pair = (source.lower(), medium.lower())
 
@@ -1003,6 +863,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             return Response({'error': f'Failed to discover traffic sources: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def channels_report(self, request):
         """Get comprehensive channel performance report with period-over-period comparison"""
         try:
@@ -1010,7 +871,6 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             period = int(request.query_params.get('period', 30))
             comparison_type = request.query_params.get('comparison_type', 'MoM')
             client_name = request.query_params.get('client_name', '')
-            export_detailed = request.query_params.get('export', 'false').lower() == 'true'
             
             # Calculate date ranges
             end_date = timezone.now()
@@ -1040,76 +900,30 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             base_client_name = normalize_client_label(client_name)
 
             # Filter orders by client if specified (tolerant to naming differences)
-            orders_q = models.Q()
+            scoped_orders = self.get_queryset()
             if base_client_name and base_client_name != 'all':
-                normalized = base_client_name
-                orders_q &= (
-                    models.Q(client_name__iexact=normalized) |
-                    models.Q(client_name__istartswith=f"{normalized} -") |
-                    models.Q(client_name__icontains=normalized)
-                )
+                scoped_orders = self.filter_client(scoped_orders, base_client_name)
             
             # Get current period data (use order_date to match WooCommerce reports)
-            scoped_orders = self.get_queryset()
-            current_orders = (
-                scoped_orders
-                .filter(order_date__gte=start_date, order_date__lte=end_date)
-                .filter(orders_q)
-            )
+            current_orders = scoped_orders.filter(order_date__gte=start_date, order_date__lte=end_date)
 
             # Get comparison period data
-            comparison_orders = (
-                scoped_orders
-                .filter(order_date__gte=comparison_start, order_date__lte=comparison_end)
-                .filter(orders_q)
-            )
+            comparison_orders = scoped_orders.filter(order_date__gte=comparison_start, order_date__lte=comparison_end)
             
-            # Process channel data for current period
-            current_channel_data = self._process_channel_data(current_orders)
-            
-            # Process channel data for comparison period
-            comparison_channel_data = self._process_channel_data(comparison_orders)
+            # Attribute each period's orders in one pass
+            classification_map = load_classification_map()
+            current_groups = attribution_groups(current_orders, classification_map)
+            current_channel_data = channel_performance(current_groups)
+            comparison_channel_data = channel_performance(attribution_groups(comparison_orders, classification_map))
             
             # Calculate period-over-period changes
             pop_changes = self._calculate_pop_changes(current_channel_data, comparison_channel_data)
             
             # Get unclassified data
-            unclassified_data = self._get_unclassified_data(current_orders)
+            unclassified_data = unclassified_sources(current_groups, classification_map)
             
             # Prepare response
-            currency_code = 'USD'
-            # 1) Prefer company-level currency
-            try:
-                if base_client_name and base_client_name != 'all':
-                    from users.models import Account
-                    acc = Account.objects.filter(name__iexact=base_client_name).select_related('company').first()
-                    if acc and acc.company and acc.company.currency_code:
-                        currency_code = acc.company.currency_code
-            except Exception:
-                pass
-
-            # 2) Otherwise prefer client-level currency from active WooCommerce config
-            try:
-                if base_client_name and base_client_name != 'all':
-                    cfg = AccountConfiguration.objects.filter(
-                        account__name__iexact=base_client_name,
-                        config_type='woocommerce',
-                        is_active=True
-                    ).first()
-                    if cfg:
-                        code = cfg.get_config('currency_code') or cfg.get_config('currency')
-                        if code:
-                            currency_code = code
-            except Exception:
-                pass
-            # 3) Fallback to first order currency in the period
-            if currency_code == 'USD':
-                try:
-                    first_currency = current_orders.values_list('currency', flat=True).first()
-                    if first_currency:
-                        currency_code = first_currency
-                except Exception:
-                    pass
+            currency_code = get_currency_for_client(base_client_name, current_orders)
             response_data = {
                 'currency': currency_code,
                 'currentPeriod': {
@@ -1132,11 +946,6 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                 'unclassifiedData': unclassified_data
             }
             
-            # Add detailed orders for export if requested
-            if export_detailed:
-                detailed_orders = self._get_detailed_orders_for_export(current_orders)
-                response_data['orders'] = detailed_orders
-            
             return Response(response_data)
             
         except Exception as e:
@@ -1145,195 +954,46 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    def _process_channel_data(self, orders):
+    @action(detail=False, methods=['get'])
+    def export(self, request):
         """
-        Process orders to extract channel performance data
-        
-        NOTE: This method currently relies on UTM parameters being present in WooCommerce order data.
-        Most WooCommerce stores don't capture UTM parameters by default, so orders will default to 'Direct' channel.
-        
-        To get proper channel attribution, you need to:
-        1. Install a UTM tracking plugin in WooCommerce, OR
-        2. Integrate with Google Analytics to get traffic source data, OR
-        3. Modify your WooCommerce checkout to capture UTM parameters
+        Stream the last ``period`` days of orders (``report=orders``) or the
+        channel report (``report=channels``) as CSV, or as Parquet with
+        ``file_format=parquet``
         """
-        # Get all active classification rules
-        classifications = ChannelClassification.objects.filter(is_active=True)
-        # Build a case-insensitive lookup for (source, medium)
-        classification_map = {
-            (rule.source.lower(), rule.medium.lower()): rule for rule in classifications
-        }
-        
-        # Initialize channel data
-        channel_data = {}
-        total_sessions = 0
-        total_orders = 0
-        total_revenue = 0
-        
-        # Process each order
-        for order in orders:
-            # Extract source/medium from order metadata, referrer, or UTM parameters
-            source, medium = self._extract_traffic_source(order)
-            
-            # Try to get source/medium from order metadata
-            if hasattr(order, 'raw_data') and order.raw_data:
-                raw_data = order.raw_data
-                
-                # Check for UTM parameters in order notes or metadata
-                if isinstance(raw_data, dict):
-                    # Look for UTM parameters in various places
-                    utm_source = (
-                        raw_data.get('utm_source') or 
-                        raw_data.get('source') or 
-                        raw_data.get('referrer') or
-                        raw_data.get('_source') or
-                        raw_data.get('_medium')
-                    )
-                    
-                    utm_medium = (
-                        raw_data.get('utm_medium') or 
-                        raw_data.get('medium') or 
-                        raw_data.get('_medium')
-                    )
-                    
-                    # Check order notes for UTM parameters
-                    if not utm_source and raw_data.get('note'):
-                        note = raw_data.get('note', '')
-                        # Simple regex to extract UTM parameters from notes
-                        import re
-                        utm_match = re.search(r'utm_source=([^&\s]+)', note)
-                        if utm_match:
-                            utm_source = utm_match.group(1)
-                        
-                        utm_medium_match = re.search(r'utm_medium=([^&\s]+)', note)
-                        if utm_medium_match:
-                            utm_medium = utm_medium_match.group(1)
-                    
-                    if utm_source:
-                        source = utm_source
-                    if utm_medium:
-                        medium = utm_medium
-                    
-                    # Debug: Log what we found in raw_data
-                    if source != '(direct)' or medium != 'typein':
-                        print(f"Order {order.order_id}: Found UTM data - Source: {source}, Medium: {medium}")
-                    else:
-                        print(f"Order {order.order_id}: No UTM data found in raw_data. Keys available: {list(raw_data.keys())}")
-                        # Check if there are any other potential sources of traffic data
-                        if 'meta_data' in raw_data:
-                            meta_data = raw_data['meta_data']
-                            print(f"  Meta data keys: {[item.get('key', '') for item in meta_data if isinstance(item, dict)]}")
-                        if 'note' in raw_data and raw_data['note']:
-                            print(f"  Order note: {raw_data['note'][:100]}...")
-            
-            # Find matching classification (case-insensitive)
-            classification = classification_map.get((source, medium))
-            
-            # Use classification or default to 'Direct' instead of 'ChanelNotFound'
-            channel_type = classification.channel_type if classification else 'Direct'
-            
-            # Debug logging for channel classification
-            if source != '(direct)' or medium != 'typein':
-                print(f"Order {order.order_id}: Source={source}, Medium={medium} → Channel={channel_type}")
-            
-            # Initialize channel if not exists
-            if channel_type not in channel_data:
-                channel_data[channel_type] = {
-                    'channelType': channel_type,
-                    'sessions': 0,
-                    'orders': 0,
-                    'orderTotal': 0,
-                    'cvr': 0,
-                    'aov': 0,
-                    'sourceMedium': f"{source}/{medium}"
-                }
-            
-            # Override grouping for specific sources to align with expected report buckets
-            if source == 'bing':
-                channel_type = 'Bing'
-                if channel_type not in channel_data:
-                    channel_data[channel_type] = {
-                        'channelType': channel_type,
-                        'sessions': 0,
-                        'orders': 0,
-                        'orderTotal': 0,
-                        'cvr': 0,
-                        'aov': 0,
-                        'sourceMedium': f"{source}/{medium}"
-                    }
-            elif source in ['trustpilot']:
-                channel_type = 'Trustpulot' if 'Trustpulot' in channel_data else 'Trustpilot'
-                if channel_type not in channel_data:
-                    channel_data[channel_type] = {
-                        'channelType': channel_type,
-                        'sessions': 0,
-                        'orders': 0,
-                        'orderTotal': 0,
-                        'cvr': 0,
-                        'aov': 0,
-                        'sourceMedium': f"{source}/{medium}"
-                    }
-            elif source in ['chatgpt', 'openai']:
-                channel_type = 'ChatGPT'
-                if channel_type not in channel_data:
-                    channel_data[channel_type] = {
-                        'channelType': channel_type,
-                        'sessions': 0,
-                        'orders': 0,
-                        'orderTotal': 0,
-                        'cvr': 0,
-                        'aov': 0,
-                        'sourceMedium': f"{source}/{medium}"
-                    }
+        report = request.query_params.get('report', 'orders')
+        file_format = request.query_params.get('file_format', 'csv')
+        if report not in ('orders', 'channels'):
+            return Response({'error': 'report must be orders or channels'}, status=status.HTTP_400_BAD_REQUEST)
+        if file_format not in EXPORT_CONTENT_TYPES:
+            return Response({'error': 'file_format must be csv or parquet'}, status=status.HTTP_400_BAD_REQUEST)
+        if file_format == 'parquet' and not parquet_available():
+            return Response({'error': 'Parquet export requires pyarrow'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            period = int(request.query_params.get('period', 30))
+        except ValueError:
+            return Response({'error': 'period must be a number of days'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Same client matching and period as channels_report's current period
+        base_client_name = (request.query_params.get('client_name') or '').split(' - ')[0].strip()
+        end_date = timezone.now()
+        start_date = end_date - timedelta(days=period)
+        orders = self.get_queryset().filter(order_date__gte=start_date, order_date__lte=end_date)
+        if base_client_name and base_client_name != 'all':
+            orders = self.filter_client(orders, base_client_name)
+
+        if report == 'orders':
+            header = ORDER_CSV_HEADER if file_format == 'csv' else [column for column, _ in ORDER_EXPORT_COLUMNS]
+            rows = order_export_rows(orders)
+        else:
+            header = CHANNEL_EXPORT_COLUMNS
+            rows = channel_export_rows(channel_performance(attribution_groups(orders, load_classification_map())))
+
+        stream = stream_csv(header, rows) if file_format == 'csv' else stream_parquet(header, rows)
+        response = StreamingHttpResponse(stream, content_type=EXPORT_CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{report}_{end_date:%Y-%m-%d}.{file_format}"'
+        return response
 
-            # Update channel data
-            channel_data[channel_type]['orders'] += 1
-            order_total_val = float(order.total or 0)
-            channel_data[channel_type]['orderTotal'] += order_total_val
-            total_orders += 1
-            total_revenue += order_total_val
-
-            # Sessions: prefer attribution_session_count if available; fallback to 1
-            try:
-                session_count_val = int(getattr(order, 'attribution_session_count', 0) or 0)
-            except (ValueError, TypeError):
-                session_count_val = 0
-            if session_count_val <= 0:
-                session_count_val = 1
-            channel_data[channel_type]['sessions'] += session_count_val
-            total_sessions += session_count_val
-        
-        # Calculate CVR and AOV for each channel
-        for channel in channel_data.values():
-            if channel['sessions'] > 0:
-                channel['cvr'] = (channel['orders'] / channel['sessions']) * 100
-            if channel['orders'] > 0:
-                channel['aov'] = channel['orderTotal'] / channel['orders']
-        
-        # Calculate totals
-        total_cvr = (total_orders / total_sessions * 100) if total_sessions > 0 else 0
-        total_aov = (total_revenue / total_orders) if total_orders > 0 else 0
-        
-        # Debug: Print classification summary
-        print(f"\n=== Channel Classification Summary ===")
-        print(f"Total orders processed: {total_orders}")
-        for channel_type, data in channel_data.items():
-            print(f"  {channel_type}: {data['orders']} orders")
-        print(f"=====================================\n")
-        
-        return {
-            'total': {
-                'channelType': 'Total',
-                'sessions': total_sessions,
-                'orders': total_orders,
-                'orderTotal': total_revenue,
-                'cvr': total_cvr,
-                'aov': total_aov,
-                'sourceMedium': 'All Channels'
-            },
-            'channels': list(channel_data.values())
-        }
-    
     def _calculate_pop_changes(self, current_data, comparison_data):
         """Calculate period-over-period percentage changes"""
         pop_changes = {
@@ -1381,276 +1041,45 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         
         return pop_changes
     
-    def _get_unclassified_data(self, orders):
-        """Get examples of unclassified traffic sources"""
-        # Get all active classification rules, normalized to lowercase for comparison
-        classifications = ChannelClassification.objects.filter(is_active=True)
-        classification_pairs = {(rule.source.lower(), rule.medium.lower()) for rule in classifications}
-        
-        # Find unclassified source/medium combinations
-        unclassified_sources = {}
-        
-        for order in orders:
-            # Reuse the extractor to ensure consistent parsing
-            source, medium = self._extract_traffic_source(order)
-            source = (source or '(direct)').lower()
-            medium = (medium or 'typein').lower()
-            
-            if (source, medium) not in classification_pairs:
-                key = f"{source}/{medium}"
-                if key not in unclassified_sources:
-                    unclassified_sources[key] = {
-                        'source': source,
-                        'medium': medium,
-                        'sourceMedium': key,
-                        'sessions': 0
-                    }
-                
-                # Estimate sessions
-                estimated_sessions = max(1, int(float(order.total or 0) / 100))
-                unclassified_sources[key]['sessions'] += estimated_sessions
-        
-        # Convert to list and sort by sessions
-        unclassified_list = list(unclassified_sources.values())
-        unclassified_list.sort(key=lambda x: x['sessions'], reverse=True)
-        
-        return {
-            'count': len(unclassified_list),
-            'examples': unclassified_list[:10]  # Top 10 examples
-        }
-    
     def _extract_traffic_source(self, order):
-        """
-        Enhanced method to extract traffic source and medium from WooCommerce order data
-        
-        Returns tuple of (source, medium)
-        """
-        source = '(direct)'
-        medium = 'typein'
-        
-        # Prefer normalized attribution fields persisted on the model
-        try:
-            attr_source = getattr(order, 'attribution_utm_source', None)
-            attr_medium = getattr(order, 'attribution_source_type', None)
-            if attr_source:
-                source = str(attr_source).strip().lower()
-                medium = str(attr_medium or 'utm').strip().lower()
-                # Normalize and return early if attribution fields exist
-                return self._normalize_source(source), self._normalize_medium(medium)
-        except Exception:
-            pass
-        
-        if not hasattr(order, 'raw_data') or not order.raw_data:
-            return source, medium
-        
-        raw_data = order.raw_data
-        if not isinstance(raw_data, dict):
-            return source, medium
-        
-        # Method 1: Direct UTM parameters or WooCommerce attribution meta
-        utm_source = (
-            raw_data.get('utm_source') or 
-            raw_data.get('source') or 
-            raw_data.get('_source')
-        )
-        
-        utm_medium = (
-            raw_data.get('utm_medium') or 
-            raw_data.get('medium') or 
-            raw_data.get('_medium')
+        """Return (source, medium) for an order; see attribution.extract_traffic_source"""
+        return extract_traffic_source(
+            getattr(order, 'attribution_utm_source', None),
+            getattr(order, 'attribution_source_type', None),
+            getattr(order, 'raw_data', None)
         )
-        
-        # Method 2: Check meta_data array for UTM parameters and WC attribution keys
-        if not utm_source or not utm_medium:
-            meta_data = raw_data.get('meta_data', [])
-            if isinstance(meta_data, list):
-                for meta_item in meta_data:
-                    if isinstance(meta_item, dict):
-                        key = meta_item.get('key', '').lower()
-                        value = meta_item.get('value', '')
-                        
-                        if 'utm_source' in key and value:
-                            utm_source = value
-                        elif 'utm_medium' in key and value:
-                            utm_medium = value
-                        # WooCommerce Order Attribution plugin keys
-                        elif key == '_wc_order_attribution_utm_source' and value:
-                            utm_source = value
-                        elif key == '_wc_order_attribution_source_type' and value:
-                            utm_medium = value
-                        elif 'source' in key and value:
-                            utm_source = value
-                        elif 'medium' in key and value:
-                            utm_medium = value
-        
-        # Method 3: Extract from order notes using regex
-        if not utm_source or not utm_medium:
-            note = raw_data.get('note', '')
-            if note:
-                import re
-                
-                # Look for UTM parameters in notes
-                utm_source_match = re.search(r'utm_source[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
-                if utm_source_match:
-                    utm_source = utm_source_match.group(1)
-                
-                utm_medium_match = re.search(r'utm_medium[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
-                if utm_medium_match:
-                    utm_medium = utm_medium_match.group(1)
-                
-                # Look for other traffic source indicators
-                if not utm_source:
-                    source_match = re.search(r'source[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
-                    if source_match:
-                        utm_source = source_match.group(1)
-                
-                if not utm_medium:
-                    medium_match = re.search(r'medium[=:]\s*([^&\s\n\r]+)', note, re.IGNORECASE)
-                    if medium_match:
-                        utm_medium = medium_match.group(1)
-        
-        # Method 4: Check for referrer information
-        if not utm_source:
-            referrer = raw_data.get('referrer') or raw_data.get('_referrer')
-            if referrer:
-                import re
-                # Extract domain from referrer
-                domain_match = re.search(r'https?://(?:www\.)?([^/]+)', referrer)
-                if domain_match:
-                    domain = domain_match.group(1).lower()
-                    if 'google' in domain:
-                        utm_source = 'google'
-                        utm_medium = 'organic'
-                    elif 'bing' in domain:
-                        utm_source = 'bing'
-                        utm_medium = 'organic'
-                    elif 'yahoo' in domain:
-                        utm_source = 'yahoo'
-                        utm_medium = 'organic'
-                    elif 'trustpilot' in domain:
-                        utm_source = 'trustpilot'
-                        utm_medium = 'referral'
-                    elif 'chatgpt' in domain or 'openai' in domain:
-                        utm_source = 'chatgpt'
-                        utm_medium = 'referral'
-                    elif 'facebook' in domain:
-                        utm_source = 'facebook'
-                        utm_medium = 'social'
-                    elif 'instagram' in domain:
-                        utm_source = 'instagram'
-                        utm_medium = 'social'
-                    elif 'linkedin' in domain:
-                        utm_source = 'linkedin'
-                        utm_medium = 'social'
-                    elif 'twitter' in domain or 'x.com' in domain:
-                        utm_source = 'twitter'
-                        utm_medium = 'social'
-        
-        # Method 5: Check custom fields that might contain traffic data
-        if not utm_source or not utm_medium:
-            for key, value in raw_data.items():
-                if isinstance(value, str) and value:
-                    key_lower = key.lower()
-                    if 'traffic' in key_lower or 'source' in key_lower:
-                        if not utm_source:
-                            utm_source = value
-                        elif not utm_medium:
-                            utm_medium = value
-        
-        # Clean and validate extracted values
-        if utm_source and utm_source.strip():
-            source = utm_source.strip().lower()
-        if utm_medium and utm_medium.strip():
-            medium = utm_medium.strip().lower()
-        
-        # Normalize common values
-        source = self._normalize_source(source)
-        medium = self._normalize_medium(medium)
-        
-        return source, medium
-    
-    def _normalize_source(self, source):
-        """Normalize common source values"""
-        source = source.lower().strip()
-        
-        # Normalize common sources
-        if 'google' in source:
-            return 'google'
-        elif 'facebook' in source or 'fb' in source:
-            return 'facebook'
-        elif 'instagram' in source or 'ig' in source:
-            return 'instagram'
-        elif 'linkedin' in source:
-            return 'linkedin'
-        elif 'twitter' in source or 'x.com' in source:
-            return 'twitter'
-        elif 'youtube' in source or 'yt' in source:
-            return 'youtube'
-        elif 'tiktok' in source:
-            return 'tiktok'
-        elif 'pinterest' in source:
-            return 'pinterest'
-        elif 'bing' in source:
-            return 'bing'
-        elif 'yahoo' in source:
-            return 'yahoo'
-        elif 'direct' in source or source == '(direct)':
-            return '(direct)'
-        elif 'email' in source:
-            return 'email'
-        elif 'referral' in source or 'referrer' in source:
-            return 'referral'
-        
-        return source
-    
-    def _normalize_medium(self, medium):
-        """Normalize common medium values"""
-        medium = medium.lower().strip()
-        
-        # Normalize common mediums
-        if 'organic' in medium or 'natural' in medium:
-            return 'organic'
-        elif 'cpc' in medium or 'paid' in medium or 'ppc' in medium:
-            return 'cpc'
-        elif 'utm' in medium:
-            return 'utm'  # Keep utm as utm for Paid Search classification
-        elif 'social' in medium:
-            return 'social'
-        elif 'email' in medium:
-            return 'email'
-        elif 'referral' in medium:
-            return 'referral'
-        elif 'typein' in medium or 'direct' in medium:
-            return 'typein'
-        elif 'banner' in medium or 'display' in medium:
-            return 'display'
-        elif 'affiliate' in medium:
-            return 'affiliate'
-        
-        return medium
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def enhanced_analytics(self, request):
         """Get enhanced analytics with better performance metrics and insights"""
         try:
             client_name = request.query_params.get('client_name', '')
             period = int(request.query_params.get('period', 30))
             
-            # Calculate date ranges
+            # Calculate date ranges, aligned to whole days to match the daily rollup
             end_date = timezone.now()
-            start_date = end_date - timedelta(days=period)
+            start_date = (end_date - timedelta(days=period)).replace(hour=0, minute=0, second=0, microsecond=0)
             
             # Filter orders
             queryset = self.get_queryset()
+            rollup = self.get_rollup_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
+                queryset = self.filter_client(queryset, client_name)
             
             period_orders = queryset.filter(date_created__gte=start_date)
+            period_rollup = rollup.filter(date__gte=start_date.date())
+            
+            # Status analysis with revenue
+            status_breakdown = list(period_rollup.values('status').annotate(
+                count=Sum('order_count'),
+                revenue=Sum('revenue')
+            ).order_by('-revenue'))
             
             # Enhanced metrics
-            total_orders = period_orders.count()
-            total_revenue = period_orders.aggregate(Sum('total'))['total__sum'] or 0
-            avg_order_value = period_orders.aggregate(Avg('total'))['total__avg'] or 0
+            total_orders = sum(item['count'] for item in status_breakdown)
+            total_revenue = sum(item['revenue'] or 0 for item in status_breakdown)
+            avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
             
             # Customer metrics
             unique_customers = period_orders.exclude(
@@ -1688,12 +1117,11 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             ).order_by('-revenue')[:10]
             
             # Payment method analysis
-            payment_methods = period_orders.exclude(
-                payment_method__isnull=True
+            payment_methods = period_rollup.exclude(
+                payment_method=''
             ).values('payment_method').annotate(
-                count=Count('id'),
-                revenue=Sum('total'),
-                avg_value=Avg('total')
+                count=Sum('order_count'),
+                revenue=Sum('revenue')
             ).order_by('-revenue')
             
             # Time-based analysis
@@ -1704,13 +1132,6 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                 revenue=Sum('total')
             ).order_by('hour')
             
-            # Status analysis with revenue
-            status_breakdown = period_orders.values('status').annotate(
-                count=Count('id'),
-                revenue=Sum('total'),
-                avg_value=Avg('total')
-            ).order_by('-revenue')
-            
             # Conversion funnel (simplified)
             # This would ideally come from actual session data
             estimated_sessions = total_orders * 10  # Rough estimate
@@ -1765,7 +1186,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                             'method': item['payment_method'],
                             'orders': item['count'],
                             'revenue': float(item['revenue'] or 0),
-                            'avg_value': float(item['avg_value'] or 0)
+                            'avg_value': float(item['revenue'] / item['count']) if item['count'] else 0
                         }
                         for item in payment_methods
                     ]
@@ -1785,7 +1206,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                         'status': item['status'],
                         'count': item['count'],
                         'revenue': float(item['revenue'] or 0),
-                        'avg_value': float(item['avg_value'] or 0)
+                        'avg_value': float(item['revenue'] / item['count']) if item['count'] else 0
                     }
                     for item in status_breakdown
                 ]
@@ -1798,6 +1219,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @cached_analytics(timeout=60)
     def real_time_analytics(self, request):
         """Get real-time analytics for live dashboard updates"""
         try:
@@ -1812,31 +1234,34 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             
             # Filter orders
             queryset = self.get_queryset()
+            rollup = self.get_rollup_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
+                queryset = self.filter_client(queryset, client_name)
             
-            # Today's metrics
             today_orders = queryset.filter(date_created__gte=today_start)
-            today_revenue = today_orders.aggregate(Sum('total'))['total__sum'] or 0
-            today_count = today_orders.count()
             
-            # Yesterday comparison
-            yesterday_orders = queryset.filter(
-                date_created__gte=yesterday_start,
-                date_created__lt=today_start
+            # Today, yesterday, week and month totals in one pass over the rollup
+            today_filter = Q(date__gte=today_start.date())
+            yesterday_filter = Q(date__gte=yesterday_start.date(), date__lt=today_start.date())
+            week_filter = Q(date__gte=week_start.date())
+            periods = rollup.filter(date__gte=month_start.date()).aggregate(
+                today_count=Sum('order_count', filter=today_filter),
+                today_revenue=Sum('revenue', filter=today_filter),
+                yesterday_count=Sum('order_count', filter=yesterday_filter),
+                yesterday_revenue=Sum('revenue', filter=yesterday_filter),
+                week_count=Sum('order_count', filter=week_filter),
+                week_revenue=Sum('revenue', filter=week_filter),
+                month_count=Sum('order_count'),
+                month_revenue=Sum('revenue')
             )
-            yesterday_revenue = yesterday_orders.aggregate(Sum('total'))['total__sum'] or 0
-            yesterday_count = yesterday_orders.count()
-            
-            # Week metrics
-            week_orders = queryset.filter(date_created__gte=week_start)
-            week_revenue = week_orders.aggregate(Sum('total'))['total__sum'] or 0
-            week_count = week_orders.count()
-            
-            # Month metrics
-            month_orders = queryset.filter(date_created__gte=month_start)
-            month_revenue = month_orders.aggregate(Sum('total'))['total__sum'] or 0
-            month_count = month_orders.count()
+            today_count = periods['today_count'] or 0
+            today_revenue = periods['today_revenue'] or 0
+            yesterday_count = periods['yesterday_count'] or 0
+            yesterday_revenue = periods['yesterday_revenue'] or 0
+            week_count = periods['week_count'] or 0
+            week_revenue = periods['week_revenue'] or 0
+            month_count = periods['month_count'] or 0
+            month_revenue = periods['month_revenue'] or 0
             
             # Recent activity (last 10 orders)
             recent_orders = queryset.order_by('-date_created')[:10]
@@ -1862,9 +1287,9 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             ).order_by('hour')
             
             # Status breakdown for today
-            today_status = today_orders.values('status').annotate(
-                count=Count('id'),
-                revenue=Sum('total')
+            today_status = rollup.filter(today_filter).values('status').annotate(
+                count=Sum('order_count'),
+                revenue=Sum('revenue')
             ).order_by('-count')
             
             # Calculate growth rates
@@ -1922,6 +1347,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def customer_segmentation(self, request):
         """Get customer segmentation analytics based on order behavior"""
         try:
@@ -1935,7 +1361,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             # Filter orders
             queryset = self.get_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
+                queryset = self.filter_client(queryset, client_name)
             
             period_orders = queryset.filter(date_created__gte=start_date)
             
@@ -2054,6 +1480,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def product_analytics(self, request):
         """Get detailed product performance analytics"""
         try:
@@ -2067,7 +1494,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             # Filter orders
             queryset = self.get_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
+                queryset = self.filter_client(queryset, client_name)
             
             period_orders = queryset.filter(date_created__gte=start_date)
             
@@ -2209,6 +1636,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def inventory_analytics(self, request):
         """Get inventory and stock performance analytics"""
         try:
@@ -2222,7 +1650,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             # Filter orders
             queryset = self.get_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
+                queryset = self.filter_client(queryset, client_name)
             
             period_orders = queryset.filter(date_created__gte=start_date)
             
@@ -2327,6 +1755,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @cached_analytics()
     def forecasting_analytics(self, request):
         """Get predictive analytics and forecasting for business planning"""
         try:
@@ -2339,22 +1768,40 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
             
             # Filter orders
             queryset = self.get_queryset()
+            rollup = self.get_rollup_queryset()
             if client_name:
-                queryset = queryset.filter(client_name__icontains=client_name)
-            
-            historical_orders = queryset.filter(date_created__gte=start_date)
+                queryset = self.filter_client(queryset, client_name)
+            
+            # Monthly aggregation for trend analysis, folded from the daily rollup
+            daily_data = rollup.filter(date__gte=start_date.date()).values('date').annotate(
+                orders=Sum('order_count'),
+                revenue=Sum('revenue')
+            ).order_by('date')
+            months = {}
+            for day in daily_data:
+                month = day['date'].replace(day=1)
+                bucket = months.setdefault(month, {
+                    'year_month': timezone.make_aware(datetime.combine(month, datetime.min.time())),
+                    'orders': 0,
+                    'revenue': 0,
+                    'customers': 0
+                })
+                bucket['orders'] += day['orders']
+                bucket['revenue'] += day['revenue'] or 0
             
-            # Monthly aggregation for trend analysis
-            monthly_data = historical_orders.annotate(
-                year_month=models.functions.TruncMonth('date_created')
+            # Distinct customers don't add up across days, so count them per month from orders
+            monthly_customers = queryset.filter(date_created__gte=start_date).annotate(
+                year_month=TruncMonth('date_created')
             ).values('year_month').annotate(
-                orders=Count('id'),
-                revenue=Sum('total'),
                 customers=Count('billing_email', distinct=True)
-            ).order_by('year_month')
+            ).order_by()
+            for item in monthly_customers:
+                month = timezone.localtime(item['year_month']).date()
+                if month in months:
+                    months[month]['customers'] = item['customers']
             
             # Convert to list for easier processing
-            monthly_list = list(monthly_data)
+            monthly_list = [months[month] for month in sorted(months)]
             
             if len(monthly_list) < 6:
                 return Response({
@@ -2517,7 +1964,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         """Debug endpoint to see what data is available in WooCommerce orders"""
         try:
             # Get a few recent orders to examine their structure
-            orders = self.get_queryset()[:5]
+            orders = self.get_queryset().with_payload('raw_data')[:5]
             
             debug_data = []
             for order in orders:
@@ -2545,41 +1992,6 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
-    def _get_detailed_orders_for_export(self, orders_queryset):
-        """Get detailed order data for CSV export with channel classification"""
-        # Get all active classification rules
-        classifications = ChannelClassification.objects.filter(is_active=True)
-        classification_map = {
-            (rule.source.lower(), rule.medium.lower()): rule for rule in classifications
-        }
-        
-        orders_data = []
-        
-        for order in orders_queryset.select_related().order_by('-order_date'):
-            # Extract source/medium from order metadata, referrer, or UTM parameters
-            source, medium = self._extract_traffic_source(order)
-            
-            # Find matching classification (case-insensitive)
-            classification = classification_map.get((source.lower(), medium.lower()))
-            
-            # Use classification or default to 'Direct'
-            channel_type = classification.channel_type if classification else 'Direct'
-            
-            orders_data.append({
-                'order_id': order.order_id,
-                'order_date': order.order_date.strftime('%Y-%m-%d %H:%M:%S') if order.order_date else '',
-                'order_total': float(order.order_total) if order.order_total else 0.0,
-                'attribution_utm_source': order.attribution_utm_source or '',
-                'attribution_source_type': order.attribution_source_type or '',
-                'channel_type': channel_type,
-                'billing_email': order.billing_email or '',
-                'status': order.status or '',
-                'currency': order.currency or '',
-                'client_name': order.client_name or ''
-            })
-        
-        return orders_data
-
     @action(detail=False, methods=['get'])
     def validate_data_coverage(self, request):
         """Validate data coverage and detect missing orders or channels"""
@@ -2587,7 +1999,7 @@ class WooCommerceOrderViewSet(viewsets.ModelViewSet):
         
         queryset = self.get_queryset()
         if client_name:
-            queryset = queryset.filter(client_name__icontains=client_name)
+            queryset = self.filter_client(queryset, client_name)
         
         # Check date coverage
         date_stats = queryset.aggregate(
@@ -2667,12 +2079,7 @@ class WooCommerceSyncLogViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        user = self.request.user
-        queryset = WooCommerceSyncLog.objects.all()
-
-        if user.role != 'super_admin':
-            allowed_names = list(_get_user_accounts(user).values_list('name', flat=True))
-            queryset = queryset.filter(client_name__in=allowed_names)
+        queryset = scope_to_client_names(WooCommerceSyncLog.objects.all(), self.request.user)
 
         client_name = self.request.query_params.get('client_name')
         if client_name:
@@ -198,12 +198,13 @@ export default function ChannelReport() {
       const params = new URLSearchParams({
         period: period.toString(),
         client_name: selectedClient !== 'all' ? selectedClient : '',
-        export: 'true'
+        report: 'orders',
+        file_format: 'csv'
       });
 
-      const response = await fetch(`/api/woocommerce/orders/channels_report/?${params}`, {
+      // The backend streams the CSV; it is no longer embedded in the report JSON
+      const response = await fetch(`/api/woocommerce/orders/export/?${params}`, {
         headers: {
-          'Content-Type': 'application/json',
           ...(accessToken && { 'Authorization': `Bearer ${accessToken}` }),
         },
       });
@@ -212,35 +213,7 @@ export default function ChannelReport() {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
 
-      const detailedData = await response.json();
-
-      const csvData = [
-        [
-          'Order ID', 'Order Date', 'Order Total (DKK)',
-          'UTM Source (meta:_wc_order_attribution_utm_source)',
-          'Source Type (meta:_wc_order_attribution_source_type)',
-          'Classified Channel Type', 'Customer Email',
-          'Order Status', 'Currency', 'Client Name'
-        ],
-        ...(detailedData.orders || []).map((order: any) => [
-          order.order_id || '',
-          order.order_date || '',
-          order.order_total ? parseFloat(order.order_total).toFixed(2) : '0.00',
-          order.attribution_utm_source || '',
-          order.attribution_source_type || '',
-          order.channel_type || 'Unclassified',
-          order.billing_email || '',
-          order.status || '',
-          order.currency || '',
-          order.client_name || ''
-        ])
-      ];
-
-      const csvContent = csvData.map(row =>
-        row.map((field: any) => `"${field}"`).join(',')
-      ).join('\n');
-
-      const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8;' });
+      const blob = await response.blob();
       const link = document.createElement('a');
       const url = URL.createObjectURL(blob);
       link.setAttribute('href', url);
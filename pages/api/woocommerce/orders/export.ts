@@ -0,0 +1,53 @@
+import { NextApiRequest, NextApiResponse } from 'next';
+import { Readable } from 'stream';
+import type { ReadableStream as WebReadableStream } from 'stream/web';
+
+const DJANGO_API_URL = process.env.DJANGO_API_URL || '/api';
+
+// The export is streamed through, not buffered
+export const config = {
+  api: {
+    responseLimit: false,
+  },
+};
+
+export default async function handler(req: NextApiRequest, res: NextApiResponse) {
+  const { method } = req;
+
+  if (method !== 'GET') {
+    return res.status(405).json({ error: 'Method not allowed' });
+  }
+
+  try {
+    const queryParams = new URLSearchParams(req.query as Record<string, string>).toString();
+    
+    // Forward the request to the Django backend
+    const headers: Record<string, string> = {};
+    
+    if (req.headers.authorization) {
+      headers['Authorization'] = req.headers.authorization;
+    }
+    
+    const response = await fetch(`${DJANGO_API_URL}/woocommerce/orders/export/?${queryParams}`, {
+      method: 'GET',
+      headers: headers,
+    });
+
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({ error: 'Export failed' }));
+      return res.status(response.status).json(data);
+    }
+
+    res.status(response.status);
+    for (const header of ['content-type', 'content-disposition']) {
+      const value = response.headers.get(header);
+      if (value) {
+        res.setHeader(header, value);
+      }
+    }
+    Readable.fromWeb(response.body as WebReadableStream).pipe(res);
+  } catch (error) {
+    console.error('WooCommerce orders export API error:', error);
+    return res.status(500).json({ error: 'Internal server error' });
+  }
+}